@@ -0,0 +1,165 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Closed-form addressing plan of a topo.Fattree: node index <-> DPID, IP,
+# MAC, coordinates and the port a node uses towards each of its neighbors.
+# Every lookup is arithmetic on the coordinates, no string parsing.
+#
+#   DPID  tier << 16 | a << 8 | b    agg 0x01PPII, edge 0x02PPII,
+#                                    core 0x03IIJJ (row i, column j)
+#   IP    10.pod.edge.idx+2          (hosts)
+#   MAC   00:00:0a:pod:edge:idx+2    (the IP's last three octets)
+#
+# Each field gets its own byte, so nothing collides for k <= 254.
+
+import socket
+
+import topo
+
+AGG_TIER, EDGE_TIER, CORE_TIER = 1, 2, 3
+_TIER = {topo.AGG: AGG_TIER, topo.EDGE: EDGE_TIER, topo.CORE: CORE_TIER}
+
+MAX_PORTS = 254
+
+
+def ip_to_int(ip):
+    # dotted quad (or an int already) to a 32-bit integer
+    if isinstance(ip, int):
+        return ip
+    return int.from_bytes(socket.inet_aton(ip), 'big')
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+
+class Addressing:
+
+    def __init__(self, ft_topo):
+        k = ft_topo.num_ports
+        if k > MAX_PORTS or k % 2:
+            raise ValueError(f"addressing plan needs an even k <= {MAX_PORTS}, got {k}")
+        self.ft = ft_topo
+        self.k = k
+        self.half = k // 2
+
+    # ---------- switches ----------
+    def dpid(self, i):
+        ft = self.ft
+        t = ft.types[i]
+        if t == topo.CORE:
+            row, col = divmod(ft.idxs[i], self.half)
+            return CORE_TIER << 16 | row << 8 | col
+        return _TIER[t] << 16 | ft.pods[i] << 8 | ft.idxs[i]
+
+    def index_of_dpid(self, dpid):
+        # Node index of a switch DPID, None if it is not part of the fabric
+        tier = dpid >> 16
+        a = (dpid >> 8) & 0xff
+        b = dpid & 0xff
+        half = self.half
+        if tier == CORE_TIER and a < half and b < half:
+            return self.ft.core_index(a * half + b)
+        if a >= self.k or b >= half:
+            return None
+        if tier == AGG_TIER:
+            return self.ft.agg_index(a, b)
+        if tier == EDGE_TIER:
+            return self.ft.edge_index(a, b)
+        return None
+
+    def edge_dpid(self, pod, edge):
+        return EDGE_TIER << 16 | pod << 8 | edge
+
+    def is_edge_dpid(self, dpid):
+        return dpid >> 16 == EDGE_TIER
+
+    def coords(self, i):
+        # (type code, pod, edge switch index, index) of node i
+        ft = self.ft
+        return ft.types[i], ft.pods[i], ft.subs[i], ft.idxs[i]
+
+    # ---------- hosts ----------
+    def ip_int(self, i):
+        ft = self.ft
+        return 10 << 24 | ft.pods[i] << 16 | ft.subs[i] << 8 | (ft.idxs[i] + 2)
+
+    def ip(self, i):
+        ft = self.ft
+        return f"10.{ft.pods[i]}.{ft.subs[i]}.{ft.idxs[i] + 2}"
+
+    def mac(self, i):
+        ft = self.ft
+        return f"00:00:0a:{ft.pods[i]:02x}:{ft.subs[i]:02x}:{ft.idxs[i] + 2:02x}"
+
+    def host_of_ip(self, ip):
+        # Node index of the host with this IP, None if it is not in the plan
+        value = ip_to_int(ip)
+        pod = (value >> 16) & 0xff
+        edge = (value >> 8) & 0xff
+        h = (value & 0xff) - 2
+        if (value >> 24 != 10 or pod >= self.k or edge >= self.half
+                or not 0 <= h < self.half):
+            return None
+        return self.ft.host_index(pod, edge, h)
+
+    def edge_dpid_of_ip(self, ip):
+        # DPID of the edge switch a host IP sits behind, None if unknown
+        i = self.host_of_ip(ip)
+        if i is None:
+            return None
+        ft = self.ft
+        return self.edge_dpid(ft.pods[i], ft.subs[i])
+
+    def host_location(self, ip):
+        # (edge switch DPID, port) where the host with this IP is attached
+        i = self.host_of_ip(ip)
+        if i is None:
+            return None
+        ft = self.ft
+        return self.edge_dpid(ft.pods[i], ft.subs[i]), self.half + 1 + ft.idxs[i]
+
+    # ---------- ports ----------
+    def port(self, i, j):
+        # Port of node i facing its neighbor j (switches from 1, hosts 0)
+        ft = self.ft
+        ti = ft.types[i]
+        tj = ft.types[j]
+        if ti == topo.HOST:
+            return 0
+        if ti == topo.CORE:
+            return ft.pods[j] + 1
+        if ti == topo.EDGE:
+            if tj == topo.AGG:
+                return ft.idxs[j] + 1
+            return self.half + 1 + ft.idxs[j]
+        # agg: cores first, then the edge switches of the pod
+        if tj == topo.CORE:
+            return ft.idxs[j] - ft.idxs[i] * self.half + 1
+        return self.half + 1 + ft.idxs[j]
+
+    def neighbor(self, i, port):
+        # Node index behind port of node i, None for an unused port
+        ft = self.ft
+        n = port if ft.types[i] == topo.HOST else port - 1
+        if not 0 <= n < ft.degree(i):
+            return None
+        return ft.indices[ft.indptr[i] + n]
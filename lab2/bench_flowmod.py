@@ -0,0 +1,129 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Controller messages and packet-ins per new flow in SPRouter.
+#
+#   python3 bench_flowmod.py --k 4 8 --flows 500
+#
+# All switches connect to SPRouter, host locations are known (as after the
+# first ARP exchange), then the first IPv4 packet of --flows new flows
+# between random hosts is walked through the stand-in switches: a table
+# hit forwards it, a miss is a packet-in, and barrier requests are
+# answered before anything else happens on the switch.
+#   per-hop - every flow-mod and packet-out on its own, only on the switch
+#             that raised the packet-in (SPRouter before the batcher)
+#   batched - FlowBatcher: rules for the whole path, one write per switch
+#             ending in a barrier, packet-out after the barrier replies
+# "packet-ins" beyond the first one per flow are redundant.
+
+import argparse
+import random
+
+import topo
+import routing
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame
+
+
+class Unbatched(object):
+    # FlowBatcher interface, sending everything at once as add_flow did
+    def add(self, datapath, mod):
+        datapath.send_msg(mod)
+
+    def send_after(self, datapath, msg, dpids=None, done=None):
+        datapath.send_msg(msg)
+
+    def flush(self):
+        pass
+
+    def barrier_reply(self, datapath, xid):
+        pass
+
+    def forget(self, dpid, mod):
+        pass
+
+    def removed(self, dpid, table_id, priority, match):
+        pass
+
+    def reset(self, dpid):
+        pass
+
+
+class PerHopSPRouter(sp_routing.SPRouter):
+
+    def __init__(self, *args, **kwargs):
+        super(PerHopSPRouter, self).__init__(*args, **kwargs)
+        self.batcher = Unbatched()
+
+    def install_path(self, dpid, dst_edge_dpid, dst_ip):
+        pass
+
+
+def run(cls, ft_topo, flows):
+    router = cls()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = StubFabric(router, ft_topo)
+    addr = fabric.addr
+    fabric.connect()
+    for h in range(ft_topo.n_switch, len(ft_topo)):
+        router.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+
+    messages = sum(len(dp.sent) for dp in fabric.datapaths.values())
+    writes = sum(dp.writes for dp in fabric.datapaths.values())
+    for src, dst in flows:
+        data = ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst))
+        edge = ft_topo.neighbors(src)[0]
+        # a new flow misses at its edge switch
+        fabric.packet_in(fabric.datapaths[addr.dpid(edge)], addr.port(edge, src), data)
+        fabric.settle()
+    messages = sum(len(dp.sent) for dp in fabric.datapaths.values()) - messages
+    writes = sum(dp.writes for dp in fabric.datapaths.values()) - writes
+    return fabric, messages, writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter messages and packet-ins per new flow')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--flows', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    print(f"{'k':>3} {'mode':>8} {'flows':>6} {'delivered':>9} {'msgs/flow':>10} "
+          f"{'writes/flow':>12} {'pkt-ins/flow':>13} {'redundant':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [tuple(rng.sample(hosts, 2)) for _ in range(args.flows)]
+        for name, cls in (('per-hop', PerHopSPRouter), ('batched', sp_routing.SPRouter)):
+            fabric, messages, writes = run(cls, ft_topo, flows)
+            n = len(flows)
+            print(f"{k:>3} {name:>8} {n:>6} {fabric.delivered:>9} {messages / n:>10.2f} "
+                  f"{writes / n:>12.2f} {fabric.packet_ins / n:>13.2f} "
+                  f"{(fabric.packet_ins - n) / n:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Cost of SPRouter's metrics (SP_METRICS): the same workloads with the
+# instrumentation off and on.
+#
+#   python3 bench_metrics.py --k 4 8 --events 3000 --repeat 5
+#
+# SP_METRICS decides at import whether the handlers are wrapped; off they
+# are the plain functions. So both are measured in one process with
+# metrics on, "off" with every wrapped SPRouter method swapped back to the
+# function it wraps (__wrapped__), alternating --repeat times (single runs
+# vary by about 10% on a busy machine, more than the instrumentation
+# costs), best run of each. Workloads: packet-ins of new flows at their
+# edge switch (bench_packet_in.py's, with the switch's barrier replies) and
+# connecting every switch of the fabric. "timed/pkt-in" is how many
+# instrumented calls a packet-in makes, "estimated" those at the cost of a
+# timed over a plain call (last line) as a share of a packet-in. Also what
+# one snapshot (the /metrics body) costs and the packet-in latency the
+# histogram saw.
+
+import argparse
+import os
+import time
+
+os.environ['SP_METRICS'] = '1'
+os.environ['SP_HOST_TTL'] = '0'
+
+import topo
+import routing
+import metrics
+import sp_routing
+import bench_packet_in
+from stub_datapath import StubFabric, stub_datapaths
+
+
+def set_instrumented(on, wrapped):
+    # Put the timed wrappers ({name: wrapper}) or the plain functions in SPRouter
+    for name, fn in wrapped.items():
+        setattr(sp_routing.SPRouter, name, fn if on else fn.__wrapped__)
+
+
+def run(ft_topo, graph, events):
+    # (packet-ins per second, seconds to connect every switch, timed calls)
+    calls = sum(h.count for h in sp_routing.METRICS.histograms.values())
+    datapaths = stub_datapaths(ft_topo)
+    evs = bench_packet_in.make_events(ft_topo, datapaths, events)
+    rate, _ = bench_packet_in.run(sp_routing.SPRouter, ft_topo, evs, graph)
+    calls = sum(h.count for h in sp_routing.METRICS.histograms.values()) - calls
+
+    router = sp_routing.SPRouter()
+    router.set_fattree(ft_topo)
+    fabric = StubFabric(router, ft_topo)
+    start = time.perf_counter()
+    fabric.connect()
+    return rate, time.perf_counter() - start, calls
+
+
+def micro(n=200000):
+    # ns per histogram sample, per plain call, per timed call
+    registry = metrics.Registry(True)
+    hist = registry.histogram('bare')
+
+    def plain(x):
+        return x
+
+    timed = registry.timed('call')(plain)
+    start = time.perf_counter()
+    for i in range(n):
+        hist.add(1e-6)
+    sample = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(n):
+        plain(i)
+    bare = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(n):
+        timed(i)
+    wrapped = time.perf_counter() - start
+    return sample / n * 1e9, bare / n * 1e9, wrapped / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter metrics overhead')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--events', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    wrapped = {name: fn for name, fn in vars(sp_routing.SPRouter).items()
+               if hasattr(fn, '__wrapped__')}
+    sample, bare, timed = micro()
+    print(f"{'k':>3} {'metrics':>8} {'pkt-in/s':>10} {'measured':>9} {'timed/pkt-in':>13} "
+          f"{'estimated':>10} {'connect [ms]':>13}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        graph = routing.fattree_graph(ft_topo)
+        best = {}
+        for _ in range(args.repeat):
+            for on in (False, True):
+                set_instrumented(on, wrapped)
+                rate, connect, calls = run(ft_topo, graph, args.events)
+                prev = best.get(on, (0, float('inf'), 0))
+                best[on] = (max(rate, prev[0]), min(connect, prev[1]), calls)
+        set_instrumented(True, wrapped)
+        off_rate = best[False][0]
+        for on in (False, True):
+            rate, connect, calls = best[on]
+            per_packet = calls / args.events
+            estimated = per_packet * (timed - bare) * 1e-9 * off_rate
+            print(f"{k:>3} {'on' if on else 'off':>8} {rate:>10.0f} "
+                  f"{off_rate / rate - 1:>8.1%} {per_packet:>13.1f} {estimated:>9.1%} "
+                  f"{connect * 1e3:>13.1f}")
+    start = time.perf_counter()
+    snap = sp_routing.METRICS.snapshot()
+    elapsed = time.perf_counter() - start
+    lat = snap['latency']['packet_in']
+    print(f"snapshot {elapsed * 1e3:.2f} ms ({len(snap['latency'])} histograms); packet-in "
+          f"p50 {lat['p50_us']:.0f} us, p99 {lat['p99_us']:.0f} us, max {lat['max_us']:.0f} us")
+    print(f"histogram sample {sample:.0f} ns, plain call {bare:.0f} ns, "
+          f"timed call {timed:.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
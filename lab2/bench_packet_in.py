@@ -0,0 +1,125 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Packet-in throughput of SPRouter against stand-in datapaths.
+#
+#   python3 bench_packet_in.py --k 4 8 16 --events 2000
+#
+# "dijkstra" runs the per-packet Dijkstra the handler used before the route
+# table, "table" is the current lookup in the precomputed next-hop table.
+# --log measures each with logging off, at INFO (the default) and at DEBUG
+# (per-packet records, rate-limited unless SP_LOG_RATE=0); "flush" is how
+# long the writer thread still needed for the backlog afterwards.
+
+import argparse
+import random
+import time
+
+import topo
+import routing
+import logutil
+import sp_routing
+from addressing import Addressing
+from stub_datapath import (stub_datapaths, packet_in_event, barrier_reply_event,
+                           ipv4_frame)
+
+
+class DijkstraSPRouter(sp_routing.SPRouter):
+    # Per-packet path computation, as _packet_in_handler did originally
+    def next_hop_port(self, dpid, dst_edge_dpid):
+        path = self.dijkstra(dpid, dst_edge_dpid)
+        if len(path) >= 2:
+            return self.graph[dpid][path[1]]
+        return None
+
+
+def make_router(cls, ft_topo, graph):
+    router = cls()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(graph)
+    return router
+
+
+def make_events(ft_topo, datapaths, count, seed=1):
+    # New flows between random host pairs, seen at the source edge switch
+    addr = Addressing(ft_topo)
+    rng = random.Random(seed)
+    hosts = range(ft_topo.n_switch, len(ft_topo))
+    events = []
+    for _ in range(count):
+        src, dst = rng.sample(hosts, 2)
+        data = ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst))
+        edge = ft_topo.neighbors(src)[0]
+        dp = datapaths[addr.dpid(edge)]
+        events.append(packet_in_event(dp, addr.port(edge, src), data))
+    return events
+
+
+def run(cls, ft_topo, events, graph):
+    router = make_router(cls, ft_topo, graph)
+    start = time.perf_counter()
+    for ev in events:
+        router._packet_in_handler(ev)
+        # the switch acknowledges the batch, releasing the packet-out
+        dp = ev.msg.datapath
+        while dp.barriers:
+            router._barrier_reply_handler(barrier_reply_event(dp, dp.barriers.pop()))
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    logutil.flush(sp_routing.logger)
+    return len(events) / elapsed, time.perf_counter() - start
+
+
+def set_log(level):
+    logger = sp_routing.logger
+    logger.disabled = level == 'off'
+    if level != 'off':
+        logger.setLevel(level.upper())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter packet-in throughput')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--log', nargs='+', default=['off'],
+                        choices=['off', 'info', 'debug'],
+                        help='sp_routing.log levels to measure with')
+    args = parser.parse_args()
+
+    print(f"{'k':>4} {'mode':>10} {'log':>6} {'events':>8} {'pkt-in/s':>12} {'flush [s]':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        graph = routing.fattree_graph(ft_topo)
+        for name, cls in (('dijkstra', DijkstraSPRouter),
+                          ('table', sp_routing.SPRouter)):
+            for level in args.log:
+                set_log(level)
+                datapaths = stub_datapaths(ft_topo)
+                events = make_events(ft_topo, datapaths, args.events)
+                rate, flush = run(cls, ft_topo, events, graph)
+                print(f"{k:>4} {name:>10} {level:>6} {len(events):>8} "
+                      f"{rate:>12.0f} {flush:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Per-packet cost of the packet-in header parse.
+#
+#   python3 bench_parse.py
+#   python3 bench_parse.py --pcap capture.pcap   # frames recorded with tcpdump -w
+#
+# "packet" is what the handler did before: ryu.lib.packet.Packet(data) plus
+# get_protocols(ethernet)/get_protocol(arp)/get_protocol(ipv4). "fast" is
+# pktparse.parse_headers(). Both must agree on every frame.
+
+import argparse
+import struct
+import time
+
+from ryu.lib.packet import packet, ethernet, arp, ipv4, vlan, lldp, ether_types
+
+import pktparse
+from stub_datapath import arp_frame, ipv4_frame
+
+
+def lldp_frame(dpid=1, port_no=1):
+    # What ryu.topology.switches sends for link discovery
+    pkt = packet.Packet()
+    pkt.add_protocol(ethernet.ethernet(dst=lldp.LLDP_MAC_NEAREST_BRIDGE,
+                                       src='00:00:00:00:00:01',
+                                       ethertype=ether_types.ETH_TYPE_LLDP))
+    tlvs = (lldp.ChassisID(subtype=lldp.ChassisID.SUB_LOCALLY_ASSIGNED,
+                           chassis_id=b'dpid:%016x' % dpid),
+            lldp.PortID(subtype=lldp.PortID.SUB_PORT_COMPONENT,
+                        port_id=struct.pack('!I', port_no)),
+            lldp.TTL(ttl=120), lldp.End())
+    pkt.add_protocol(lldp.lldp(tlvs))
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def vlan_ipv4_frame(src_mac, dst_mac, src_ip, dst_ip, vid=10):
+    pkt = packet.Packet()
+    pkt.add_protocol(ethernet.ethernet(dst=dst_mac, src=src_mac,
+                                       ethertype=ether_types.ETH_TYPE_8021Q))
+    pkt.add_protocol(vlan.vlan(vid=vid, ethertype=ether_types.ETH_TYPE_IP))
+    pkt.add_protocol(ipv4.ipv4(src=src_ip, dst=dst_ip, proto=1))
+    pkt.add_protocol(b'\x00' * 32)
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def sample_frames():
+    a, b = '00:00:0a:00:00:02', '00:00:0a:01:00:02'
+    return {
+        'arp': arp_frame(a, '10.0.0.2', '10.1.0.2'),
+        'ipv4': ipv4_frame(a, b, '10.0.0.2', '10.1.0.2'),
+        'vlan-ipv4': vlan_ipv4_frame(a, b, '10.0.0.2', '10.1.0.2'),
+        'lldp': lldp_frame(),
+    }
+
+
+def read_pcap(path):
+    # Frames of a classic (not pcapng) libpcap file with Ethernet link type
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic = data[:4]
+    endian = {b'\xd4\xc3\xb2\xa1': '<', b'\xa1\xb2\xc3\xd4': '>',
+              b'\x4d\x3c\xb2\xa1': '<', b'\xa1\xb2\x3c\x4d': '>'}.get(magic)
+    if endian is None:
+        raise ValueError(f"{path}: not a pcap file")
+    record = struct.Struct(endian + 'IIII')
+    frames = []
+    off = 24
+    while off + record.size <= len(data):
+        caplen = record.unpack_from(data, off)[2]
+        off += record.size
+        frames.append(data[off:off + caplen])
+        off += caplen
+    return frames
+
+
+def parse_packet(data):
+    # The handler's former parse
+    pkt = packet.Packet(data)
+    eth = pkt.get_protocols(ethernet.ethernet)[0]
+    arp_pkt = pkt.get_protocol(arp.arp)
+    ip_pkt = pkt.get_protocol(ipv4.ipv4)
+    if arp_pkt:
+        return pktparse.ETH_TYPE_ARP, arp_pkt.src_ip, arp_pkt.dst_ip
+    if ip_pkt:
+        return pktparse.ETH_TYPE_IP, ip_pkt.src, ip_pkt.dst
+    return eth.ethertype, None, None
+
+
+def per_packet(fn, frames, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in frames:
+            fn(data)
+    return (time.perf_counter() - start) / (repeat * len(frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='packet-in header parse cost')
+    parser.add_argument('--repeat', type=int, default=20000)
+    parser.add_argument('--pcap', help='also measure the frames of this capture')
+    args = parser.parse_args()
+
+    sets = {name: [data] for name, data in sample_frames().items()}
+    if args.pcap:
+        sets['pcap'] = read_pcap(args.pcap)
+
+    print(f"{'frames':>10} {'count':>6} {'packet [us]':>12} {'fast [us]':>10} {'speedup':>8}")
+    for name, frames in sets.items():
+        for data in frames:
+            fast = pktparse.parse_headers(data)
+            if fast[1] is not None:
+                assert fast == parse_packet(data), (name, fast, parse_packet(data))
+        repeat = max(1, args.repeat // len(frames))
+        slow = per_packet(parse_packet, frames, repeat)
+        fast = per_packet(pktparse.parse_headers, frames, repeat)
+        print(f"{name:>10} {len(frames):>6} {slow * 1e6:>12.2f} {fast * 1e6:>10.2f} "
+              f"{slow / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
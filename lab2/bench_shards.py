@@ -0,0 +1,264 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Packet-in throughput of the pod-sharded SPRouter (sp_shard.py) with 1 to
+# N worker processes, against stand-in datapaths.
+#
+#   python3 bench_shards.py --k 16 --workers 1 2 4 8 --flows 4000
+#
+# The same new flows between random hosts are used for every setup. Each
+# becomes the packet-ins it raises: one at the source edge switch, and one
+# at the destination pod's aggregation switch if another worker has that
+# pod (the core switches have all routes, see sp_shard.py). Every worker
+# is a process with the stand-in switches of its pods, attached to the
+# shared memory, and handles its packet-ins, answering the barriers.
+#   wall       - from the common start until the last worker is done
+#   pkt-in/s   - packet-ins / wall
+#   cpu max    - CPU seconds of the busiest worker
+#   per core   - packet-ins / cpu max: the rate with a core for each worker,
+#                which is what wall approaches on a machine with that many
+# "single" is SPRouter in one process with its own route table.
+# Before that a check in one process: a link failure a worker reports
+# reaches the coordinator and moves the routes of the other worker.
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import topo
+import routing
+import shard
+import snapshot
+import sp_routing
+import sp_shard
+from addressing import Addressing
+from bench_startup import switch_event
+from stub_datapath import (FlowTable, stub_datapaths, switch_features_event, barrier_reply_event,
+                           packet_in_event, port_status_event, ipv4_frame, to_int)
+
+
+class NoFlowTable(FlowTable):
+    # Throughput runs do not forward: rules are sent but not applied, the
+    # stand-in table's linear insert would dominate the times otherwise
+    def apply(self, mod):
+        return []
+
+
+def stand_ins(ft_topo, dpids=None, tables=True):
+    datapaths = stub_datapaths(ft_topo)
+    datapaths = {dpid: dp for dpid, dp in datapaths.items() if dpids is None or dpid in dpids}
+    if not tables:
+        for dp in datapaths.values():
+            dp.flows = NoFlowTable()
+    return datapaths
+
+
+def settle(router, datapaths):
+    for dp in datapaths:
+        while dp.barriers:
+            router._barrier_reply_handler(barrier_reply_event(dp, dp.barriers.pop(0)))
+
+
+def make_shard(path, name, shard_id, workers, tables=True):
+    # ShardedSPRouter of shard_id with its switches connected
+    router = sp_shard.ShardedSPRouter()
+    router.load_snapshot(path)
+    router.attach(shard_id, workers, name, shared_tracker=True)
+    datapaths = stand_ins(router.topo_net, set(router.plan.dpids(shard_id)), tables).values()
+    for dp in datapaths:
+        router.switch_features_handler(switch_features_event(dp))
+        router._switch_enter_handler(switch_event(dp.id))
+        settle(router, [dp])
+    return router, {dp.id: dp for dp in datapaths}
+
+
+def packet_ins(ft_topo, plan, table, flows):
+    # Per flow [(shard, dpid, in_port, frame)] of the packet-ins it raises
+    addr = Addressing(ft_topo)
+    events = []
+    for src, dst in flows:
+        data = ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst))
+        u = ft_topo.neighbors(src)[0]
+        flow = [(plan.owner(u), addr.dpid(u), addr.port(u, src), data)]
+        seen = {plan.owner(u), shard.COORDINATOR}
+        dst_edge = ft_topo.neighbors(dst)[0]
+        while u != dst_edge:
+            v = addr.neighbor(u, table.lookup(addr.dpid(u), addr.dpid(dst_edge)))
+            if plan.owner(v) not in seen:
+                seen.add(plan.owner(v))
+                flow.append((plan.owner(v), addr.dpid(v), addr.port(v, u), data))
+            u = v
+        events.append(flow)
+    return events
+
+
+def worker(path, name, w, workers, events, barrier, results):
+    sp_routing.logger.disabled = True
+    router, datapaths = make_shard(path, name, w, workers, tables=False)
+    events = [packet_in_event(datapaths[dpid], port, data)
+              for s, dpid, port, data in events if s == w]
+    barrier.wait()
+    cpu = time.process_time()
+    for ev in events:
+        router._packet_in_handler(ev)
+        settle(router, [ev.msg.datapath])
+    results.put((w, len(events), time.process_time() - cpu, time.perf_counter()))
+    router.state.close()
+
+
+def run(path, name, workers, events):
+    # (packet-ins, wall, cpu of the busiest worker) with `workers` processes
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, name, w, workers, events, barrier, results))
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+    barrier.wait()
+    start = time.perf_counter()
+    done = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return (sum(n for _, n, _, _ in done), max(end for _, _, _, end in done) - start,
+            max(cpu for _, _, cpu, _ in done))
+
+
+def run_single(path, flows):
+    # (packet-ins, seconds) of SPRouter alone: one packet-in per flow, at
+    # the source edge switch, every switch of the path is its own
+    router = sp_routing.SPRouter()
+    router.load_snapshot(path)
+    datapaths = stand_ins(router.topo_net, tables=False)
+    for dp in datapaths.values():
+        router.switch_features_handler(switch_features_event(dp))
+    settle(router, datapaths.values())
+    events = [packet_in_event(datapaths[dpid], port, data)
+              for (_, dpid, port, data), *_ in flows]
+    start = time.perf_counter()
+    for ev in events:
+        router._packet_in_handler(ev)
+        settle(router, [ev.msg.datapath])
+    return len(events), time.perf_counter() - start
+
+
+def route_port(dp, ip):
+    # Out port of the rule dp forwards ip with, None on a miss
+    entry = dp.flows.lookup({'in_port': 0, 'eth_type': 0x0800, 'ipv4_dst': to_int(ip)})
+    if entry is None:
+        return None
+    return entry[2][0].actions[0].port
+
+
+def check(path, k):
+    # Coordinator and two workers in this process over one shared memory
+    ft_topo = topo.Fattree(k)
+    addr = Addressing(ft_topo)
+    with snapshot.Snapshot(path) as snap:
+        table = routing.RouteTable()
+        snap.load_routes(table)
+    state = shard.SharedState.create(ft_topo, table)
+    try:
+        core, core_dps = make_shard(path, state.name, shard.COORDINATOR, 2)
+        w0, dps0 = make_shard(path, state.name, 0, 2)
+        w1, dps1 = make_shard(path, state.name, 1, 2)
+        # a flow from pod 0 to the last pod: rules in pod 0 (worker 0)
+        src = ft_topo.host_index(0, 0, 0)
+        dst = ft_topo.host_index(k - 1, 0, 0)
+        edge = ft_topo.neighbors(src)[0]
+        data = ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst))
+        w0._packet_in_handler(packet_in_event(dps0[addr.dpid(edge)], addr.port(edge, src), data))
+        settle(w0, dps0.values())
+        agg = addr.neighbor(edge, table.lookup(addr.dpid(edge), addr.edge_dpid(k - 1, 0)))
+        agg_dp = dps0[addr.dpid(agg)]
+        before = route_port(agg_dp, addr.ip(dst))
+        # worker 1 loses the link from the last pod to the core that agg uses
+        c = addr.neighbor(agg, before)
+        far = next(a for a in ft_topo.neighbors(c) if ft_topo.pods[a] == k - 1)
+        w1._port_status_handler(port_status_event(dps1[addr.dpid(far)], addr.port(far, c)))
+        published = core.sync()
+        settle(core, core_dps.values())
+        changed = w0.sync()
+        settle(w0, dps0.values())
+        after = route_port(agg_dp, addr.ip(dst))
+        expected = core.routes.lookup(addr.dpid(agg), addr.edge_dpid(k - 1, 0))
+        seen = w1.ip_location.get(addr.ip(src))
+        ok = (before != after == expected and published == changed
+              and seen == (addr.dpid(edge), addr.port(edge, src)))
+        print(f"check k={k}: link {ft_topo.ids[far]}-{ft_topo.ids[c]} down at worker 1, "
+              f"{len(published)} destinations published (generation {state.generation}), "
+              f"{ft_topo.ids[agg]} port {before} -> {after}: {'ok' if ok else 'FAILED'}")
+        for router in (core, w0, w1):
+            router.state.close()
+    finally:
+        state.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sharded SPRouter packet-in throughput')
+    parser.add_argument('--k', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--flows', type=int, default=4000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    ft_topo = topo.Fattree(args.k)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'fattree.snap')
+        snapshot.write(path, ft_topo)
+        if not check(path, args.k):
+            raise SystemExit(1)
+        table = routing.RouteTable()
+        with snapshot.Snapshot(path) as snap:
+            snap.load_routes(table)
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [tuple(rng.sample(hosts, 2)) for _ in range(args.flows)]
+        cores = len(os.sched_getaffinity(0))
+        print(f"k={args.k}: {len(flows)} new flows, {cores} CPU cores available")
+        print(f"{'workers':>8} {'pkt-ins':>8} {'wall [s]':>9} {'pkt-in/s':>9} "
+              f"{'cpu max [s]':>12} {'per core':>9}")
+        n, elapsed = run_single(path, packet_ins(ft_topo, shard.ShardPlan(ft_topo, 1),
+                                                 table, flows))
+        print(f"{'single':>8} {n:>8} {elapsed:>9.2f} {n / elapsed:>9.0f} "
+              f"{elapsed:>12.2f} {n / elapsed:>9.0f}")
+        for workers in args.workers:
+            plan = shard.ShardPlan(ft_topo, workers)
+            events = [e for flow in packet_ins(ft_topo, plan, table, flows) for e in flow]
+            state = shard.SharedState.create(ft_topo, table)
+            try:
+                n, wall, cpu = run(path, state.name, workers, events)
+            finally:
+                state.close()
+            print(f"{workers:>8} {n:>8} {wall:>9.2f} {n / wall:>9.0f} "
+                  f"{cpu:>12.2f} {n / cpu:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
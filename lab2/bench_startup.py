@@ -0,0 +1,149 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# SPRouter startup time to the first installed route, with and without a
+# snapshot (snapshot.py).
+#
+#   python3 bench_startup.py --k 16 32
+#
+# The controller starts, all stand-in switches connect, and one host sends
+# a packet to a host in another pod. Times are controller CPU seconds:
+#   init      - SPRouter() and its fabric: topo.Fattree(k) (discovery) or
+#               load_snapshot() (snapshot: fabric and route table by mmap)
+#   connect   - switch features of every switch (table-miss, ARP rules)
+#   discovery - the topology events of the bring-up (bench_topology.py):
+#               the route table is built from them (discovery) or they only
+#               confirm the snapshot, after the first route
+#   first     - the packet-in: rules for the whole path written
+#   to route  - startup until the first route is written
+# On a real fabric discovery also waits for LLDP rounds over every port,
+# seconds the snapshot mode does not wait for either.
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import types
+
+import topo
+import routing
+import snapshot
+import sp_routing
+from bench_topology import bringup_events
+from stub_datapath import StubFabric, ipv4_frame
+
+
+def switch_event(dpid):
+    return types.SimpleNamespace(switch=types.SimpleNamespace(dp=types.SimpleNamespace(id=dpid)))
+
+
+def link_event(src, dst, port):
+    return types.SimpleNamespace(link=types.SimpleNamespace(
+        src=types.SimpleNamespace(dpid=src, port_no=port),
+        dst=types.SimpleNamespace(dpid=dst)))
+
+
+def discover(router, events):
+    for ev in events:
+        if ev[0] == 'switch':
+            router._switch_enter_handler(switch_event(ev[1]))
+        else:
+            router._link_add_handler(link_event(*ev[1:]))
+
+
+def run(ft_topo, events, path=None):
+    # (phase times, fabric) of one startup; path is the snapshot to load
+    fabric = StubFabric(None, ft_topo)
+    addr = fabric.addr
+    src = ft_topo.host_index(0, 0, 0)
+    dst = ft_topo.host_index(ft_topo.num_ports - 1, 0, 0)
+    data = ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst))
+    edge = ft_topo.neighbors(src)[0]
+
+    times = {}
+    gc.collect()
+    start = time.perf_counter()
+    router = fabric.router = sp_routing.SPRouter()
+    if path is None:
+        router.set_fattree(topo.Fattree(ft_topo.num_ports))
+    else:
+        router.load_snapshot(path)
+    times['init'] = time.perf_counter() - start
+
+    mark = time.perf_counter()
+    fabric.connect()
+    times['connect'] = time.perf_counter() - mark
+
+    if path is None:
+        mark = time.perf_counter()
+        discover(router, events)
+        times['discovery'] = time.perf_counter() - mark
+
+    # dst is known as after its first ARP, the packet is not flooded
+    router.ip_location[addr.ip(dst)] = addr.host_location(addr.ip(dst))
+    mark = time.perf_counter()
+    fabric.packet_in(fabric.datapaths[addr.dpid(edge)], addr.port(edge, src), data)
+    times['first'] = time.perf_counter() - mark
+    times['to route'] = time.perf_counter() - start
+
+    if path is not None:
+        mark = time.perf_counter()
+        discover(router, events)
+        router.check_snapshot()
+        times['discovery'] = time.perf_counter() - mark
+    fabric.settle()
+    return times, router, fabric
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter startup time to the first route')
+    parser.add_argument('--k', type=int, nargs='+', default=[16, 32])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    phases = ('init', 'connect', 'discovery', 'first', 'to route')
+    print(f"{'k':>3} {'mode':>9} {'file [kB]':>10} " + ' '.join(f"{p:>10}" for p in phases)
+          + f" {'delivered':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for k in args.k:
+            ft_topo = topo.Fattree(k)
+            events = bringup_events(routing.fattree_graph(ft_topo), args.seed)
+            path = os.path.join(tmp, f"fattree-k{k}.snap")
+            size = snapshot.write(path, ft_topo)
+            results = {}
+            for mode, snap in (('discovery', None), ('snapshot', path)):
+                times, router, fabric = run(ft_topo, events, snap)
+                results[mode] = router.routes
+                kb = f"{size / 1024:.0f}" if snap else '-'
+                print(f"{k:>3} {mode:>9} {kb:>10} "
+                      + ' '.join(f"{times[p]:>10.3f}" for p in phases)
+                      + f" {fabric.delivered:>9}")
+            # the snapshot's routes are the ones discovery arrives at
+            assert results['discovery'].dist == results['snapshot'].dist
+
+
+if __name__ == '__main__':
+    main()
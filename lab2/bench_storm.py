@@ -0,0 +1,190 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# SPRouter under a packet-in storm.
+#
+#   python3 bench_storm.py --k 8 --peers 4 --copies 3
+#
+# All switches connect, host locations are known, then every host starts
+# --peers flows to random hosts at once and sends each packet --copies
+# times (retransmissions) before a single barrier is answered: the
+# stand-in switches only apply rules once the barrier after them is, so
+# everything sent meanwhile misses. Then the fabric settles and, a second
+# later on the simulated clock, every flow sends one more packet.
+#   none     - no protection (before SP_PACKET_IN_RATE/SP_COALESCE)
+#   meter    - table-miss packet-ins metered to --rate per switch
+#   coalesce - packet-ins for a route being installed wait for it
+#   queue    - at most --queue packet-outs wait for barriers
+#   all      - the three together (the default settings plus a meter)
+# Reported for the burst: packet-ins the controller handled (and those the
+# meters dropped), controller CPU, install_path() calls, flow-mods and
+# packet-outs sent, the most messages waiting for barriers and those
+# dropped; then the flows that got a packet through in the burst and
+# after the second packet. Exits 1 if a protected run loses a flow for
+# good or lets more than --queue messages wait.
+
+import argparse
+import random
+import sys
+import time
+
+import topo
+import pktparse
+import routing
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame
+from ryu.ofproto import ofproto_v1_3_parser
+
+HANDLERS = ('_packet_in_handler', '_barrier_reply_handler', '_flow_removed_handler')
+
+
+class Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Load(object):
+    # Controller CPU time in the handlers and install_path() calls
+
+    def __init__(self, router):
+        self.cpu = 0.0
+        self.paths = 0
+        for name in HANDLERS:
+            setattr(router, name, self.timed(getattr(router, name)))
+        install_path = router.install_path
+
+        def counted(*args):
+            self.paths += 1
+            return install_path(*args)
+        router.install_path = counted
+
+    def timed(self, handler):
+        def run(ev):
+            start = time.process_time()
+            handler(ev)
+            self.cpu += time.process_time() - start
+        return run
+
+
+def sent(fabric, cls):
+    return sum(isinstance(m, cls) for dp in fabric.datapaths.values() for m in dp.sent)
+
+
+def storm(ft_topo, flows, copies, config):
+    rate, coalesce, queue = config
+    sp_routing.PACKET_IN_RATE = sp_routing.PACKET_IN_BURST = rate
+    sp_routing.COALESCE = coalesce
+    sp_routing.PACKET_OUT_QUEUE = queue
+    clock = Clock()
+    router = sp_routing.SPRouter()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = StubFabric(router, ft_topo, clock, deferred=True)
+    fabric.connect()
+    addr = fabric.addr
+    for h in range(ft_topo.n_switch, len(ft_topo)):
+        router.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+    load = Load(router)
+    batcher = router.batcher
+    frames = [(src, ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst)))
+              for src, dst in flows]
+    flow_mods = sent(fabric, ofproto_v1_3_parser.OFPFlowMod)
+    packet_outs = sent(fabric, ofproto_v1_3_parser.OFPPacketOut)
+
+    row = {'held': 0}
+    for _ in range(copies):
+        for src, data in frames:
+            fabric.inject(src, data)
+            row['held'] = max(row['held'], batcher.held_messages)
+    fabric.settle()
+    row['packet_ins'] = fabric.packet_ins
+    row['metered'] = fabric.metered
+    row['cpu_ms'] = load.cpu * 1e3
+    row['paths'] = load.paths
+    row['flow_mods'] = sent(fabric, ofproto_v1_3_parser.OFPFlowMod) - flow_mods
+    row['packet_outs'] = sent(fabric, ofproto_v1_3_parser.OFPPacketOut) - packet_outs
+    row['dropped'] = batcher.dropped
+    row['burst'] = delivered(fabric, flows)
+
+    clock.now += 1.0
+    for src, data in frames:
+        fabric.send(src, data)
+    row['retry'] = delivered(fabric, flows)
+    row['settled'] = not batcher.held_messages and not router.installing
+    return row
+
+
+def delivered(fabric, flows):
+    # Flows whose packets reached the destination at least once
+    addr = fabric.addr
+    got = {(addr.host_of_ip(pktparse.flow_key(f)[0]), dst)
+           for dst, frames in fabric.inbox.items() for f in frames}
+    return sum(flow in got for flow in set(flows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter under a packet-in storm')
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--peers', type=int, default=4, help='flows per host')
+    parser.add_argument('--copies', type=int, default=3, help='times each packet is sent')
+    parser.add_argument('--rate', type=int, default=20, help='SP_PACKET_IN_RATE (= burst)')
+    parser.add_argument('--queue', type=int, default=64, help='SP_PACKET_OUT_QUEUE')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    ft_topo = topo.Fattree(args.k)
+    rng = random.Random(args.seed)
+    hosts = list(range(ft_topo.n_switch, len(ft_topo)))
+    flows = [(src, dst) for src in hosts
+             for dst in rng.sample([h for h in hosts if h != src], args.peers)]
+    configs = {
+        'none': (0, False, 0),
+        'meter': (args.rate, False, 0),
+        'coalesce': (0, True, 0),
+        'queue': (0, False, args.queue),
+        'all': (args.rate, True, args.queue),
+    }
+    print(f"k={args.k}: {len(flows)} flows x {args.copies} packets")
+    print(f"{'config':>8} {'pkt-ins':>8} {'metered':>8} {'cpu ms':>8} {'paths':>6} "
+          f"{'flow-mods':>9} {'pkt-outs':>8} {'held':>5} {'dropped':>7} "
+          f"{'burst':>6} {'retry':>6}")
+    ok = True
+    for name, config in configs.items():
+        row = storm(ft_topo, flows, args.copies, config)
+        print(f"{name:>8} {row['packet_ins']:>8} {row['metered']:>8} {row['cpu_ms']:>8.1f} "
+              f"{row['paths']:>6} {row['flow_mods']:>9} {row['packet_outs']:>8} "
+              f"{row['held']:>5} {row['dropped']:>7} {row['burst']:>6} {row['retry']:>6}")
+        if name != 'none':
+            ok &= row['retry'] == len(set(flows)) and row['settled']
+            ok &= not config[2] or row['held'] <= config[2]
+    if not ok:
+        print("FAIL: flows lost or more packet-outs held than allowed")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
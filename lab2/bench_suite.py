@@ -0,0 +1,213 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Routing engine benchmarks across fat-tree sizes, no Mininet/OVS needed.
+#
+#   python3 bench_suite.py --out before.json
+#   python3 bench_suite.py --out after.json --compare before.json
+#
+# For every k:
+#   topo      - topo.Fattree(k)
+#   graph     - routing.fattree_graph(), the {dpid: {neighbor: port}} graph
+#               SPRouter routes on
+#   dijkstra  - one SPRouter.dijkstra() call, mean over --pairs random
+#               edge switch pairs (skipped without Ryu)
+#   routes    - RouteTable.rebuild(): next hops of all switches to all edge
+#               switches (single run, the others are best of --repeat)
+#   memory    - bytes held by the Fattree, the graph and the route table
+#               (tracemalloc, measured in a separate pass)
+#
+# With --out, results go to a JSON file together with the commit and
+# interpreter they were taken on. --compare prints the change against an earlier file and
+# exits 1 if a time grew by more than --threshold.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+import topo
+import routing
+
+try:
+    import sp_routing
+except ImportError:
+    sp_routing = None
+
+METRICS = ('topo_s', 'graph_s', 'dijkstra_us', 'routes_s',
+           'topo_mb', 'graph_mb', 'routes_mb')
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def held(fn):
+    # (result of fn, bytes it allocated and still holds)
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, memory
+
+
+def measure(k, pairs, repeat, seed):
+    ft_topo = topo.Fattree(k)
+    graph = routing.fattree_graph(ft_topo)
+    dsts = routing.edge_dpids(ft_topo)
+    row = {'k': k, 'switches': ft_topo.n_switch,
+           'hosts': len(ft_topo) - ft_topo.n_switch,
+           'links': sum(len(nbrs) for nbrs in graph.values()) // 2}
+
+    row['topo_s'] = best(lambda: topo.Fattree(k), repeat)
+    row['graph_s'] = best(lambda: routing.fattree_graph(ft_topo), repeat)
+
+    row['dijkstra_us'] = None
+    if sp_routing is not None:
+        # dijkstra() only uses self.graph
+        router = types.SimpleNamespace(graph=graph)
+        rng = random.Random(seed)
+        edges = sorted(dsts)
+        queries = [tuple(rng.sample(edges, 2)) for _ in range(pairs)]
+        dijkstra = sp_routing.SPRouter.dijkstra
+
+        def run():
+            for src, dst in queries:
+                dijkstra(router, src, dst)
+        row['dijkstra_us'] = best(run, repeat) / pairs * 1e6
+
+    table = routing.RouteTable(dsts)
+    gc.collect()
+    start = time.perf_counter()
+    table.rebuild(graph)
+    row['routes_s'] = time.perf_counter() - start
+    del table
+
+    ft_topo, row['topo_mb'] = held(lambda: topo.Fattree(k))
+    graph, row['graph_mb'] = held(lambda: routing.fattree_graph(ft_topo))
+
+    def build():
+        table = routing.RouteTable(dsts)
+        table.rebuild(graph)
+        return table
+    _, row['routes_mb'] = held(build)
+    for key in ('topo_mb', 'graph_mb', 'routes_mb'):
+        row[key] /= 2 ** 20
+    return row
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                             cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old, threshold):
+    # Print the change per metric; True if a time regressed beyond threshold
+    old_rows = {row['k']: row for row in old['results']}
+    print(f"\nagainst {old['meta'].get('commit')} ({old['meta'].get('python')}):")
+    print(f"{'k':>3} " + ' '.join(f"{m:>12}" for m in METRICS))
+    regressed = False
+    for row in results:
+        prev = old_rows.get(row['k'])
+        if prev is None:
+            continue
+        cells = []
+        for m in METRICS:
+            if not row.get(m) or not prev.get(m):
+                cells.append(f"{'-':>12}")
+                continue
+            change = row[m] / prev[m] - 1
+            flag = ''
+            if m.endswith(('_s', '_us')) and change > threshold:
+                flag = '!'
+                regressed = True
+            cells.append(f"{change * 100:>+10.0f}%{flag or ' '}")
+        print(f"{row['k']:>3} " + ' '.join(cells))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='routing engine benchmark suite')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16, 24, 32, 48])
+    parser.add_argument('--pairs', type=int, default=200, help='dijkstra queries per k')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='earlier --out file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown counted as a regression')
+    args = parser.parse_args()
+
+    if sp_routing is not None:
+        sp_routing.logger.disabled = True
+
+    print(f"{'k':>3} {'switches':>8} {'hosts':>6} {'topo [s]':>9} {'graph [s]':>10} "
+          f"{'dijkstra [us]':>14} {'routes [s]':>11} {'topo [MB]':>10} "
+          f"{'graph [MB]':>11} {'routes [MB]':>12}")
+    results = []
+    for k in args.k:
+        row = measure(k, args.pairs, args.repeat, args.seed)
+        results.append(row)
+        dijkstra = f"{row['dijkstra_us']:>14.1f}" if row['dijkstra_us'] is not None \
+            else f"{'-':>14}"
+        print(f"{k:>3} {row['switches']:>8} {row['hosts']:>6} {row['topo_s']:>9.4f} "
+              f"{row['graph_s']:>10.4f} {dijkstra} {row['routes_s']:>11.3f} "
+              f"{row['topo_mb']:>10.2f} {row['graph_mb']:>11.2f} {row['routes_mb']:>12.2f}")
+
+    meta = {'commit': git_commit(), 'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'pairs': args.pairs, 'repeat': args.repeat, 'seed': args.seed}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+        print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if compare(results, old, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Construction time and memory of topo.Fattree for k=4..64.
+#
+#   python3 bench_topo.py
+#   python3 bench_topo.py --legacy /tmp/topo_old.py   # compare another topo.py
+#
+# build  - Fattree(k) construction time
+# memory - memory still held by the Fattree after construction (tracemalloc)
+# walk   - visiting every switch's neighbors through sw.edges
+# csr    - the same walk over the adjacency arrays (current topo.py only)
+
+import argparse
+import gc
+import importlib.util
+import time
+import tracemalloc
+
+import topo
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('topo_legacy', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(module, k):
+    gc.collect()
+    start = time.perf_counter()
+    module.Fattree(k)
+    build = time.perf_counter() - start
+
+    # separate run, tracemalloc slows allocation down a lot
+    gc.collect()
+    tracemalloc.start()
+    ft_topo = module.Fattree(k)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    count = 0
+    for sw in ft_topo.switches:
+        for edge in sw.edges:
+            count += edge.rnode is not None
+    walk = time.perf_counter() - start
+
+    csr = None
+    if hasattr(ft_topo, 'neighbors'):
+        start = time.perf_counter()
+        count = 0
+        for i in range(ft_topo.n_switch):
+            for j in ft_topo.neighbors(i):
+                count += 1
+        csr = time.perf_counter() - start
+    return build, memory, walk, csr
+
+
+def main():
+    parser = argparse.ArgumentParser(description='topo.Fattree construction cost')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16, 24, 32, 48, 64])
+    parser.add_argument('--legacy', help='path of another topo.py to measure alongside')
+    args = parser.parse_args()
+
+    modules = [('current', topo)]
+    if args.legacy:
+        modules.append(('legacy', load_module(args.legacy)))
+
+    print(f"{'k':>3} {'impl':>8} {'hosts':>7} {'build [s]':>10} {'memory [MB]':>12} "
+          f"{'walk [s]':>9} {'csr [s]':>8}")
+    for k in args.k:
+        for name, module in modules:
+            build, memory, walk, csr = measure(module, k)
+            csr = f"{csr:>8.3f}" if csr is not None else f"{'-':>8}"
+            print(f"{k:>3} {name:>8} {k ** 3 // 4:>7} {build:>10.3f} "
+                  f"{memory / 2 ** 20:>12.1f} {walk:>9.3f} {csr}")
+
+
+if __name__ == '__main__':
+    main()
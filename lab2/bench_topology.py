@@ -0,0 +1,120 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Fabric bring-up cost of the route table: full rebuild vs. incremental.
+#
+#   python3 bench_topology.py --k 8 16
+#
+# Replays the events Ryu's topology app raises while a fat-tree comes up:
+# switches enter in random order and each link is discovered (in both
+# directions) once both of its ends are connected.
+#   full        - rebuild graph and all routes on every EventSwitchEnter,
+#                 as get_topology_data did
+#   incremental - RouteTable.add_switch/add_link per event
+#
+# "BFS runs" counts full per-destination recomputations, "touched" every
+# (destination, switch) route entry written, including partial updates.
+
+import argparse
+import random
+import time
+
+import topo
+import routing
+
+
+def bringup_events(graph, seed=1):
+    order = list(graph)
+    random.Random(seed).shuffle(order)
+    up = set()
+    events = []
+    for dpid in order:
+        up.add(dpid)
+        events.append(('switch', dpid))
+        for nbr, port in graph[dpid].items():
+            if nbr in up:
+                events.append(('link', dpid, nbr, port))
+                events.append(('link', nbr, dpid, graph[nbr][dpid]))
+    return events
+
+
+def full_rebuild(events, dsts):
+    table = routing.RouteTable(dsts)
+    switches = []
+    links = []
+    start = time.perf_counter()
+    for ev in events:
+        if ev[0] == 'link':
+            links.append(ev[1:])
+            continue
+        # get_switch()/get_link() then a rebuild from scratch
+        switches.append(ev[1])
+        graph = {dpid: {} for dpid in switches}
+        for src, dst, port in links:
+            graph[src][dst] = port
+        table.rebuild(graph)
+    # links found after the last switch entered only show up on the next
+    # EventSwitchEnter; give the full rebuild that final pass for free
+    graph = {dpid: {} for dpid in switches}
+    for src, dst, port in links:
+        graph[src][dst] = port
+    table.rebuild(graph)
+    return table, time.perf_counter() - start
+
+
+def incremental(events, dsts):
+    table = routing.RouteTable(dsts)
+    start = time.perf_counter()
+    for ev in events:
+        if ev[0] == 'switch':
+            table.add_switch(ev[1])
+        else:
+            table.add_link(*ev[1:])
+    return table, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='route table bring-up cost')
+    parser.add_argument('--k', type=int, nargs='+', default=[8, 16])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'k':>4} {'mode':>12} {'events':>8} {'versions':>9} "
+          f"{'BFS runs':>9} {'touched':>9} {'time [s]':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        graph = routing.fattree_graph(ft_topo)
+        dsts = routing.edge_dpids(ft_topo)
+        events = bringup_events(graph, args.seed)
+        results = {}
+        for name, fn in (('full', full_rebuild), ('incremental', incremental)):
+            table, elapsed = fn(events, dsts)
+            results[name] = table
+            print(f"{k:>4} {name:>12} {len(events):>8} {table.version:>9} "
+                  f"{table.recomputations:>9} {table.touched:>9} {elapsed:>10.3f}")
+        # both must end up with the same shortest-path distances
+        assert results['full'].dist == results['incremental'].dist
+
+
+if __name__ == '__main__':
+    main()
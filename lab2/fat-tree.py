@@ -21,99 +21,281 @@
 
 #!/usr/bin/env python3
 
-import os
+# Mininet fat-tree for the controllers in this directory.
+#
+#   sudo python3 fat-tree.py --k 8                  # build, then the CLI
+#   sudo python3 fat-tree.py --k 8 --cleanup        # mn -c first, after a crashed run
+#   sudo python3 fat-tree.py --k 8 --shape core     # tc only on agg-core links
+#   sudo python3 fat-tree.py --k 8 --no-cli         # time the bring-up only
+#   python3 fat-tree.py --k 8 --dry-run             # print the plan, no root
+#   sudo python3 fat-tree.py --snapshot fattree-k8.snap   # fabric of snapshot.py
+#   sudo python3 fat-tree.py --snapshot fattree-k8.snap --shards 4   # sp_shard.py
+#
+# The controller has to know the same fabric: SP_K=8 (FT_K=8) for
+# sp_routing.py (ft_routing.py), or SP_SNAPSHOT (FT_SNAPSHOT) with the
+# file of --snapshot. Both default to k=4, and then the hosts of pods 4
+# and up of a k=8 network are never routed to.
+#
+# Nodes, ports, DPIDs and addresses come from the addressing plan. Links
+# are "host" (edge-host), "pod" (edge-agg) and "core" (agg-core); only the
+# tiers in --shape become TCLinks with --bw/--delay, the rest are plain
+# veth pairs. All veth pairs are created up front by a few `ip -batch`
+# runs instead of one `ip link add` per link, switch ports get no MAC
+# configuration and OVS is started in one ovs-vsctl batch. Every phase is
+# timed. With --shards N each switch gets the controller of its shard of
+# sp_shard.py (cores on the --controller port, worker w on port + 1 + w),
+# set in one more ovs-vsctl batch after the start. Leftovers of an earlier
+# run (interfaces, OVS bridges) are only cleaned up with --cleanup, and a
+# start over them fails. --dry-run only needs topo.py, addressing.py and
+# shard.py (and snapshot.py and routing.py with --snapshot).
+
+import argparse
+import importlib.util
 import subprocess
+import sys
 import time
+from contextlib import contextmanager
+
+import topo
+import shard
+import snapshot
+from addressing import Addressing
+
+LINK_TIERS = ('host', 'pod', 'core')
 
-import mininet
-import mininet.clean
-from mininet.net import Mininet
-from mininet.cli import CLI
-from mininet.log import lg, info
-from mininet.link import TCLink
-from mininet.node import Node, OVSKernelSwitch, RemoteController
-from mininet.topo import Topo
-from mininet.util import waitListening, custom
 
-from topo import Fattree
+def link_tier(ft_topo, i, j):
+    types = {ft_topo.types[i], ft_topo.types[j]}
+    if topo.HOST in types:
+        return 'host'
+    return 'core' if topo.CORE in types else 'pod'
 
 
-class FattreeNet(Topo):
+class Plan:
     """
-    Create a fat-tree network in Mininet
+    What the emulated fat-tree consists of, without Mininet:
+      switches  [(name, dpid as 16 hex digits)]
+      hosts     [(name, ip/prefix, mac)]
+      links     [(tier, name1, name2, port1, port2)], switch end first,
+                every link once
+      shaping   {tier: TCLink parameters} for the shaped tiers
+      ports     {switch name: controller port offset} with shards (sp_shard.py)
     """
 
-    def __init__(self, ft_topo):
-
-        Topo.__init__(self)
-
-        # TODO: please complete the network generation logic here
-        # 1) add all switches
-        count_switches = 0
-        for sw in ft_topo.switches:
-            # switch names must be alphanumeric only
-            hex_dpid = '%016x' % int(sw.id.replace('a','1').replace('e','2').replace('c','3'))  # simple mapper
-            self.addSwitch(sw.id, dpid=hex_dpid)
-            count_switches+=1
-        info(f"Total {count_switches} Switches added\n")
-
-        # 2) add all hosts with their IPs
-        count_host = 0
-        for h in ft_topo.servers:
-            # IP: 10.pod.edge.idx/8
-            ip = f"10.{h.pod}.{h.edge}.{h.idx+2}/8"
-            # info(f"Host with ip: {ip} Added")
-            self.addHost(h.id, ip=ip)
-            count_host+=1
-        info(f"Total {count_host} Hosts added\n")
-
-        # 3) add links for every edge in the graph
-        #    use TCLink with 15 Mbps, 5 ms delay
-        seen = set()
-        count_edge = 0
-        for sw in ft_topo.switches:
-            for edge in sw.edges:
-                n1 = edge.lnode
-                n2 = edge.rnode
-                # build a unique key to avoid duplicate links
-                key = tuple(sorted([n1.id, n2.id]))
-                if key in seen:
+    def __init__(self, ft_topo, shape=LINK_TIERS, bw=15, delay='5ms', shards=0):
+        addr = Addressing(ft_topo)
+        self.k = ft_topo.num_ports
+        # switch names must be alphanumeric only
+        self.switches = [(sw.id, '%016x' % addr.dpid(sw.index)) for sw in ft_topo.switches]
+        # IP: 10.pod.edge.idx/8
+        self.hosts = [(h.id, f"{addr.ip(h.index)}/8", addr.mac(h.index))
+                      for h in ft_topo.servers]
+        # on the ports of the addressing plan so the controllers know them up front
+        self.links = []
+        ids = ft_topo.ids
+        for i in range(ft_topo.n_switch):
+            for j in ft_topo.neighbors(i):
+                # every link once, from its lower index end (hosts come last)
+                if j < i:
                     continue
-                seen.add(key)
+                self.links.append((link_tier(ft_topo, i, j), ids[i], ids[j],
+                                   addr.port(i, j), addr.port(j, i)))
+        self.shaping = {tier: {'bw': bw, 'delay': delay} for tier in shape}
+        self.ports = {}
+        if shards:
+            sharding = shard.ShardPlan(ft_topo, shards)
+            self.ports = {ids[i]: sharding.port(sharding.owner(i), 0)
+                          for i in range(ft_topo.n_switch)}
+
+    def veth_commands(self, pids=None):
+        # `ip -batch` lines creating every link's veth pair, host ends in the
+        # network namespace of the host's shell (pids: {host name: pid})
+        hosts = {name for name, _, _ in self.hosts}
+        for _, name1, name2, port1, port2 in self.links:
+            cmd = f"link add name {name1}-eth{port1} type veth peer name {name2}-eth{port2}"
+            if name2 in hosts:
+                cmd += f" netns {pids[name2] if pids else '<' + name2 + '>'}"
+            yield cmd
+
+    def summary(self):
+        per_tier = {tier: sum(link[0] == tier for link in self.links) for tier in LINK_TIERS}
+        lines = [f"fat-tree k={self.k}: {len(self.switches)} switches, {len(self.hosts)} hosts, "
+                 f"{len(self.links)} links ("
+                 + ', '.join(f"{n} {tier}" for tier, n in per_tier.items()) + ")"]
+        for tier in LINK_TIERS:
+            params = self.shaping.get(tier)
+            lines.append(f"  {tier:>4} links: " + (
+                f"TCLink bw={params['bw']} Mbit/s delay={params['delay']}" if params
+                else "veth, not shaped"))
+        return '\n'.join(lines)
+
+    def dump(self):
+        # The whole plan as text, one node or link per line
+        lines = [self.summary()]
+        lines += [f"switch {name} dpid {dpid}" for name, dpid in self.switches]
+        lines += [f"host {name} {ip} {mac}" for name, ip, mac in self.hosts]
+        lines += [f"link {tier} {n1}-eth{p1} <-> {n2}-eth{p2}"
+                  + (' shaped' if tier in self.shaping else '')
+                  for tier, n1, n2, p1, p2 in self.links]
+        lines += ['ip -batch:'] + list(self.veth_commands())
+        lines += [f"controller {name} port +{offset}" for name, offset in self.ports.items()]
+        return '\n'.join(lines)
+
+
+class Phases:
+    # Wall-clock time per bring-up phase
+
+    def __init__(self, log=print):
+        self.log = log
+        self.times = []
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.times.append((name, elapsed))
+        self.log(f"*** {name}: {elapsed:.2f} s\n")
 
-                # all links get same bw/delay
-                self.addLink(n1.id, n2.id,
-                             cls=TCLink,
-                             bw=15,
-                             delay='5ms')
-                count_edge+=1
+    def report(self):
+        total = sum(t for _, t in self.times)
+        return '\n'.join([f"{name:>10} {t:>8.2f} s" for name, t in self.times]
+                         + [f"{'total':>10} {total:>8.2f} s"])
 
 
+def precreated(link_cls):
+    # link_cls on a veth pair create_veths() made already
+    class Precreated(link_cls):
+        @classmethod
+        def makeIntfPair(cls, *args, **kwargs):
+            pass
+    Precreated.__name__ = 'Precreated' + link_cls.__name__
+    return Precreated
 
-def make_mininet_instance(graph_topo):
 
-    net_topo = FattreeNet(graph_topo)
-    net = Mininet(topo=net_topo, controller=None, autoSetMacs=True)
-    net.addController('c0', controller=RemoteController,
-                      ip="127.0.0.1", port=6653)
+def create_veths(plan, net, batch):
+    # All veth pairs of the plan, `batch` per `ip -batch` run
+    pids = {name: net[name].pid for name, _, _ in plan.hosts}
+    commands = list(plan.veth_commands(pids))
+    for start in range(0, len(commands), batch):
+        chunk = '\n'.join(commands[start:start + batch]) + '\n'
+        result = subprocess.run(['ip', '-batch', '-'], input=chunk, text=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if result.returncode:
+            raise RuntimeError(f"creating veth pairs failed (stale interfaces? "
+                               f"try --cleanup):\n{result.stdout}")
+
+
+def build(plan, args, phases):
+    from mininet.link import Link, TCLink
+    from mininet.net import Mininet
+    from mininet.node import OVSKernelSwitch, RemoteController
+    from mininet.util import custom
+
+    ip, _, port = args.controller.partition(':')
+    net = Mininet(topo=None, build=False, controller=None,
+                  switch=custom(OVSKernelSwitch, batch=True))
+    net.addController('c0', controller=RemoteController, ip=ip, port=int(port or 6653))
+
+    with phases('nodes'):
+        for name, dpid in plan.switches:
+            net.addSwitch(name, dpid=dpid)
+        for name, ip_prefix, mac in plan.hosts:
+            net.addHost(name, ip=ip_prefix, mac=mac)
+    with phases('veths'):
+        create_veths(plan, net, args.link_batch)
+    plain, shaped = precreated(Link), precreated(TCLink)
+    with phases('links'):
+        for tier, name1, name2, port1, port2 in plan.links:
+            if tier not in plan.shaping:
+                # addr None: no MAC configuration, hosts get theirs later
+                net.addLink(name1, name2, port1=port1, port2=port2, cls=plain,
+                            addr1=None, addr2=None)
+    with phases('shaping'):
+        for tier, name1, name2, port1, port2 in plan.links:
+            if tier in plan.shaping:
+                net.addLink(name1, name2, port1=port1, port2=port2, cls=shaped,
+                            addr1=None, addr2=None, **plan.shaping[tier])
     return net
 
 
-def run(graph_topo):
+def set_controllers(plan, ip, port):
+    # Every switch to the controller of its shard, in one ovs-vsctl run
+    cmd = ['ovs-vsctl']
+    for name, offset in plan.ports.items():
+        cmd += ['--', 'set-controller', name, f"tcp:{ip}:{port + offset}"]
+    subprocess.run(cmd, check=True)
+
+
+def run(plan, args):
+    import mininet.clean
+    from mininet.cli import CLI
+    from mininet.log import lg, info
 
-    # Run the Mininet CLI with a given topology
     lg.setLogLevel('info')
-    mininet.clean.cleanup()
-    net = make_mininet_instance(graph_topo)
+    phases = Phases(info)
+    if args.cleanup:
+        with phases('cleanup'):
+            mininet.clean.cleanup()
+    net = build(plan, args, phases)
 
-    info('*** Starting network ***\n')
-    net.start()
-    info('*** Running CLI ***\n')
-    CLI(net)
+    with phases('start'):
+        info('*** Starting network ***\n')
+        net.start()
+    if plan.ports:
+        with phases('shards'):
+            ip, _, port = args.controller.partition(':')
+            set_controllers(plan, ip, int(port or 6653))
+    info(plan.summary() + '\n' + phases.report() + '\n')
+    if args.cli:
+        info('*** Running CLI ***\n')
+        CLI(net)
     info('*** Stopping network ***\n')
     net.stop()
 
 
+def main():
+    parser = argparse.ArgumentParser(description='fat-tree in Mininet')
+    parser.add_argument('--k', type=int, default=4, help='switch ports (even)')
+    parser.add_argument('--snapshot', help='take the fat-tree (and k) from this snapshot.py file')
+    parser.add_argument('--bw', type=float, default=15, help='shaped links: Mbit/s')
+    parser.add_argument('--delay', default='5ms', help='shaped links: delay')
+    parser.add_argument('--shape', nargs='*', default=list(LINK_TIERS),
+                        choices=LINK_TIERS + ('none',),
+                        help='link tiers shaped with tc (default all)')
+    parser.add_argument('--controller', default='127.0.0.1:6653', help='remote controller ip:port')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='controller of sp_shard.py with this many workers')
+    parser.add_argument('--link-batch', type=int, default=1000,
+                        help='veth pairs per ip -batch run')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='mininet.clean.cleanup() first (as mn -c)')
+    parser.add_argument('--no-cli', dest='cli', action='store_false',
+                        help='stop again once the network is up')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the planned topology and exit, needs no root')
+    args = parser.parse_args()
+
+    shape = [tier for tier in args.shape if tier != 'none']
+    phases = Phases(sys.stderr.write)
+    try:
+        with phases('plan'):
+            if args.snapshot:
+                with snapshot.Snapshot(args.snapshot) as snap:
+                    ft_topo = snap.fattree()
+            else:
+                ft_topo = topo.Fattree(args.k)
+            plan = Plan(ft_topo, shape, args.bw, args.delay, args.shards)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.dry_run:
+        print(plan.dump())
+        return
+    if importlib.util.find_spec('mininet') is None:
+        parser.error("Mininet not found (see run.sh for its PYTHONPATH); "
+                     "--dry-run works without it")
+    run(plan, args)
+
+
 if __name__ == '__main__':
-    ft_topo = Fattree(4)
-    run(ft_topo)
+    main()
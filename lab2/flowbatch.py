@@ -0,0 +1,262 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Per-datapath flow-mod batching for the Ryu apps.
+#
+# Flow-mods are collected per datapath while an event is handled and
+# flushed together: one socket write per datapath holding all its flow-mods
+# and a closing OFPBarrierRequest. Messages that must not overtake the
+# rules (the packet-out of the packet that triggered them) are held back
+# until every barrier they depend on has been answered.
+
+import struct
+
+
+class FlowBatcher(object):
+    """
+    Coalesces flow-mods per datapath and orders later messages behind
+    barriers. The app calls add() for every flow-mod, send_after() for
+    messages that need the rules in place, flush() at the end of the
+    handler and barrier_reply() from its EventOFPBarrierReply handler.
+
+    Flow-mods already pending for a datapath (same bytes apart from the
+    xid) are dropped, and so are OFPFC_ADDs already sent to it; forget(),
+    removed() or reset() make those sendable again, e.g. after the rule
+    was deleted or expired or the switch reconnected. A rule is its table,
+    priority and match: the last OFPFC_ADD sent for it is what the switch
+    has.
+
+    A switch that reconnects with its flow table is reconciled: its
+    flow-mods are held from hold() until reconcile() with the entries it
+    reports, after which an OFPFC_ADD for one of those
+    rules with the same effect is taken as sent instead of being sent
+    (until the rule is removed() or the switch reset()); unclaimed() tells
+    which of them nothing asked for so far.
+
+    At most max_held messages (0: no limit) wait for barriers; beyond
+    that send_after() and send_along() drop them.
+    """
+
+    def __init__(self, max_held=0):
+        self.datapaths = {}     # dpid -> datapath with pending messages
+        self.pending = {}       # dpid -> {flow-mod key: serialized flow-mod}
+        self.sent = {}          # dpid -> {rule: key of the OFPFC_ADD sent for it}
+        self.adds = {}          # key of a pending OFPFC_ADD -> its rule
+        self.barriers = {}      # (dpid, xid) -> [held entries waiting for it]
+        self.max_held = max_held
+        self.held_messages = 0  # messages waiting for barriers
+        self.dropped = 0        # messages dropped as more than max_held waited
+        self.writes = 0         # socket writes
+        self.messages = 0       # OpenFlow messages in them
+        self.duplicates = 0     # flow-mods dropped as already pending/sent
+        self.flow_mods = 0      # flow-mods queued to be sent
+        self.adopted = 0        # OFPFC_ADDs a reconciled switch had already
+        self.installed = {}     # dpid -> {rule: (effect, match)} reported, not asked for
+        self.held = {}          # dpid -> [flow-mod] until its table is reconciled
+
+    @staticmethod
+    def key(buf):
+        # Serialized message without its xid
+        return bytes(buf[:4]) + bytes(buf[8:])
+
+    @staticmethod
+    def rule(table_id, priority, match):
+        # Flow entry a flow-mod or flow-removed message is about
+        return table_id, priority, tuple(sorted(match.items()))
+
+    @staticmethod
+    def effect(entry):
+        # What a flow-mod or flow stats entry does to a matching packet: its
+        # instructions (output ports, groups, goto-table, meter) and timeouts
+        insts = []
+        for inst in entry.instructions:
+            actions = getattr(inst, 'actions', None)
+            if actions is None:
+                insts.append((inst.type, getattr(inst, 'table_id', None),
+                              getattr(inst, 'meter_id', None)))
+            else:
+                insts.append((inst.type,) + tuple(
+                    (a.type, getattr(a, 'port', None), getattr(a, 'group_id', None))
+                    for a in actions))
+        return tuple(insts), entry.idle_timeout, entry.hard_timeout
+
+    def add(self, datapath, mod):
+        dpid = datapath.id
+        held = self.held.get(dpid)
+        if held is not None:
+            held.append(mod)
+            return True
+        # Serialized with xid 0 for the comparison; only flow-mods that are
+        # sent take the datapath's next xid (patched into the header)
+        mod.xid = 0
+        mod.serialize()
+        mod.xid = None
+        key = self.key(mod.buf)
+        pending = self.pending.setdefault(dpid, {})
+        if key in pending:
+            self.duplicates += 1
+            return False
+        if getattr(mod, 'command', None) == datapath.ofproto.OFPFC_ADD:
+            rule = self.rule(mod.table_id, mod.priority, mod.match)
+            if self.sent.get(dpid, {}).get(rule) == key:
+                self.duplicates += 1
+                return False
+            installed = self.installed.get(dpid)
+            if installed is not None:
+                found = installed.pop(rule, None)
+                if found is not None and found[0] == self.effect(mod):
+                    self.sent.setdefault(dpid, {})[rule] = key
+                    self.adopted += 1
+                    return False
+            self.adds[key] = rule
+        struct.pack_into('!I', mod.buf, 4, datapath.set_xid(mod))
+        pending[key] = mod.buf
+        self.datapaths[dpid] = datapath
+        self.flow_mods += 1
+        return True
+
+    def send_after(self, datapath, msg, dpids=None, done=None):
+        # Send msg to datapath once the batches flushed next on dpids (all
+        # datapaths with pending flow-mods by default) are acknowledged,
+        # then call done(). Returns the entry waiting for them (for
+        # send_along()), None if msg went out right away. With max_held
+        # messages waiting already, msg is dropped; the entry still waits.
+        if dpids is None:
+            dpids = list(self.pending)
+        # outstanding barriers in [2], messages sent along in [3]
+        entry = [datapath, msg, 0, [], done]
+        for dpid in dpids:
+            if self.pending.get(dpid):
+                self.barriers.setdefault((dpid, None), []).append(entry)
+                entry[2] += 1
+        if not entry[2]:
+            self._send(datapath, msg)
+            if done is not None:
+                done()
+            return None
+        if self.max_held and self.held_messages >= self.max_held:
+            self.dropped += 1
+            entry[1] = None
+        else:
+            self.held_messages += 1
+        return entry
+
+    def send_along(self, entry, datapath, msg):
+        # Send msg to datapath together with the message of entry (from
+        # send_after()), right away if that went out already
+        if not entry[2]:
+            self._send(datapath, msg)
+            return True
+        if self.max_held and self.held_messages >= self.max_held:
+            self.dropped += 1
+            return False
+        entry[3].append((datapath, msg))
+        self.held_messages += 1
+        return True
+
+    def flush(self):
+        # One write per datapath: its flow-mods, then a barrier request.
+        # Datapaths are flushed in the order their first flow-mod was added.
+        for dpid, pending in list(self.pending.items()):
+            if not pending:
+                continue
+            datapath = self.datapaths[dpid]
+            parser = datapath.ofproto_parser
+            barrier = parser.OFPBarrierRequest(datapath)
+            xid = datapath.set_xid(barrier)
+            barrier.serialize()
+            datapath.send(b''.join(list(pending.values()) + [barrier.buf]))
+            self.writes += 1
+            self.messages += len(pending) + 1
+            self.sent.setdefault(dpid, {}).update(
+                (self.adds[k], k) for k in pending if k in self.adds)
+            waiting = self.barriers.pop((dpid, None), None)
+            if waiting:
+                self.barriers[(dpid, xid)] = waiting
+        self.pending.clear()
+        self.datapaths.clear()
+        self.adds.clear()
+
+    def barrier_reply(self, datapath, xid):
+        for entry in self.barriers.pop((datapath.id, xid), ()):
+            entry[2] -= 1
+            if not entry[2]:
+                self._release(entry)
+
+    def _release(self, entry):
+        # entry's message and those sent along, once nothing holds them
+        messages = [m for m in [entry[:2]] + entry[3] if m[1] is not None]
+        self.held_messages -= len(messages)
+        for datapath, msg in messages:
+            self._send(datapath, msg)
+        if entry[4] is not None:
+            entry[4]()
+
+    def _send(self, datapath, msg):
+        datapath.send_msg(msg)
+        self.writes += 1
+        self.messages += 1
+
+    def forget(self, dpid, mod):
+        # The rule mod was about is no longer installed on dpid
+        self.removed(dpid, mod.table_id, mod.priority, mod.match)
+
+    def removed(self, dpid, table_id, priority, match):
+        # The rule is gone from dpid (deleted, expired: EventOFPFlowRemoved)
+        rule = self.rule(table_id, priority, match)
+        self.sent.get(dpid, {}).pop(rule, None)
+        self.installed.get(dpid, {}).pop(rule, None)
+
+    def hold(self, dpid):
+        # dpid reconnected, its flow table is being read: keep its flow-mods
+        self.held[dpid] = []
+
+    def reconcile(self, datapath, entries):
+        # datapath reconnected with entries (OFPFlowStats) installed:
+        # OFPFC_ADDs for these rules with the same effect are recorded as
+        # sent without being sent, the held flow-mods first
+        dpid = datapath.id
+        self.installed[dpid] = {
+            self.rule(e.table_id, e.priority, e.match): (self.effect(e), e.match) for e in entries}
+        for mod in self.held.pop(dpid, ()):
+            self.add(datapath, mod)
+
+    def unclaimed(self, dpid):
+        # {rule: match} of the reported entries no OFPFC_ADD asked for yet
+        return {rule: match for rule, (_, match) in self.installed.get(dpid, {}).items()}
+
+    def reset(self, dpid):
+        # dpid (re)connected or went away: nothing is installed, nothing is
+        # outstanding. Returns the entries that waited for its barriers.
+        self.installed.pop(dpid, None)
+        self.held.pop(dpid, None)
+        self.sent.pop(dpid, None)
+        self.pending.pop(dpid, None)
+        self.datapaths.pop(dpid, None)
+        waited = []
+        for key in [k for k in self.barriers if k[0] == dpid]:
+            for entry in self.barriers.pop(key):
+                waited.append(entry)
+                entry[2] -= 1
+                if not entry[2]:
+                    self._release(entry)
+        return waited
+
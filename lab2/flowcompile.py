@@ -0,0 +1,137 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Flow table compression for IPv4 destination routing.
+#
+# A switch's routing decisions are a {(network, prefix length): next hop}
+# table, looked up by longest prefix match. compile_rules() turns it into
+# the smallest table that forwards every address the same way (ORTC:
+# Draves et al., "Constructing Optimal IP Routing Tables", INFOCOM 1999).
+# Addresses no decision covers either must keep missing (the packet goes
+# to the controller) or, with dont_care, may be forwarded anywhere.
+#
+# Networks are integers (addressing.ip_to_int), next hops any hashable
+# value; MISS stands for "no rule", i.e. the table-miss entry.
+
+MISS = None
+_ANY = object()     # set of next hops of a don't-care leaf: all of them
+_UNSET = object()   # trie node without a decision of its own
+
+_LEFT, _RIGHT, _NH, _SET = range(4)
+
+
+def _insert(root, network, plen, nh):
+    node = root
+    for bit in range(plen):
+        b = _RIGHT if network >> (31 - bit) & 1 else _LEFT
+        if node[b] is None:
+            node[b] = [None, None, _UNSET, None]
+        node = node[b]
+    node[_NH] = nh
+
+
+def _merge(a, b):
+    # ORTC step 2: intersection if not empty, union otherwise
+    if a is _ANY:
+        return b
+    if b is _ANY:
+        return a
+    both = a & b
+    return both if both else a | b
+
+
+def _up(node, inherited, dont_care):
+    # Fill in the next-hop sets bottom-up, completing the trie so that every
+    # node has no or two children (missing ones inherit the parent's hop)
+    if node[_NH] is not _UNSET:
+        inherited = node[_NH]
+    if node[_LEFT] is None and node[_RIGHT] is None:
+        if inherited is MISS and dont_care:
+            node[_SET] = _ANY
+        else:
+            node[_SET] = frozenset((inherited,))
+        return node[_SET]
+    for b in (_LEFT, _RIGHT):
+        if node[b] is None:
+            node[b] = [None, None, inherited, None]
+    node[_SET] = _merge(_up(node[_LEFT], inherited, dont_care),
+                        _up(node[_RIGHT], inherited, dont_care))
+    return node[_SET]
+
+
+def _pick(hops):
+    # Deterministic choice among equally good next hops
+    return min(hops, key=lambda h: (h is MISS, repr(h)))
+
+
+def _down(node, network, plen, inherited, out):
+    # ORTC step 3: a node only needs a rule if what it inherits from above
+    # is not one of its acceptable next hops
+    hops = node[_SET]
+    if hops is not _ANY and inherited not in hops:
+        inherited = _pick(hops)
+        out[(network, plen)] = inherited
+    if node[_LEFT] is not None:
+        _down(node[_LEFT], network, plen + 1, inherited, out)
+        _down(node[_RIGHT], network | 1 << (31 - plen), plen + 1, inherited, out)
+
+
+def compile_rules(routes, dont_care=False):
+    """
+    Smallest {(network, prefix length): next hop} table with the same
+    longest-prefix-match forwarding as `routes`. Rules with next hop MISS
+    may appear (without dont_care) where a decision-less hole sits inside
+    an aggregated prefix; they must send to the controller.
+    """
+    root = [None, None, _UNSET, None]
+    for (network, plen), nh in routes.items():
+        _insert(root, network, plen, nh)
+    _up(root, MISS, dont_care)
+    out = {}
+    _down(root, 0, 0, MISS, out)
+    return out
+
+
+def lookup(rules, address):
+    # Longest prefix match of address in a rules table; MISS if none matches
+    for plen in range(32, -1, -1):
+        mask = (0xffffffff << (32 - plen)) & 0xffffffff
+        nh = rules.get((address & mask, plen), _UNSET)
+        if nh is not _UNSET:
+            return nh
+    return MISS
+
+
+def diff(installed, wanted):
+    """
+    Changes that turn the `installed` rules into `wanted`: (add, delete),
+    both {(network, prefix length): next hop}. Rules whose next hop
+    changes are in add only (an OFPFC_ADD with the same match replaces).
+    """
+    add = {p: nh for p, nh in wanted.items() if installed.get(p, _UNSET) != nh}
+    delete = {p: nh for p, nh in installed.items() if p not in wanted}
+    return add, delete
+
+
+def mask_of(plen):
+    # Prefix length -> dotted netmask
+    value = (0xffffffff << (32 - plen)) & 0xffffffff
+    return '.'.join(str(value >> s & 0xff) for s in (24, 16, 8, 0))
@@ -32,36 +32,136 @@ from ryu.lib.packet import packet
 from ryu.lib.packet import ipv4
 from ryu.lib.packet import arp
 
-from ryu.topology import event, switches
-from ryu.topology.api import get_switch, get_link
-from ryu.app.wsgi import ControllerBase
+from ryu.app.wsgi import WSGIApplication
+
+from ryu.lib import hub
 
 import topo
+import routing
+import flowbatch
+import snapshot
+import hedera
+import metrics
+import pktrace
+import pktparse
+from addressing import Addressing
+import os
+
+# Proactive two-level routing: the full tables are installed when a switch
+# connects, so steady-state traffic never reaches the controller
+PROACTIVE = os.environ.get("FT_PROACTIVE", "1") == "1"
+# Snapshot: the fabric from a snapshot.py file instead of the k=FT_K one;
+# either has to match the network's (fat-tree.py --k)
+SNAPSHOT = os.environ.get("FT_SNAPSHOT", "")
+K = int(os.environ.get("FT_K", "4"))
+# Elephants (Hedera): edge switches count every flow of their hosts (the
+# two-level tables move to table 1) and their flow stats are polled every
+# FT_POLL seconds; flows above FT_ELEPHANT of a FT_LINK_MBPS link get a
+# path of their own by Global First Fit, as 5-tuple rules above the
+# tables. Counting rules and paths go after FT_FLOW_IDLE idle seconds.
+ELEPHANTS = os.environ.get("FT_ELEPHANTS", "0") == "1" and PROACTIVE
+POLL_INTERVAL = float(os.environ.get("FT_POLL", "5"))
+ELEPHANT = float(os.environ.get("FT_ELEPHANT", "0.1"))
+LINK_MBPS = float(os.environ.get("FT_LINK_MBPS", "15"))
+FLOW_IDLE = int(os.environ.get("FT_FLOW_IDLE", "10"))
+# Metrics: as SP_METRICS of sp_routing.py (/metrics, /metrics/profile;
+# FT_METRICS_FILE every FT_METRICS_INTERVAL seconds)
+METRICS = metrics.Registry(os.environ.get("FT_METRICS", "0") == "1")
+METRICS_FILE = os.environ.get("FT_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("FT_METRICS_INTERVAL", "5"))
+# Trace: as SP_TRACE, every packet-in appended to the file FT_TRACE
+TRACE = pktrace.Capture(os.environ.get("FT_TRACE", ""))
+
+ROUTE_TABLE = 1         # two-level tables of edge switches with ELEPHANTS
+PASS_PRIORITY = 1       # edge table 0: ARP and traffic from the aggs on to them
+FLOW_PRIORITY = 40      # edge table 0: a host's flow, counted
+ELEPHANT_PRIORITY = 50  # an elephant's path, above the two-level tables
+FLOW_COOKIE = 0x1       # counting rules, the ones flow stats are asked for
+
+
+def flow_match(parser, key):
+    # OFPMatch of a 5-tuple from pktparse.flow_key()
+    src, dst, proto, sport, dport = key
+    fields = {'eth_type': 0x0800, 'ipv4_src': src, 'ipv4_dst': dst, 'ip_proto': proto}
+    if proto == pktparse.IP_PROTO_TCP:
+        fields.update(tcp_src=sport, tcp_dst=dport)
+    elif proto == pktparse.IP_PROTO_UDP:
+        fields.update(udp_src=sport, udp_dst=dport)
+    return parser.OFPMatch(**fields)
+
+
+def match_flow(match):
+    # 5-tuple of an OFPMatch from flow_match()
+    proto = match['ip_proto']
+    if proto == pktparse.IP_PROTO_TCP:
+        ports = match['tcp_src'], match['tcp_dst']
+    elif proto == pktparse.IP_PROTO_UDP:
+        ports = match['udp_src'], match['udp_dst']
+    else:
+        ports = 0, 0
+    return (match['ipv4_src'], match['ipv4_dst'], proto) + ports
 
 
 class FTRouter(app_manager.RyuApp):
 
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
+    _CONTEXTS = {'wsgi': WSGIApplication} if METRICS.enabled else {}
 
     def __init__(self, *args, **kwargs):
         super(FTRouter, self).__init__(*args, **kwargs)
         
-        # Initialize the topology with #ports=4
-        self.topo_net = topo.Fattree(4)
+        # Initialize the topology with #ports=FT_K, or from the snapshot
+        if SNAPSHOT:
+            with snapshot.Snapshot(SNAPSHOT) as snap:
+                self.set_fattree(snap.fattree())
+        else:
+            self.set_fattree(topo.Fattree(K))
+        self.batcher = flowbatch.FlowBatcher()
+        self.datapaths = {}     # dpid -> datapath
+        self.flows = {}         # 5-tuple -> (bytes, time, rate) of counted flows
+        self.elephants = {}     # 5-tuple -> (path, demand) of the placed ones
+        self.reserved = {}      # (node, node) -> demand placed on the link
+
+        if ELEPHANTS:
+            self.stats_thread = hub.spawn(self._poll_flow_stats)
+        if METRICS.enabled:
+            self.register_metrics(kwargs.get('wsgi'))
+        if TRACE.enabled:
+            TRACE.start(self.topo_net.num_ports)
+            self.trace_thread = hub.spawn(TRACE.run, hub.sleep)
 
-    # Topology discovery
-    @set_ev_cls(event.EventSwitchEnter)
-    def get_topology_data(self, ev):
+    def register_metrics(self, wsgi=None):
+        # What /metrics and the snapshot file report besides the latencies
+        batcher = self.batcher
+        METRICS.counter('flow_mods', lambda: batcher.flow_mods)
+        METRICS.counter('messages', lambda: batcher.messages)
+        METRICS.counter('writes', lambda: batcher.writes)
+        METRICS.gauge('switches', lambda: len(self.datapaths))
+        METRICS.gauge('rules', lambda: sum(len(rules) for rules in batcher.sent.values()))
+        METRICS.gauge('counted_flows', lambda: len(self.flows))
+        METRICS.gauge('elephants', lambda: len(self.elephants))
+        self.metrics_thread = hub.spawn(METRICS.run, METRICS_FILE, METRICS_INTERVAL, hub.sleep)
+        if wsgi is not None:
+            wsgi.register(metrics.MetricsController, {
+                'registry': METRICS, 'sleep': hub.sleep,
+                'profile_path': os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                             "ft_routing.prof")})
 
-        # Switches and links in the network
-        switches = get_switch(self, None)
-        links = get_link(self, None)
+    def set_fattree(self, ft_topo):
+        self.topo_net = ft_topo
+        self.addr = Addressing(ft_topo)
+        # dpid -> [(priority, ip, mask, out_port)]
+        self.tables = routing.two_level_tables(ft_topo) if PROACTIVE else {}
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    @METRICS.timed('switch_features')
     def switch_features_handler(self, ev):
         datapath = ev.msg.datapath
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
+        self.batcher.reset(datapath.id)
+        self.datapaths[datapath.id] = datapath
+        self.forget_switch(datapath.id)
 
         # Install entry-miss flow entry
         match = parser.OFPMatch()
@@ -69,19 +169,81 @@ class FTRouter(app_manager.RyuApp):
                                           ofproto.OFPCML_NO_BUFFER)]
         self.add_flow(datapath, 0, match, actions)
 
+        # Edge switches count their hosts' flows in table 0 (misses come to
+        # the controller), everything else goes on to the tables
+        table_id = 0
+        if ELEPHANTS and self.addr.is_edge_dpid(datapath.id):
+            table_id = ROUTE_TABLE
+            self.add_flow(datapath, 0, match, actions, table_id)
+            self.add_flow(datapath, PASS_PRIORITY, parser.OFPMatch(eth_type=0x0806), [],
+                          goto=ROUTE_TABLE)
+            for port in range(1, self.addr.half + 1):
+                self.add_flow(datapath, PASS_PRIORITY, parser.OFPMatch(in_port=port), [],
+                              goto=ROUTE_TABLE)
+
+        # Prefix/suffix tables, for IPv4 by destination and for ARP by target
+        for priority, ip, mask, out_port in self.tables.get(datapath.id, []):
+            actions = [parser.OFPActionOutput(out_port)]
+            match = parser.OFPMatch(eth_type=0x0800, ipv4_dst=(ip, mask))
+            self.add_flow(datapath, priority, match, actions, table_id)
+            match = parser.OFPMatch(eth_type=0x0806, arp_tpa=(ip, mask))
+            self.add_flow(datapath, priority, match, actions, table_id)
+
+        # the whole table in one write, closed by a barrier
+        self.batcher.flush()
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def _barrier_reply_handler(self, ev):
+        self.batcher.barrier_reply(ev.msg.datapath, ev.msg.xid)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    @METRICS.timed('flow_removed')
+    def _flow_removed_handler(self, ev):
+        # A rule idled out (or was deleted): it may be installed again; a
+        # counted flow is over, its path's reservation goes with it
+        msg = ev.msg
+        self.batcher.removed(msg.datapath.id, msg.table_id, msg.priority, msg.match)
+        if msg.cookie == FLOW_COOKIE:
+            key = match_flow(msg.match)
+            self.flows.pop(key, None)
+            placed = self.elephants.pop(key, None)
+            if placed is not None:
+                hedera.release(self.reserved, *placed)
+
+    def forget_switch(self, dpid):
+        # dpid (re)connected empty: its counters start over and the
+        # elephants through it are placed anew
+        node = self.addr.index_of_dpid(dpid)
+        if self.addr.is_edge_dpid(dpid):
+            for key in [k for k in self.flows if self.addr.edge_dpid_of_ip(k[0]) == dpid]:
+                del self.flows[key]
+        for key, (path, demand) in list(self.elephants.items()):
+            if node in path:
+                del self.elephants[key]
+                hedera.release(self.reserved, path, demand)
+
     # Add a flow entry to the flow-table
-    def add_flow(self, datapath, priority, match, actions):
+    @METRICS.timed('add_flow')
+    def add_flow(self, datapath, priority, match, actions, table_id=0, goto=None,
+                 idle_timeout=0, cookie=0):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # Construct flow_mod message and send it
+        # Construct flow_mod message and queue it; sent with the next flush.
+        # Rules that can idle out report it (EventOFPFlowRemoved).
         inst = [parser.OFPInstructionActions(
-            ofproto.OFPIT_APPLY_ACTIONS, actions)]
-        mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
+            ofproto.OFPIT_APPLY_ACTIONS, actions)] if actions else []
+        if goto is not None:
+            inst.append(parser.OFPInstructionGotoTable(goto))
+        flags = ofproto.OFPFF_SEND_FLOW_REM if idle_timeout else 0
+        mod = parser.OFPFlowMod(datapath=datapath, table_id=table_id, priority=priority,
+                                idle_timeout=idle_timeout, flags=flags, cookie=cookie,
                                 match=match, instructions=inst)
-        datapath.send_msg(mod)
+        self.batcher.add(datapath, mod)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @TRACE.captured
+    @METRICS.timed('packet_in')
     def _packet_in_handler(self, ev):
         msg = ev.msg
         datapath = msg.datapath
@@ -89,4 +251,109 @@ class FTRouter(app_manager.RyuApp):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # TODO: handle new packets at the controller
+        # A new flow from a host at its edge switch: a rule to count it,
+        # then the packet goes through the tables behind it
+        in_port = msg.match['in_port']
+        if not ELEPHANTS or not self.addr.is_edge_dpid(dpid) or in_port <= self.addr.half:
+            return
+        key = pktparse.flow_key(msg.data)
+        if key is None:
+            return
+        self.add_flow(datapath, FLOW_PRIORITY, flow_match(parser, key), [], goto=ROUTE_TABLE,
+                      idle_timeout=FLOW_IDLE, cookie=FLOW_COOKIE)
+        data = msg.data if msg.buffer_id == ofproto.OFP_NO_BUFFER else None
+        out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id, in_port=in_port,
+                                  actions=[parser.OFPActionOutput(ofproto.OFPP_TABLE)],
+                                  data=data)
+        self.batcher.send_after(datapath, out, [dpid])
+        self.batcher.flush()
+
+    # ================= ELEPHANT FLOWS =================
+    def _poll_flow_stats(self):
+        # Ask the edge switches for their counters, schedule on the replies
+        while True:
+            self.request_flow_stats([dp for dpid, dp in self.datapaths.items()
+                                     if self.addr.is_edge_dpid(dpid)])
+            hub.sleep(POLL_INTERVAL)
+            self.schedule()
+
+    def request_flow_stats(self, datapaths):
+        for datapath in datapaths:
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            datapath.send_msg(parser.OFPFlowStatsRequest(
+                datapath, 0, 0, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                FLOW_COOKIE, 0xffffffffffffffff, parser.OFPMatch()))
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    @METRICS.timed('flow_stats')
+    def _flow_stats_reply_handler(self, ev):
+        # Rate of every counted flow since the previous sample (since the
+        # rule went in for the first one), as a fraction of a link; the
+        # rules' durations time the samples
+        capacity = LINK_MBPS * 1e6
+        for stat in ev.msg.body:
+            if stat.cookie != FLOW_COOKIE:
+                continue
+            key = match_flow(stat.match)
+            t = stat.duration_sec + stat.duration_nsec * 1e-9
+            bytes_, since, rate = self.flows.get(key, (0, 0.0, 0.0))
+            if t > since and stat.byte_count >= bytes_:
+                rate = (stat.byte_count - bytes_) * 8 / (t - since) / capacity
+            self.flows[key] = (stat.byte_count, t, rate)
+
+    @METRICS.timed('schedule')
+    def schedule(self):
+        """
+        Places the elephants: counted flows above ELEPHANT that have no
+        path yet get one by Global First Fit over the demands estimated
+        for all elephants, as 5-tuple rules. Flows below one edge switch
+        have no choice and stay on the tables. Returns {5-tuple: path}
+        of the flows placed.
+        """
+        addr = self.addr
+        hosts = {}
+        for key in sorted(set(k for k, f in self.flows.items() if f[2] >= ELEPHANT)
+                          | set(self.elephants)):
+            src = addr.host_of_ip(key[0])
+            dst = addr.host_of_ip(key[1])
+            if src is not None and dst is not None:
+                hosts[key] = (src, dst)
+        demands = hedera.estimate_demands(hosts)
+        neighbors = self.topo_net.neighbors
+        new = {key: ends for key, ends in hosts.items() if key not in self.elephants
+               and neighbors(ends[0])[0] != neighbors(ends[1])[0]}
+        placed = hedera.global_first_fit(self.topo_net, new, demands, self.reserved)
+        for key, path in placed.items():
+            self.elephants[key] = (path, demands[key])
+            self.install_elephant(key, path)
+        self.batcher.flush()
+        return placed
+
+    def install_elephant(self, key, path):
+        # 5-tuple rules along path (node indices host to host); the
+        # counting rule at the source edge switch turns to the path last,
+        # once the rules behind it are in
+        addr = self.addr
+        downstream = []
+        for u, v in zip(path[2:-1], path[3:]):
+            datapath = self.datapaths.get(addr.dpid(u))
+            if datapath is None:
+                continue
+            parser = datapath.ofproto_parser
+            self.add_flow(datapath, ELEPHANT_PRIORITY, flow_match(parser, key),
+                          [parser.OFPActionOutput(addr.port(u, v))],
+                          idle_timeout=FLOW_IDLE)
+            downstream.append(datapath.id)
+        datapath = self.datapaths.get(addr.dpid(path[1]))
+        if datapath is None:
+            return
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        actions = [parser.OFPActionOutput(addr.port(path[1], path[2]))]
+        mod = parser.OFPFlowMod(datapath=datapath, cookie=FLOW_COOKIE,
+                                command=ofproto.OFPFC_MODIFY_STRICT, priority=FLOW_PRIORITY,
+                                match=flow_match(parser, key), instructions=[
+                                    parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS,
+                                                                 actions)])
+        self.batcher.send_after(datapath, mod, downstream)
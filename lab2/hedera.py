@@ -0,0 +1,143 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Elephant flow scheduling of Hedera (Al-Fares et al., NSDI 2010) on a
+# topo.Fattree, for FTRouter.
+#
+# A flow's measured rate says little about what it could send: two flows
+# sharing a core link both measure half a link. estimate_demands() finds
+# the rates the flows would get if only the hosts' links limited them,
+# global_first_fit() then gives each flow the first equal-cost path with
+# that much room left on every link and reserves it there. Demands and
+# capacities are fractions of a link (all fat-tree links are alike).
+# Links are (node index, node index) pairs, directed.
+
+EPSILON = 1e-9
+MAX_ROUNDS = 1000
+
+
+def estimate_demands(flows):
+    """
+    Natural demand of every flow, as a fraction of a host's link. Senders
+    share their link equally among their flows that are not limited by
+    the receiver; a receiver asked for more than its link gives its flows
+    an equal share, flows asking less than that keeping theirs. Repeated
+    until nothing changes.
+
+    flows: {key: (src host, dst host)}. Returns {key: demand}.
+    """
+    by_src = {}
+    by_dst = {}
+    for key, (src, dst) in flows.items():
+        by_src.setdefault(src, []).append(key)
+        by_dst.setdefault(dst, []).append(key)
+    demand = dict.fromkeys(flows, 0.0)
+    limited = set()     # receiver-limited flows: their demand is final
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        for keys in by_src.values():
+            free = [f for f in keys if f not in limited]
+            if not free:
+                continue
+            share = max(1.0 - sum(demand[f] for f in keys if f in limited), 0.0) / len(free)
+            for f in free:
+                if abs(demand[f] - share) > EPSILON:
+                    demand[f] = share
+                    changed = True
+        for keys in by_dst.values():
+            if sum(demand[f] for f in keys) <= 1.0 + EPSILON:
+                continue
+            # flows below the equal share keep their demand, the rest get it
+            over = set(keys)
+            below = 0.0
+            while True:
+                share = (1.0 - below) / len(over)
+                small = [f for f in over if demand[f] < share - EPSILON]
+                if not small:
+                    break
+                below += sum(demand[f] for f in small)
+                over.difference_update(small)
+            for f in over:
+                if f not in limited or abs(demand[f] - share) > EPSILON:
+                    demand[f] = share
+                    limited.add(f)
+                    changed = True
+        if not changed:
+            break
+    return demand
+
+
+def paths(ft_topo, src, dst):
+    """
+    Equal-cost paths between hosts src and dst as node index lists, host
+    to host: through every core switch (in core order) between pods,
+    every aggregation switch within a pod, the one path below an edge
+    switch.
+    """
+    ft = ft_topo
+    half = ft.num_ports // 2
+    ps, pd = ft.pods[src], ft.pods[dst]
+    src_edge = ft.edge_index(ps, ft.subs[src])
+    dst_edge = ft.edge_index(pd, ft.subs[dst])
+    if ps != pd:
+        return [[src, src_edge, ft.agg_index(ps, c // half), ft.core_index(c),
+                 ft.agg_index(pd, c // half), dst_edge, dst] for c in range(half * half)]
+    if src_edge != dst_edge:
+        return [[src, src_edge, ft.agg_index(ps, a), dst_edge, dst] for a in range(half)]
+    return [[src, src_edge, dst]]
+
+
+def fits(reserved, path, demand, capacity=1.0):
+    return all(reserved.get(link, 0.0) + demand <= capacity + EPSILON
+               for link in zip(path, path[1:]))
+
+
+def reserve(reserved, path, demand):
+    for link in zip(path, path[1:]):
+        reserved[link] = reserved.get(link, 0.0) + demand
+
+
+def release(reserved, path, demand):
+    for link in zip(path, path[1:]):
+        left = reserved.get(link, 0.0) - demand
+        if left > EPSILON:
+            reserved[link] = left
+        else:
+            reserved.pop(link, None)
+
+
+def global_first_fit(ft_topo, flows, demands, reserved, capacity=1.0):
+    """
+    Global First Fit: each flow, in the order of flows {key: (src host,
+    dst host)}, takes the first of its paths() that has room for its
+    demand on every link; the demand is reserved there. reserved
+    {link: demand} is updated in place. Returns {key: path}; flows no
+    path has room for are left out (they stay on the default routes).
+    """
+    placed = {}
+    for key, (src, dst) in flows.items():
+        demand = demands[key]
+        for path in paths(ft_topo, src, dst):
+            if fits(reserved, path, demand, capacity):
+                reserve(reserved, path, demand)
+                placed[key] = path
+                break
+    return placed
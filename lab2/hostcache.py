@@ -0,0 +1,121 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+# Bounded host-location cache for the Ryu apps.
+#
+# Entries live for `ttl` seconds after they were last learned and at most
+# `maxsize` of them are kept, the least recently used one going first.
+# Whoever holds derived state (flow rules for the host) is told through
+# on_evict(key, value) when an entry expires or is pushed out; pop() is
+# for the caller's own removals and tells nobody.
+
+import collections
+import time
+
+
+class HostCache(object):
+    """
+    Dict-like {key: value} with LRU order and a per-entry TTL. Lookups
+    (get, in, []) refresh the LRU position but not the TTL, only storing
+    a value again does. Expired entries are dropped when they are looked
+    up or reach the LRU end, and by expire().
+    """
+
+    def __init__(self, maxsize, ttl, on_evict=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl          # seconds, 0 = no expiry
+        self.on_evict = on_evict
+        self.clock = clock
+        self.entries = collections.OrderedDict()    # key -> [value, expires]
+        self.evictions = 0      # pushed out by the size bound
+        self.expirations = 0    # dropped after the TTL
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        expires = self.clock() + self.ttl if self.ttl else None
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry[0], entry[1] = value, expires
+            self.entries.move_to_end(key)
+        else:
+            self.entries[key] = [value, expires]
+        self._trim()
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        if entry[1] is not None and entry[1] <= self.clock():
+            self._drop(key)
+            self.expirations += 1
+            return default
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def items(self):
+        return [(key, entry[0]) for key, entry in self.entries.items()]
+
+    def expire(self):
+        # Drop every expired entry; returns how many
+        now = self.clock()
+        dead = [key for key, entry in self.entries.items()
+                if entry[1] is not None and entry[1] <= now]
+        for key in dead:
+            self._drop(key)
+        self.expirations += len(dead)
+        return len(dead)
+
+    def _trim(self):
+        # Expired entries at the LRU end, then whatever exceeds maxsize
+        now = self.clock()
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry[1] is not None and entry[1] <= now:
+                self.expirations += 1
+            elif len(self.entries) > self.maxsize:
+                self.evictions += 1
+            else:
+                break
+            self._drop(key)
+
+    def _drop(self, key):
+        value = self.entries.pop(key)[0]
+        if self.on_evict is not None:
+            self.on_evict(key, value)
@@ -0,0 +1,76 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Link utilization of the switch ports from their statistics.
+#
+# Every OFPPortStatsReply entry carries a port's cumulative tx_bytes and
+# how long the port exists (duration). The bytes sent since the previous
+# sample over the time between the two are a rate, as a fraction of the
+# link capacity; it is smoothed with an exponentially weighted moving
+# average,
+#     util = alpha * sample + (1 - alpha) * util
+# so one busy or idle interval does not swing the routing decisions. The
+# switch's own times are used, so how late the controller polls or gets
+# to the reply does not distort the rates.
+
+
+class LinkLoad(object):
+    """
+    EWMA utilization of every (dpid, port) from samples of its tx byte
+    counter; the load of the link that leaves dpid on port. Ports never
+    sampled twice count as idle.
+    """
+
+    def __init__(self, capacity, alpha=0.5):
+        self.capacity = capacity    # bits/s of every link
+        self.alpha = alpha
+        self.samples = {}           # dpid -> {port: (tx_bytes, time)}
+        self.util = {}              # dpid -> {port: utilization, 1.0 = full}
+        self.updates = 0
+
+    def update(self, dpid, port, tx_bytes, t):
+        # Sample of port at time t (seconds, any origin per port); returns
+        # the new utilization, None if there is nothing to compare it with
+        samples = self.samples.setdefault(dpid, {})
+        prev = samples.get(port)
+        samples[port] = (tx_bytes, t)
+        if prev is None or t <= prev[1] or tx_bytes < prev[0]:
+            return None     # first sample, or the port was added again
+        sample = (tx_bytes - prev[0]) * 8 / (t - prev[1]) / self.capacity
+        ports = self.util.setdefault(dpid, {})
+        old = ports.get(port)
+        util = sample if old is None else self.alpha * sample + (1 - self.alpha) * old
+        ports[port] = util
+        self.updates += 1
+        return util
+
+    def utilization(self, dpid, port):
+        return self.util.get(dpid, {}).get(port, 0.0)
+
+    def forget(self, dpid):
+        # The switch reconnected: its counters start over
+        self.samples.pop(dpid, None)
+        self.util.pop(dpid, None)
+
+    def hottest(self, n=1):
+        # [(utilization, dpid, port)] of the n most loaded ports
+        return sorted(((u, dpid, port) for dpid, ports in self.util.items()
+                       for port, u in ports.items()), reverse=True)[:n]
@@ -0,0 +1,164 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Controller logging that stays off the event loop.
+#
+# Records are queued as they are (message template + args, not formatted)
+# and a background OS thread formats and writes them to the log file.
+# DEBUG records are rate-limited per call site, so per-packet output can
+# stay in the code without flooding the file at high packet-in rates.
+#
+#   SP_LOG_LEVEL   logger level (default INFO; DEBUG for per-packet records)
+#   SP_LOG_RATE    DEBUG records per second and call site (default 10, 0 = all)
+
+import atexit
+import logging
+import logging.handlers
+import os
+import time
+
+try:
+    # ryu-manager monkey patches threading/queue: take the originals so the
+    # writer is a real thread and file I/O never blocks the green threads
+    from eventlet import patcher
+    _threading = patcher.original('threading')
+    _queue = patcher.original('queue')
+except ImportError:
+    import threading as _threading
+    import queue as _queue
+
+QUEUE_SIZE = 10000
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (file, line) for records at or below
+    `level`: `rate` records per second with bursts of `burst`. The next
+    record let through reports how many were suppressed.
+    """
+
+    def __init__(self, rate, burst=None, level=logging.DEBUG):
+        super(RateLimitFilter, self).__init__()
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.level = level
+        self.buckets = {}    # (pathname, lineno) -> [tokens, last, suppressed]
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = f"{record.msg} (+%d suppressed)"
+            record.args = tuple(record.args or ()) + (bucket[2],)
+            bucket[2] = 0
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The stdlib
+    one formats in prepare(), i.e. on the caller's thread. Arguments must
+    therefore not be mutated after the call; pass scalars, not live dicts.
+    A full queue drops the record instead of blocking.
+    """
+
+    def __init__(self, queue):
+        super(LazyQueueHandler, self).__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            # tracebacks must be rendered while they still exist
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except _queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+
+    def start(self):
+        self._thread = _threading.Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+
+def setup_logger(name, log_file, level=None, rate=None):
+    """
+    Logger `name` writing to `log_file` through a queue and a background
+    thread. Level and DEBUG rate limit come from SP_LOG_LEVEL/SP_LOG_RATE
+    unless given. Calling it again for the same name returns the logger
+    unchanged.
+    """
+    logger = logging.getLogger(name)
+    if getattr(logger, 'listener', None) is not None:
+        return logger
+
+    level = level or os.environ.get("SP_LOG_LEVEL", "INFO").upper()
+    rate = float(os.environ.get("SP_LOG_RATE", "10")) if rate is None else rate
+    logger.setLevel(level)
+
+    fh = logging.FileHandler(log_file, delay=True)
+    fh.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    queue = _queue.Queue(QUEUE_SIZE)
+    handler = LazyQueueHandler(queue)
+    handler.addFilter(RateLimitFilter(rate))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    logger.listener = _Listener(queue, fh)
+    logger.listener.start()
+    atexit.register(logger.listener.stop)
+    return logger
+
+
+def flush(logger, timeout=5.0):
+    # Wait until the writer thread has caught up (tests, benchmarks, dumps)
+    listener = getattr(logger, 'listener', None)
+    if listener is None:
+        return
+    queue = listener.queue
+    with queue.all_tasks_done:
+        deadline = time.monotonic() + timeout
+        while queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            queue.all_tasks_done.wait(remaining)
+    for h in listener.handlers:
+        h.flush()
@@ -0,0 +1,250 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+# Counters, latency histograms and table sizes of a controller, for a
+# REST endpoint and a snapshot file.
+#
+#   SP_METRICS=1 ryu-manager sp_routing.py       (FT_METRICS=1 for ft_routing.py)
+#   curl localhost:8080/metrics                  JSON snapshot
+#   curl 'localhost:8080/metrics/profile?seconds=10'
+#                                                cProfile of the next 10 s
+#
+# Registry.timed() wraps a handler so every call adds its duration to a
+# fixed-bucket histogram: bucket i counts calls of less than 2**i us (the
+# bit length of the duration in us), the last one everything slower.
+# Adding a sample is two clock reads and a list increment. With the
+# registry disabled timed() returns the handler itself, so an
+# uninstrumented controller runs exactly the code it did before.
+# Counters and gauges are pulled when a snapshot is taken: counters are
+# monotonic totals (flow-mods sent) that get a rate per interval, gauges
+# are current sizes (routes, hosts, rules). run() ticks the rates every
+# interval and rewrites the snapshot file.
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+
+from ryu.app.wsgi import ControllerBase, Response, route
+
+BUCKETS = 22        # < 1 us, < 2 us, ... < 2**20 us (~1 s), slower
+PROFILE_LINES = 40
+
+
+class Histogram(object):
+    """
+    Call durations in power-of-two microsecond buckets, with their count,
+    sum and maximum.
+    """
+
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        i = int(seconds * 1e6).bit_length()
+        self.counts[i if i < BUCKETS else BUCKETS - 1] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        # Upper bound (seconds) of the bucket the q-quantile falls in
+        n = self.count
+        if not n:
+            return 0.0
+        rank = q * n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.max if i == BUCKETS - 1 else min(2 ** i * 1e-6, self.max)
+        return self.max
+
+    def snapshot(self):
+        n = self.count
+        return {
+            'count': n,
+            'mean_us': self.total / n * 1e6 if n else 0.0,
+            'p50_us': self.quantile(0.5) * 1e6,
+            'p99_us': self.quantile(0.99) * 1e6,
+            'max_us': self.max * 1e6,
+            'total_s': self.total,
+            # bucket upper bounds in us -> calls; 'inf' for the last one
+            'buckets': {('inf' if i == BUCKETS - 1 else str(2 ** i)): c
+                        for i, c in enumerate(self.counts) if c},
+        }
+
+
+class Registry(object):
+    """
+    The metrics of one controller. Disabled, timed() leaves functions as
+    they are and nothing is collected.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.histograms = {}    # name -> Histogram
+        self.counters = {}      # name -> callable, monotonic total
+        self.gauges = {}        # name -> callable, current value
+        self.rates = {}         # name -> per second over the last interval
+        self.interval = None
+        self._last = None       # (time, {name: total}) of the previous tick
+        self.profiling = False
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        return hist
+
+    def timed(self, name):
+        # Decorator: the duration of every call goes to histogram name
+        if not self.enabled:
+            return lambda fn: fn
+        hist = self.histogram(name)
+        clock = time.perf_counter
+
+        def decorate(fn):
+            @functools.wraps(fn)
+            def timed_call(*args, **kwargs):
+                start = clock()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    hist.add(clock() - start)
+            return timed_call
+        return decorate
+
+    def counter(self, name, fn):
+        self.counters[name] = fn
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def totals(self):
+        # Every counter and histogram call count (as name.calls)
+        totals = {name: fn() for name, fn in self.counters.items()}
+        totals.update((name + '.calls', h.count) for name, h in self.histograms.items())
+        return totals
+
+    def tick(self, now=None):
+        # Rates over the time since the previous tick
+        now = time.monotonic() if now is None else now
+        totals = self.totals()
+        if self._last is not None and now > self._last[0]:
+            t, last = self._last
+            self.interval = now - t
+            self.rates = {name: (v - last.get(name, 0)) / self.interval
+                          for name, v in totals.items()}
+        self._last = (now, totals)
+
+    def snapshot(self):
+        return {
+            'time': time.time(),
+            'uptime_s': time.time() - self.started,
+            'interval_s': self.interval,
+            'counters': self.totals(),
+            'rates': self.rates,
+            'gauges': {name: fn() for name, fn in self.gauges.items()},
+            'latency': {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+    def write(self, path):
+        # The snapshot as JSON, replaced atomically
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+
+    def run(self, path, interval, sleep):
+        # Periodic thread: tick, then rewrite path (if any), every interval
+        self.tick()
+        while True:
+            sleep(interval)
+            self.tick()
+            if path:
+                try:
+                    self.write(path)
+                except OSError:
+                    pass
+
+    def profile(self, seconds, sleep, path=None):
+        """
+        cProfile of everything the process runs for the next seconds (the
+        whole event loop: sleep must let the other green threads run).
+        Returns the top functions by cumulative time as text, and saves
+        the raw stats to path if given. None if a profile is running.
+        """
+        if self.profiling:
+            return None
+        self.profiling = True
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+            sleep(seconds)
+        finally:
+            prof.disable()
+            self.profiling = False
+        if path:
+            prof.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(prof, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        return out.getvalue()
+
+
+class MetricsController(ControllerBase):
+    # REST endpoint of a Registry; data: {'registry', 'sleep', 'profile_path'}
+
+    def __init__(self, req, link, data, **config):
+        super(MetricsController, self).__init__(req, link, data, **config)
+        self.registry = data['registry']
+        self.sleep = data['sleep']
+        self.profile_path = data.get('profile_path')
+
+    @route('metrics', '/metrics', methods=['GET'])
+    def get_metrics(self, req, **kwargs):
+        body = json.dumps(self.registry.snapshot(), indent=1, sort_keys=True)
+        return Response(content_type='application/json', body=body.encode())
+
+    @route('metrics', '/metrics/profile', methods=['GET'])
+    def get_profile(self, req, **kwargs):
+        try:
+            seconds = float(req.params.get('seconds', 5))
+        except ValueError:
+            return Response(status=400, body=b'seconds must be a number\n')
+        text = self.registry.profile(min(max(seconds, 0.1), 300), self.sleep,
+                                     self.profile_path)
+        if text is None:
+            return Response(status=409, body=b'a profile is already running\n')
+        return Response(content_type='text/plain', body=text.encode())
@@ -0,0 +1,181 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Packet-in header parsing for the routers.
+#
+# The controllers only need the ethertype and the IPv4 source/destination
+# (of an IPv4 packet or an ARP message). parse_headers() reads those at
+# fixed offsets of msg.data without building ryu.lib.packet objects, and
+# falls back to the full parser for frames it does not know the layout of.
+# arp_message()/arp_frame() read and build untagged Ethernet/IPv4 ARP for
+# the controller's ARP responder. flow_key() reads the 5-tuple FTRouter
+# counts flows by.
+
+import socket
+import struct
+
+from ryu.lib.packet import packet, arp, ipv4
+
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_ARP = 0x0806
+ETH_TYPE_LLDP = 0x88cc
+VLAN_TPIDS = (0x8100, 0x88a8, 0x9100)
+MAX_VLAN_TAGS = 2
+
+_ETH_HLEN = 14
+_u16 = struct.Struct('!H').unpack_from
+# ARP for Ethernet/IPv4: htype, ptype, hlen, plen, opcode
+_ARP_FIXED = struct.Struct('!HHBBH')
+_ARP_ETH_IP = (1, ETH_TYPE_IP, 6, 4)
+_inet_ntoa = socket.inet_ntoa
+_inet_aton = socket.inet_aton
+
+ARP_REQUEST = 1
+ARP_REPLY = 2
+_ARP_FRAME = struct.Struct('!6s6sHHHBBH6s4s6s4s')
+BROADCAST = b'\xff' * 6
+
+
+def parse_headers(data):
+    """
+    (ethertype, src_ip, dst_ip) of an Ethernet frame. ethertype is the one
+    after any VLAN tags; the IPs are dotted strings for IPv4 and ARP and
+    None for anything else.
+    """
+    result = parse_fast(data)
+    if result is None:
+        result = parse_full(data)
+    return result
+
+
+def parse_fast(data):
+    # Fixed-offset parse; None if the frame needs the full parser
+    # (truncated, not IP version 4, ARP not for Ethernet/IPv4, > 2 VLAN tags)
+    buf = memoryview(data)
+    if len(buf) < _ETH_HLEN:
+        return None
+    off = 12
+    ethertype = _u16(buf, off)[0]
+    tags = 0
+    while ethertype in VLAN_TPIDS:
+        tags += 1
+        off += 4
+        if tags > MAX_VLAN_TAGS or len(buf) < off + 2:
+            return None
+        ethertype = _u16(buf, off)[0]
+    off += 2
+
+    if ethertype == ETH_TYPE_IP:
+        # version/IHL, ..., src at +12, dst at +16 (independent of options)
+        if len(buf) < off + 20:
+            return None
+        vihl = buf[off]
+        if vihl >> 4 != 4 or vihl & 0xf < 5:
+            return None
+        return (ethertype, _inet_ntoa(buf[off + 12:off + 16]),
+                _inet_ntoa(buf[off + 16:off + 20]))
+
+    if ethertype == ETH_TYPE_ARP:
+        # sha at +8, spa at +14, tha at +18, tpa at +24
+        if len(buf) < off + 28:
+            return None
+        if _ARP_FIXED.unpack_from(buf, off)[:4] != _ARP_ETH_IP:
+            return None
+        return (ethertype, _inet_ntoa(buf[off + 14:off + 18]),
+                _inet_ntoa(buf[off + 24:off + 28]))
+
+    return ethertype, None, None
+
+
+def parse_full(data):
+    # Same result through ryu.lib.packet, for the frames parse_fast leaves
+    pkt = packet.Packet(data)
+    arp_pkt = pkt.get_protocol(arp.arp)
+    if arp_pkt:
+        return ETH_TYPE_ARP, arp_pkt.src_ip, arp_pkt.dst_ip
+    ip_pkt = pkt.get_protocol(ipv4.ipv4)
+    if ip_pkt:
+        return ETH_TYPE_IP, ip_pkt.src, ip_pkt.dst
+    ethertype = None
+    for proto in pkt.protocols:
+        if hasattr(proto, 'ethertype'):
+            ethertype = proto.ethertype
+    return ethertype, None, None
+
+
+def arp_message(data):
+    """
+    (opcode, sender MAC, sender IP, target IP) of an untagged Ethernet/IPv4
+    ARP frame, MAC as 6 bytes and IPs as dotted strings; None otherwise.
+    """
+    if len(data) < _ARP_FRAME.size:
+        return None
+    (_, _, ethertype, htype, ptype, hlen, plen, opcode,
+     sha, spa, _, tpa) = _ARP_FRAME.unpack_from(data)
+    if (ethertype, htype, ptype, hlen, plen) != (ETH_TYPE_ARP,) + _ARP_ETH_IP:
+        return None
+    return opcode, sha, _inet_ntoa(spa), _inet_ntoa(tpa)
+
+
+def arp_frame(opcode, src_mac, src_ip, dst_mac, dst_ip):
+    # ARP message from src to dst; dst_mac None for a broadcast request.
+    # MACs as 6 bytes, IPs as dotted strings.
+    eth_dst = dst_mac or BROADCAST
+    return _ARP_FRAME.pack(eth_dst, src_mac, ETH_TYPE_ARP, 1, ETH_TYPE_IP, 6, 4,
+                           opcode, src_mac, _inet_aton(src_ip),
+                           dst_mac or b'\x00' * 6, _inet_aton(dst_ip))
+
+
+def mac_bytes(mac):
+    # 'aa:bb:cc:dd:ee:ff' -> 6 bytes
+    return bytes.fromhex(mac.replace(':', ''))
+
+
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+
+
+def flow_key(data):
+    """
+    (src_ip, dst_ip, ip_proto, src_port, dst_port) of an IPv4 packet, IPs
+    as dotted strings; the ports are 0 unless it is TCP or UDP (and not a
+    later fragment). None for anything else.
+    """
+    buf = memoryview(data)
+    off = 12
+    tags = 0
+    while len(buf) >= off + 2 and _u16(buf, off)[0] in VLAN_TPIDS and tags < MAX_VLAN_TAGS:
+        tags += 1
+        off += 4
+    if len(buf) < off + 22 or _u16(buf, off)[0] != ETH_TYPE_IP:
+        return None
+    off += 2
+    vihl = buf[off]
+    if vihl >> 4 != 4 or vihl & 0xf < 5:
+        return None
+    proto = buf[off + 9]
+    sport = dport = 0
+    l4 = off + (vihl & 0xf) * 4
+    if (proto in (IP_PROTO_TCP, IP_PROTO_UDP) and not _u16(buf, off + 6)[0] & 0x1fff
+            and len(buf) >= l4 + 4):
+        sport, dport = _u16(buf, l4)[0], _u16(buf, l4 + 2)[0]
+    return (_inet_ntoa(buf[off + 12:off + 16]), _inet_ntoa(buf[off + 16:off + 20]),
+            proto, sport, dport)
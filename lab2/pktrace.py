@@ -0,0 +1,142 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+# Packet-in traces: the EventOFPPacketIns a controller handled, for
+# replay.py to feed to it again without Mininet or OVS.
+#
+#   SP_TRACE=ping.trace ryu-manager sp_routing.py    (FT_TRACE for ft_routing.py)
+#   python3 replay.py ping.trace --router sp
+#
+# Capture.captured() wraps the packet-in handler so every event is
+# appended to the trace before it is handled. With capture disabled it
+# returns the handler itself, as metrics.Registry.timed() does. The file
+# is written through a buffer, flushed every FLUSH_INTERVAL seconds by
+# run() and at exit; a record cut short by a crash ends the trace.
+#
+#   header  magic, version, k of the fabric the controller routed
+#   record  time (s since the epoch), dpid, in_port, buffer_id, data
+#           length, then the data (msg.data as received)
+#
+# All big endian.
+
+import atexit
+import collections
+import functools
+import struct
+import time
+
+MAGIC = b'PKTR'
+VERSION = 1
+BUFFER = 1 << 16
+FLUSH_INTERVAL = 1.0
+
+# magic, version, k
+_HEADER = struct.Struct('!4sHH')
+# time, dpid, in_port, buffer_id, data length
+_RECORD = struct.Struct('!dQIII')
+
+Record = collections.namedtuple('Record', 'time dpid in_port buffer_id data')
+
+
+class Capture(object):
+    """
+    Packet-in trace of a controller, written to path. Without a path,
+    captured() leaves handlers as they are and nothing is written.
+    """
+
+    def __init__(self, path=''):
+        self.path = path
+        self.enabled = bool(path)
+        self.file = None
+        self.records = 0
+
+    def start(self, k):
+        # Create the trace (replacing the file) for a fabric of k ports per
+        # switch; only the first call of a process does
+        if self.file is not None:
+            return
+        self.file = open(self.path, 'wb', buffering=BUFFER)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, k))
+        atexit.register(self.close)
+
+    def record(self, t, dpid, in_port, buffer_id, data):
+        f = self.file
+        if f is None:
+            return
+        f.write(_RECORD.pack(t, dpid, in_port, buffer_id, len(data)))
+        f.write(data)
+        self.records += 1
+
+    def captured(self, fn):
+        # Decorator of a packet-in handler fn(app, ev)
+        if not self.enabled:
+            return fn
+        clock = time.time
+
+        @functools.wraps(fn)
+        def captured_call(app, ev):
+            msg = ev.msg
+            self.record(clock(), msg.datapath.id, msg.match['in_port'], msg.buffer_id,
+                        msg.data)
+            return fn(app, ev)
+        return captured_call
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def run(self, sleep=time.sleep, interval=FLUSH_INTERVAL):
+        # Flush loop, for a hub thread (sleep=hub.sleep)
+        while True:
+            sleep(interval)
+            self.flush()
+
+
+def load(path):
+    """
+    (k, [Record]) of the trace file path, records in capture order.
+    Raises ValueError for files that are not a trace of this VERSION.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path}: not a packet-in trace")
+    magic, version, k = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a packet-in trace")
+    if version != VERSION:
+        raise ValueError(f"{path}: trace version {version}, expected {VERSION}")
+    records = []
+    off = _HEADER.size
+    while off + _RECORD.size <= len(data):
+        t, dpid, in_port, buffer_id, length = _RECORD.unpack_from(data, off)
+        off += _RECORD.size
+        if off + length > len(data):
+            break
+        records.append(Record(t, dpid, in_port, buffer_id, data[off:off + length]))
+        off += length
+    return k, records
@@ -0,0 +1,207 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Replay a packet-in trace (pktrace.py, SP_TRACE/FT_TRACE) into a controller.
+#
+#   python3 replay.py ping.trace --router sp
+#   python3 replay.py ping.trace --router ft --speed 1 --record ft.msgs
+#
+# The controller gets stand-in switches (stub_datapath) for the fabric of
+# the trace (--k to override), all connected and the topology known as
+# after LLDP discovery, then every packet-in of the trace in order: as
+# fast as possible (--speed 0) or at the captured timing sped up --speed
+# times. Barriers are answered right after each packet-in, as a switch
+# with nothing else to do would. Reported: events per second of
+# controller time, packet-in handler latency percentiles, and the
+# flow-mods, group-mods and packet-outs the controller sent. --record
+# writes every message sent during the replay, one line each without
+# xids, so the output of two controller versions can be diffed.
+
+import argparse
+import contextlib
+import os
+import time
+
+import topo
+import routing
+import pktrace
+import flowbatch
+from stub_datapath import StubDatapath, stub_datapaths, switch_features_event, \
+    barrier_reply_event, packet_in_event
+from ryu.ofproto import ofproto_v1_3_parser
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def make_router(name, ft_topo):
+    # SPRouter or FTRouter on ft_topo with its logging off
+    if name == 'sp':
+        import sp_routing
+        sp_routing.logger.disabled = True
+        router = sp_routing.SPRouter()
+        router.set_fattree(ft_topo)
+        router.routes.rebuild(routing.fattree_graph(ft_topo))
+    else:
+        import ft_routing
+        router = ft_routing.FTRouter()
+        router.set_fattree(ft_topo)
+    return router
+
+
+def describe(msg):
+    # One line of msg, without its xid
+    parser = ofproto_v1_3_parser
+    if isinstance(msg, parser.OFPFlowMod):
+        return (f"flow_mod command={msg.command} table={msg.table_id} "
+                f"priority={msg.priority} match={sorted(msg.match.items())} "
+                f"effect={flowbatch.FlowBatcher.effect(msg)}")
+    if isinstance(msg, parser.OFPPacketOut):
+        actions = [(a.type, getattr(a, 'port', None), getattr(a, 'group_id', None))
+                   for a in msg.actions]
+        data = len(msg.data) if msg.data is not None else 0
+        return (f"packet_out in_port={msg.in_port} buffer_id={msg.buffer_id} "
+                f"actions={actions} data={data}")
+    if isinstance(msg, parser.OFPGroupMod):
+        buckets = [(b.watch_port, [(a.type, getattr(a, 'port', None)) for a in b.actions])
+                   for b in msg.buckets]
+        return (f"group_mod command={msg.command} type={msg.type} group={msg.group_id} "
+                f"buckets={buckets}")
+    return type(msg).__name__
+
+
+class Replay(object):
+    """
+    A router on stand-in switches, fed packet-ins one at a time. Counts
+    the messages it sends by type and hands them to record(i, dpid, msg)
+    if given (i: the packet-in that caused them, -1 for the connects).
+    """
+
+    def __init__(self, router, ft_topo, record=None):
+        self.router = router
+        self.datapaths = stub_datapaths(ft_topo)
+        self.record = record
+        self.counts = {}
+        self.latencies = []
+        self.busy = 0.0     # controller time: packet-ins and barrier replies
+        for dp in self.datapaths.values():
+            router.switch_features_handler(switch_features_event(dp))
+        self.settle(-1)
+
+    def datapath(self, dpid):
+        # Switches the fabric does not have (a trace of another topology)
+        # come up on first use
+        dp = self.datapaths.get(dpid)
+        if dp is None:
+            dp = self.datapaths[dpid] = StubDatapath(dpid)
+            self.router.switch_features_handler(switch_features_event(dp))
+        return dp
+
+    def packet_in(self, i, rec):
+        ev = packet_in_event(self.datapath(rec.dpid), rec.in_port, rec.data, rec.buffer_id)
+        start = time.perf_counter()
+        self.router._packet_in_handler(ev)
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        self.busy += latency
+        self.settle(i)
+
+    def settle(self, i):
+        # Answer barriers until none is left, then take in (and clear) what
+        # was sent
+        handler = self.router._barrier_reply_handler
+        moved = True
+        while moved:
+            moved = False
+            for dp in self.datapaths.values():
+                while dp.barriers:
+                    moved = True
+                    ev = barrier_reply_event(dp, dp.barriers.pop(0))
+                    start = time.perf_counter()
+                    handler(ev)
+                    self.busy += time.perf_counter() - start
+        for dpid, dp in self.datapaths.items():
+            for msg in dp.sent:
+                name = type(msg).__name__
+                self.counts[name] = self.counts.get(name, 0) + 1
+                if self.record is not None:
+                    self.record(i, dpid, msg)
+            del dp.sent[:]
+
+
+def percentile(values, p):
+    # values sorted
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a packet-in trace into a controller')
+    parser.add_argument('trace')
+    parser.add_argument('--router', choices=('sp', 'ft'), default='sp')
+    parser.add_argument('--k', type=int, help='fat-tree k (default: the trace\'s)')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='times the captured timing, 0 = as fast as possible')
+    parser.add_argument('--record', help='write the messages sent to this file')
+    args = parser.parse_args()
+
+    try:
+        k, records = pktrace.load(args.trace)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    ft_topo = topo.Fattree(args.k or k)
+    with open(args.record, 'w') if args.record else contextlib.nullcontext() as out:
+        record = (lambda i, dpid, msg: out.write(f"{i} {dpid:x} {describe(msg)}\n")) \
+            if out is not None else None
+        router = make_router(args.router, ft_topo)
+        replay = Replay(router, ft_topo, record)
+        connect = dict(replay.counts)
+        replay.counts.clear()
+        start = time.perf_counter()
+        t0 = records[0].time if records else 0.0
+        for i, rec in enumerate(records):
+            if args.speed:
+                wait = (rec.time - t0) / args.speed - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+            replay.packet_in(i, rec)
+        wall = time.perf_counter() - start
+
+    n = len(records)
+    lat = sorted(replay.latencies)
+    span = records[-1].time - t0 if records else 0.0
+    print(f"{os.path.basename(args.trace)}: {n} packet-ins over {span:.1f}s captured, "
+          f"k={ft_topo.num_ports}, {args.router} router")
+    print(f"connect: {sum(connect.values())} messages")
+    print(f"replay: {wall:.3f}s wall, {replay.busy:.3f}s controller, "
+          f"{n / replay.busy if replay.busy else 0:.0f} events/s")
+    print("packet-in latency [us]: " + "  ".join(
+        f"p{p:g}={percentile(lat, p) * 1e6:.1f}" for p in PERCENTILES) +
+        f"  max={lat[-1] * 1e6 if lat else 0:.1f}")
+    print("sent: " + "  ".join(f"{name}={count}"
+                               for name, count in sorted(replay.counts.items())))
+
+
+if __name__ == '__main__':
+    main()
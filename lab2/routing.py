@@ -0,0 +1,462 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Route computation shared by the controllers and the offline tools.
+# Nothing in here depends on Ryu or Mininet.
+
+from collections import deque
+
+import topo
+from addressing import Addressing
+
+
+def edge_dpids(ft_topo):
+    # DPIDs of the edge switches, i.e. the destinations hosts hang off
+    addr = Addressing(ft_topo)
+    return {addr.dpid(i) for i in range(ft_topo.n_switch)
+            if ft_topo.types[i] == topo.EDGE}
+
+
+def fattree_graph(ft_topo):
+    """
+    Switch graph of ft_topo in the form SPRouter learns it through LLDP.
+
+    Returns:
+        {dpid: {neighbor_dpid: out_port}}
+    """
+    addr = Addressing(ft_topo)
+    n_switch = ft_topo.n_switch
+    graph = {}
+    for i in range(n_switch):
+        graph[addr.dpid(i)] = {addr.dpid(j): addr.port(i, j)
+                               for j in ft_topo.neighbors(i) if j < n_switch}
+    return graph
+
+
+def two_level_tables(ft_topo):
+    """
+    Two-level routing tables of Al-Fares et al. for every switch of ft_topo.
+
+    Prefixes carry traffic down towards the destination pod, subnet or host;
+    everything else matches a host-ID suffix (last octet), which spreads
+    upward traffic over the uplinks:
+      edge e (pod p)  10.p.e.h/32 -> host port, 0.0.0.X -> agg (X-2+e) % k/2
+      agg  a (pod p)  10.p.e.0/24 -> edge e,   0.0.0.X -> core (X-2+a) % k/2
+      core c          10.p.0.0/16 -> pod p
+    Longer prefixes get the higher priority, suffixes the lowest.
+
+    Returns:
+        {dpid: [(priority, ip, mask, out_port)]}
+    """
+    addr = Addressing(ft_topo)
+    half = ft_topo.num_ports // 2
+    host_ids = range(2, half + 2)
+
+    tables = {}
+    for i in range(ft_topo.n_switch):
+        t = ft_topo.types[i]
+        pod = ft_topo.pods[i]
+        idx = ft_topo.idxs[i]
+        rules = []
+        if t == topo.EDGE:
+            for h in range(half):
+                host = ft_topo.host_index(pod, idx, h)
+                rules.append((30, addr.ip(host), '255.255.255.255', addr.port(i, host)))
+            for x in host_ids:
+                agg = ft_topo.agg_index(pod, (x - 2 + idx) % half)
+                rules.append((10, f"0.0.0.{x}", '0.0.0.255', addr.port(i, agg)))
+        elif t == topo.AGG:
+            for e in range(half):
+                edge = ft_topo.edge_index(pod, e)
+                rules.append((20, f"10.{pod}.{e}.0", '255.255.255.0', addr.port(i, edge)))
+            for x in host_ids:
+                core = ft_topo.core_index(idx * half + (x - 2 + idx) % half)
+                rules.append((10, f"0.0.0.{x}", '0.0.0.255', addr.port(i, core)))
+        else:
+            for p in range(ft_topo.num_ports):
+                agg = ft_topo.agg_index(p, idx // half)
+                rules.append((20, f"10.{p}.0.0", '255.255.0.0', addr.port(i, agg)))
+        tables[addr.dpid(i)] = rules
+    return tables
+
+
+def edge_subnet(dpid):
+    # 10.pod.edge.0 of an edge switch DPID, as an integer
+    return 10 << 24 | (dpid >> 8 & 0xff) << 16 | (dpid & 0xff) << 8
+
+
+def sp_decisions(ft_topo, table, ecmp=False):
+    """
+    What SPRouter ends up installing once every host talked to every other
+    one: on each switch the /24 of every other edge switch to its next hop
+    in table, and on the edge switches their hosts' /32s to the host port.
+    Next hops are out ports, with ecmp tuples of all equal-cost ports.
+
+    Returns:
+        {dpid: {(network, prefix length): next hop}}
+    """
+    addr = Addressing(ft_topo)
+    decisions = {}
+    for i in range(ft_topo.n_switch):
+        u = addr.dpid(i)
+        routes = {}
+        for d in table.dsts:
+            if d == u:
+                continue
+            nh = table.next_hops(u, d) if ecmp else table.lookup(u, d)
+            if nh:
+                routes[(edge_subnet(d), 24)] = nh
+        if ft_topo.types[i] == topo.EDGE:
+            for h in ft_topo.neighbors(i):
+                if ft_topo.types[h] == topo.HOST:
+                    routes[(addr.ip_int(h), 32)] = addr.port(i, h)
+        decisions[u] = routes
+    return decisions
+
+
+class Failover(object):
+    """
+    Next hop with a backup: out port `primary`, or `backup` while the
+    primary port is down (an OpenFlow fast-failover group). Compares by
+    value, never equal to a plain port tuple (an ECMP next hop).
+    """
+
+    __slots__ = ('primary', 'backup')
+
+    def __init__(self, primary, backup):
+        self.primary = primary
+        self.backup = backup
+
+    def __eq__(self, other):
+        return (isinstance(other, Failover) and self.primary == other.primary
+                and self.backup == other.backup)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((Failover, self.primary, self.backup))
+
+    def __repr__(self):
+        return f"Failover({self.primary}, {self.backup})"
+
+
+class RouteTable:
+    """
+    Next-hop table over a {dpid: {neighbor: out_port}} graph.
+
+    For every destination switch it keeps the out port each other switch
+    uses to reach it, so packet-in only needs a dict lookup. All links have
+    unit weight, so each destination is filled by one BFS instead of a
+    Dijkstra run per packet.
+
+    The graph is either replaced as a whole (rebuild) or changed one switch
+    or link at a time, in which case only the destinations whose routes the
+    change can affect are recomputed.
+    """
+
+    def __init__(self, dsts=()):
+        self.graph = {}         # dpid -> {neighbor: out_port}
+        self.rgraph = {}        # dpid -> {neighbor with a link to dpid: its out_port}
+        self.dsts = set(dsts)   # destinations to keep routes for
+        self.next_hop = {}      # dst -> {dpid: out_port}
+        self.dist = {}          # dst -> {dpid: hops}
+        self.version = 0        # bumped on every topology change
+        self.recomputations = 0 # number of full per-destination BFS runs
+        self.touched = 0        # (dst, dpid) entries written, full or partial
+
+    def rebuild(self, graph, dsts=None):
+        # Throw away everything and recompute the routes to dsts
+        if dsts is not None:
+            self.dsts = set(dsts)
+        self._set_graph(graph)
+        self.next_hop = {}
+        self.dist = {}
+        for dst in self.dsts:
+            if dst in graph:
+                self.compute(dst)
+
+    def load(self, graph, next_hop, dist):
+        # Take over graph with routes computed earlier for it (as stored in
+        # a snapshot), {dst: {dpid: out_port}} and {dst: {dpid: hops}}: no BFS
+        self._set_graph(graph)
+        self.dsts = set(next_hop)
+        self.next_hop = next_hop
+        self.dist = dist
+
+    def _set_graph(self, graph):
+        # graph is kept in place, SPRouter holds on to it
+        if graph is not self.graph:
+            self.graph.clear()
+            self.graph.update(graph)
+        self.rgraph = {u: {} for u in graph}
+        for u, nbrs in graph.items():
+            for v, port in nbrs.items():
+                self.rgraph.setdefault(v, {})[u] = port
+        self.version += 1
+
+    # ---------- incremental updates ----------
+    def add_switch(self, dpid):
+        if dpid in self.graph:
+            return
+        self.graph[dpid] = {}
+        self.rgraph.setdefault(dpid, {})
+        self.version += 1
+        if dpid in self.dsts:
+            self.compute(dpid)
+
+    def remove_switch(self, dpid):
+        if dpid not in self.graph:
+            return
+        affected = set()
+        for v in list(self.graph[dpid]):
+            affected |= self._unlink(dpid, v)
+        for u in list(self.rgraph.get(dpid, {})):
+            affected |= self._unlink(u, dpid)
+        del self.graph[dpid]
+        self.rgraph.pop(dpid, None)
+        self.next_hop.pop(dpid, None)
+        self.dist.pop(dpid, None)
+        affected.discard(dpid)
+        self.version += 1
+        for dst in affected:
+            self.compute(dst)
+
+    def add_link(self, src, dst, port):
+        # Unidirectional link src -> dst leaving src on port
+        self.graph.setdefault(src, {})
+        self.graph.setdefault(dst, {})
+        self.rgraph.setdefault(src, {})
+        old = self.graph[src].get(dst)
+        if old == port:
+            return
+        self.graph[src][dst] = port
+        self.rgraph.setdefault(dst, {})[src] = port
+        self.version += 1
+
+        # Only destinations src now gets strictly closer to change; for those
+        # the improvement is pushed out from src instead of redoing the BFS
+        for d, hops in self.dist.items():
+            hv = hops.get(dst)
+            if hv is None:
+                continue
+            hu = hops.get(src)
+            if hu is None or hu > hv + 1:
+                self._relax(d, src, hv + 1, port)
+            elif old is not None and self.next_hop[d].get(src) == old:
+                # same neighbor, new port number
+                self.next_hop[d][src] = port
+                self.touched += 1
+
+    def remove_link(self, src, dst):
+        # Returns the destinations whose routes were recomputed
+        if dst not in self.graph.get(src, {}):
+            return set()
+        affected = self._unlink(src, dst)
+        self.version += 1
+        for d in affected:
+            self.compute(d)
+        return affected
+
+    def _unlink(self, src, dst):
+        # Drop src -> dst and return the destinations routed over it. Links
+        # off the shortest-path tree of a destination never change its routes.
+        port = self.graph.get(src, {}).pop(dst, None)
+        if port is None:
+            return set()
+        self.rgraph.get(dst, {}).pop(src, None)
+        return {d for d, ports in self.next_hop.items() if ports.get(src) == port}
+
+    def _relax(self, dst, u, h, port):
+        # u now reaches dst in h hops through port: lower the distance of u
+        # and of every switch that gets closer to dst by going through u
+        hops = self.dist[dst]
+        ports = self.next_hop[dst]
+        hops[u] = h
+        ports[u] = port
+        queue = deque([u])
+        touched = 1
+        while queue:
+            v = queue.popleft()
+            d = hops[v] + 1
+            for w, p in self.rgraph[v].items():
+                if w not in hops or hops[w] > d:
+                    hops[w] = d
+                    ports[w] = p
+                    queue.append(w)
+                    touched += 1
+        self.touched += touched
+
+    def compute(self, dst):
+        # BFS outwards from dst along reversed links: a switch u reached
+        # through v forwards to v, which is one hop closer to dst
+        hops = {dst: 0}
+        ports = {}
+        queue = deque([dst])
+        while queue:
+            v = queue.popleft()
+            d = hops[v] + 1
+            for u, port in self.rgraph[v].items():
+                if u not in hops:
+                    hops[u] = d
+                    ports[u] = port
+                    queue.append(u)
+        self.dist[dst] = hops
+        self.next_hop[dst] = ports
+        self.recomputations += 1
+        self.touched += len(hops)
+
+    def lookup(self, dpid, dst):
+        # Out port of dpid towards dst, None if there is no route
+        ports = self.next_hop.get(dst)
+        if ports is None:
+            return None
+        return ports.get(dpid)
+
+    def next_hops(self, dpid, dst):
+        # Every out port of dpid that lies on a shortest path to dst (ECMP)
+        hops = self.dist.get(dst)
+        if hops is None or dpid not in hops:
+            return ()
+        h = hops[dpid] - 1
+        return tuple(sorted(port for v, port in self.graph[dpid].items()
+                            if hops.get(v) == h))
+
+    def backup(self, dpid, dst):
+        """
+        Out port of dpid towards dst for when the link of its primary next
+        hop (lookup()) fails, None if there is none. Preferred is a
+        loop-free alternate, a neighbor that is no farther from dst than
+        dpid (in a fat-tree: another uplink); otherwise a neighbor one hop
+        farther that needs a U-turn rule (uturn()) to not send the packet
+        straight back.
+        """
+        primary = self.lookup(dpid, dst)
+        hops = self.dist.get(dst)
+        if primary is None:
+            return None
+        h = hops[dpid]
+        best = None
+        for v, port in sorted(self.graph[dpid].items(), key=lambda item: item[1]):
+            hv = hops.get(v)
+            if port == primary or hv is None or hv > h + 1:
+                continue
+            if hv == h + 1 and not self._uturn_port(v, dpid, dst):
+                continue
+            if best is None or hv < best[0]:
+                best = (hv, port)
+        return best[1] if best is not None else None
+
+    def uturn(self, dpid, dst, ecmp=False):
+        """
+        Rule dpid's backup next hop needs: (neighbor, its in port from dpid,
+        out port) if the neighbor's own route to dst (with ecmp: any of its
+        equal-cost next hops) leads back to dpid, else None. Packets for dst
+        the neighbor gets from dpid must go to that out port instead.
+        """
+        port = self.backup(dpid, dst)
+        if port is None:
+            return None
+        v = next(v for v, p in self.graph[dpid].items() if p == port)
+        back = self.graph[v].get(dpid)     # also where dpid's packets come in
+        routes = self.next_hops(v, dst) if ecmp else (self.lookup(v, dst),)
+        if back is None or back not in routes:
+            return None
+        return v, back, self._uturn_port(v, dpid, dst)
+
+    def _uturn_port(self, v, dpid, dst):
+        # Port of v onto another shortest path to dst than the one via dpid
+        hops = self.dist[dst]
+        h = hops[v] - 1
+        for w, port in sorted(self.graph[v].items(), key=lambda item: item[1]):
+            if w != dpid and hops.get(w) == h:
+                return port
+        return None
+
+    def least_loaded_path(self, src, dst, cost, fixed=None):
+        """
+        Of the shortest paths from src to dst, the one whose links are
+        least loaded: lowest bottleneck cost(dpid, out_port), then lowest
+        sum, then lowest ports. fixed {dpid: out_port} are next hops taken
+        already, the path keeps to them.
+
+        Returns:
+            [src, ..., dst], [] if there is no route
+        """
+        hops = self.dist.get(dst)
+        if hops is None or src not in hops:
+            return []
+        fixed = fixed or {}
+        # switches on shortest paths from src, farthest from dst first
+        order = [src]
+        seen = {src}
+        nexts = {}
+        for u in order:
+            if u == dst:
+                continue
+            h = hops[u] - 1
+            port = fixed.get(u)
+            nexts[u] = [(p, v) for v, p in self.graph[u].items()
+                        if hops.get(v) == h and (port is None or p == port)]
+            for _, v in nexts[u]:
+                if v not in seen:
+                    seen.add(v)
+                    order.append(v)
+        # best (bottleneck, sum, port, next switch) towards dst, nearest first
+        best = {dst: (0.0, 0.0, 0, None)}
+        for u in reversed(order):
+            options = []
+            for p, v in nexts.get(u, ()):
+                if v in best:
+                    c = cost(u, p)
+                    options.append((max(c, best[v][0]), c + best[v][1], p, v))
+            if options:
+                best[u] = min(options)
+        if src not in best:
+            return []
+        path = [src]
+        while path[-1] != dst:
+            path.append(best[path[-1]][3])
+        return path
+
+    def path(self, src, dst, ecmp=False):
+        # Switches a flow from src towards dst crosses before dst, nearest to
+        # dst first; with ecmp every switch on any shortest path. [] if no route.
+        hops = self.dist.get(dst)
+        if hops is None or src not in hops or src == dst:
+            return []
+        seen = {src}
+        frontier = [src]
+        while frontier:
+            nxt = []
+            for u in frontier:
+                h = hops[u] - 1
+                if ecmp:
+                    vs = [v for v in self.graph[u] if hops.get(v) == h]
+                else:
+                    port = self.next_hop[dst][u]
+                    vs = [v for v, p in self.graph[u].items() if p == port][:1]
+                for v in vs:
+                    if v != dst and v not in seen:
+                        seen.add(v)
+                        nxt.append(v)
+            frontier = nxt
+        return sorted(seen, key=hops.__getitem__)
@@ -21,4 +21,9 @@
 
 # This script is used to run the fat-tree topology simulation using Mininet.
 export PYTHONPATH="$PYTHONPATH:$HOME/mininet"
-sudo --preserve-env=PYTHONPATH python3 ./fat-tree.py
+# Options go to fat-tree.py, e.g. ./run.sh --k 8 --shape core (--help for all)
+# For k != 4 start the controller with the same k: SP_K=8 ryu-manager
+# sp_routing.py (FT_K for ft_routing.py), or with SP_SNAPSHOT/FT_SNAPSHOT.
+# Leftovers of a run that did not stop cleanly make the next start fail:
+# add --cleanup (or run sudo mn -c) then.
+sudo --preserve-env=PYTHONPATH python3 ./fat-tree.py "$@"
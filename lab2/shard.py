@@ -0,0 +1,569 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+# Pod sharding of SPRouter over several controller processes (sp_shard.py).
+#
+# ShardPlan splits the switches of a fat-tree: the core switches belong to
+# the coordinator, every pod with its aggregation and edge switches (and
+# their hosts) to one of the workers, consecutive pods to the same one.
+# Each shard is a controller of its own, listening on its own port.
+#
+# SharedState is what the processes share, one multiprocessing.shared_memory
+# segment laid out as a snapshot.py body, flat arrays at aligned offsets:
+#
+#   header        magic, k, counts, generation, active route slot
+#   dsts          destination edge DPIDs, in row order
+#   next_hop0/1   next-hop port of every switch towards every destination
+#   dist0/1       and its hop count (two slots: the coordinator writes the
+#                 one the workers do not read, then switches them)
+#   link_down     per adjacency entry: set by the controller of its switch
+#   connected     per switch: set while its controller has it
+#   host_loc      per host: edge dpid << 16 | port, 0 while unknown
+#   host_expires  per host: time.monotonic() of its expiry
+#
+# The routes are computed by the coordinator alone; workers read them
+# through SharedRouteTable and keep host locations in SharedHosts. Nothing
+# in here depends on Ryu.
+
+import array
+import time
+from multiprocessing import shared_memory
+
+import topo
+import routing
+import snapshot
+from addressing import Addressing
+
+COORDINATOR = 'core'
+MAGIC = 0x44524148535053        # 'SPSHARD'
+NO_ROUTE = snapshot.NO_ROUTE
+
+# header slots
+_MAGIC, _K, _N_DST, _N_ENTRIES, _N_HOSTS, _GENERATION, _ACTIVE = range(7)
+_HEADER_SLOTS = 8
+
+
+def parse_shard(spec):
+    # "core/N" or "w/N" (worker w of N) -> (shard, number of workers)
+    shard, _, workers = spec.partition('/')
+    try:
+        workers = int(workers)
+        if shard != COORDINATOR:
+            shard = int(shard)
+    except ValueError:
+        raise ValueError(f"shard {spec!r}: expected core/N or <worker>/N") from None
+    if workers < 1 or shard != COORDINATOR and not 0 <= shard < workers:
+        raise ValueError(f"shard {spec!r}: no such worker")
+    return shard, workers
+
+
+class ShardPlan(object):
+    """
+    Which shard every node of a topo.Fattree belongs to: COORDINATOR for
+    the core switches, worker p * workers // k for the switches and hosts
+    of pod p. Controller ports: the coordinator's is base, worker w's
+    base + 1 + w.
+    """
+
+    def __init__(self, ft_topo, workers):
+        k = ft_topo.num_ports
+        if not 1 <= workers <= k:
+            raise ValueError(f"{workers} workers for {k} pods: need 1 to {k}")
+        self.ft = ft_topo
+        self.addr = Addressing(ft_topo)
+        self.workers = workers
+        self.shards = [COORDINATOR] + list(range(workers))
+
+    def pods(self, worker):
+        k = self.ft.num_ports
+        return [p for p in range(k) if p * self.workers // k == worker]
+
+    def owner(self, i):
+        # Shard of node i
+        if self.ft.types[i] == topo.CORE:
+            return COORDINATOR
+        return self.ft.pods[i] * self.workers // self.ft.num_ports
+
+    def owner_of_dpid(self, dpid):
+        i = self.addr.index_of_dpid(dpid)
+        return None if i is None else self.owner(i)
+
+    def switches(self, shard):
+        # Node indices of the switches of shard
+        return [i for i in range(self.ft.n_switch) if self.owner(i) == shard]
+
+    def dpids(self, shard):
+        return [self.addr.dpid(i) for i in self.switches(shard)]
+
+    def hosts(self, shard):
+        return [h for h in range(self.ft.n_switch, len(self.ft)) if self.owner(h) == shard]
+
+    def port(self, shard, base=6653):
+        return base if shard == COORDINATOR else base + 1 + shard
+
+
+def _sections(n_switch, n_dst, n_entries, n_hosts):
+    return (
+        ('header', 'Q', _HEADER_SLOTS),
+        ('dsts', 'I', n_dst),
+        ('next_hop0', 'H', n_dst * n_switch),
+        ('dist0', 'H', n_dst * n_switch),
+        ('next_hop1', 'H', n_dst * n_switch),
+        ('dist1', 'H', n_dst * n_switch),
+        ('link_down', 'B', n_entries),
+        ('connected', 'B', n_switch),
+        ('host_loc', 'Q', n_hosts),
+        ('host_expires', 'd', n_hosts),
+    )
+
+
+class SharedState(object):
+    """
+    The shared memory of a sharded controller for ft_topo: create() makes
+    it (the launcher), attach() maps it by name (every controller). Only
+    the coordinator calls publish(); set_link() and set_connected() are for
+    the controller of the switch, the host slots for SharedHosts.
+    """
+
+    def __init__(self, shm, ft_topo, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner      # unlinks the segment on close()
+        self.ft = ft_topo
+        self.addr = Addressing(ft_topo)
+        n_switch = ft_topo.n_switch
+        self.n_switch = n_switch
+        self.dpids = [self.addr.dpid(i) for i in range(n_switch)]
+        dsts = sorted(routing.edge_dpids(ft_topo))
+        # adjacency entries of the switches: (dpid, neighbor dpid or None for a host)
+        indptr = ft_topo.indptr
+        self.n_entries = indptr[n_switch]
+        self.entries = [(self.dpids[i], self.dpids[j] if j < n_switch else None)
+                        for i in range(n_switch) for j in ft_topo.neighbors(i)]
+        sections, size = snapshot.layout(_sections(n_switch, len(dsts), self.n_entries,
+                                                   len(ft_topo) - n_switch))
+        if shm.size < size:
+            raise ValueError(f"shared memory {shm.name}: {shm.size} bytes, "
+                             f"expected {size}; not made for this fabric")
+        self.views = {}
+        buf = shm.buf
+        for name, (offset, code, count) in sections.items():
+            nbytes = count * array.array(code).itemsize
+            self.views[name] = buf[offset:offset + nbytes].cast(code)
+        self.header = self.views['header']
+        self.dst_index = {dst: d for d, dst in enumerate(dsts)}
+        self.dsts = dsts
+
+    @classmethod
+    def create(cls, ft_topo, table, name=None):
+        # New segment with table's routes (a routing.RouteTable over
+        # routing.fattree_graph(ft_topo)) in both slots, every link up
+        n_switch = ft_topo.n_switch
+        n_dst = len(routing.edge_dpids(ft_topo))
+        _, size = snapshot.layout(_sections(n_switch, n_dst, ft_topo.indptr[n_switch],
+                                            len(ft_topo) - n_switch))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        try:
+            state = cls(shm, ft_topo, owner=True)
+            header = state.header
+            header[_K] = ft_topo.num_ports
+            header[_N_DST] = n_dst
+            header[_N_ENTRIES] = state.n_entries
+            header[_N_HOSTS] = len(ft_topo) - n_switch
+            state.views['dsts'][:] = array.array('I', state.dsts)
+            state._write_rows(0, table, state.dsts)
+            state._copy_slot(0, 1)
+            header[_MAGIC] = MAGIC
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        return state
+
+    @classmethod
+    def attach(cls, name, ft_topo, shared_tracker=False):
+        # Map the segment create() made; ValueError if it is for another
+        # fabric. shared_tracker: in the creator's process or a
+        # multiprocessing child of it, which use the creator's resource tracker
+        shm = shared_memory.SharedMemory(name=name)
+        if not shared_tracker:
+            _untrack(shm)
+        try:
+            state = cls(shm, ft_topo)
+        except Exception:
+            shm.close()
+            raise
+        header = state.header
+        if (header[_MAGIC], header[_K], header[_N_DST], header[_N_ENTRIES],
+                header[_N_HOSTS]) != (MAGIC, ft_topo.num_ports, len(state.dsts),
+                                      state.n_entries, len(ft_topo) - ft_topo.n_switch):
+            state.close()
+            raise ValueError(f"shared memory {name}: not made for this fabric")
+        return state
+
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        self.views.clear()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # ---------- routes ----------
+    @property
+    def generation(self):
+        return self.header[_GENERATION]
+
+    @property
+    def active(self):
+        return self.header[_ACTIVE]
+
+    def view(self, kind, slot):
+        # next_hop or dist rows of a slot, n_switch entries per destination
+        return self.views[f"{kind}{slot}"]
+
+    def publish(self, table, dsts=None):
+        """
+        Make the routes of routing.RouteTable table towards dsts (all if
+        None) the active ones. The other slot is brought up to date and
+        switched to; readers of the old slot may go on using it until the
+        next publish(), so one publish per poll interval of the readers.
+        """
+        old = self.active
+        new = 1 - old
+        self._copy_slot(old, new)
+        self._write_rows(new, table, self.dsts if dsts is None else dsts)
+        self.header[_ACTIVE] = new
+        self.header[_GENERATION] += 1
+
+    def changed(self, old, new):
+        # Destinations whose rows differ between slots old and new
+        n = self.n_switch
+        changed = []
+        for kind in ('next_hop', 'dist'):
+            a = self.view(kind, old)
+            b = self.view(kind, new)
+            for d, dst in enumerate(self.dsts):
+                if a[d * n:(d + 1) * n] != b[d * n:(d + 1) * n]:
+                    changed.append(dst)
+        return set(changed)
+
+    def _copy_slot(self, src, dst):
+        for kind in ('next_hop', 'dist'):
+            self.view(kind, dst)[:] = self.view(kind, src)
+
+    def _write_rows(self, slot, table, dsts):
+        next_hop = self.view('next_hop', slot)
+        dist = self.view('dist', slot)
+        n = self.n_switch
+        for dst in dsts:
+            d = self.dst_index.get(dst)
+            if d is None:
+                continue
+            ports = table.next_hop.get(dst, {})
+            hops = table.dist.get(dst, {})
+            next_hop[d * n:(d + 1) * n] = array.array('H', (ports.get(u, 0) for u in self.dpids))
+            dist[d * n:(d + 1) * n] = array.array(
+                'H', (hops.get(u, NO_ROUTE) for u in self.dpids))
+
+    def routes(self):
+        # ({dst: {dpid: out_port}}, {dst: {dpid: hops}}) of the active slot
+        slot = self.active
+        next_hop = self.view('next_hop', slot)
+        dist = self.view('dist', slot)
+        n = self.n_switch
+        ports = {}
+        hops = {}
+        for d, dst in enumerate(self.dsts):
+            lo, hi = d * n, (d + 1) * n
+            ports[dst] = {u: p for u, p in zip(self.dpids, next_hop[lo:hi]) if p}
+            hops[dst] = {u: h for u, h in zip(self.dpids, dist[lo:hi]) if h != NO_ROUTE}
+        return ports, hops
+
+    # ---------- links and switches ----------
+    def entry(self, dpid, port):
+        # Adjacency entry of switch port dpid:port, None if there is none
+        i = self.addr.index_of_dpid(dpid)
+        if i is None or not 1 <= port <= self.ft.degree(i):
+            return None
+        return self.ft.indptr[i] + port - 1
+
+    def set_link(self, dpid, port, down):
+        # Mark the link on dpid:port down (or up again); False if no such port
+        e = self.entry(dpid, port)
+        if e is None:
+            return False
+        self.views['link_down'][e] = 1 if down else 0
+        return True
+
+    def set_switch(self, dpid, down):
+        # Mark every link of switch dpid down (or up again)
+        i = self.addr.index_of_dpid(dpid)
+        if i is not None:
+            for port in range(1, self.ft.degree(i) + 1):
+                self.set_link(dpid, port, down)
+
+    def down_links(self):
+        # {(u, v)} of the switch-to-switch links marked down at either end,
+        # both directions
+        flags = bytes(self.views['link_down'])
+        down = set()
+        e = flags.find(1)
+        while e >= 0:
+            u, v = self.entries[e]
+            if v is not None:
+                down.add((u, v))
+                down.add((v, u))
+            e = flags.find(1, e + 1)
+        return down
+
+    def set_connected(self, dpid, connected):
+        i = self.addr.index_of_dpid(dpid)
+        if i is not None:
+            self.views['connected'][i] = 1 if connected else 0
+
+    def connected(self, dpid):
+        i = self.addr.index_of_dpid(dpid)
+        return i is not None and bool(self.views['connected'][i])
+
+
+def _untrack(shm):
+    # Before Python 3.13 attaching registers the segment with this process's
+    # resource tracker too, which unlinks it when the process exits
+    # (bpo-39959); only create() owns it. A tracker shared with the creator
+    # would forget the creator's registration instead.
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+class _Row(object):
+    # {dpid: value} of one destination in one slot, read in place
+    __slots__ = ('view', 'base', 'missing', 'index', 'dpids')
+
+    def __init__(self, view, base, missing, index, dpids):
+        self.view = view
+        self.base = base
+        self.missing = missing
+        self.index = index
+        self.dpids = dpids
+
+    def get(self, dpid, default=None):
+        i = self.index(dpid)
+        if i is None:
+            return default
+        value = self.view[self.base + i]
+        return default if value == self.missing else value
+
+    def __getitem__(self, dpid):
+        value = self.get(dpid)
+        if value is None:
+            raise KeyError(dpid)
+        return value
+
+    def __contains__(self, dpid):
+        return self.get(dpid) is not None
+
+    def items(self):
+        n = len(self.dpids)
+        return [(u, value) for u, value in zip(self.dpids, self.view[self.base:self.base + n])
+                if value != self.missing]
+
+    def keys(self):
+        return [u for u, _ in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+
+class _Rows(object):
+    # {dst: _Row} of next_hop or dist in one slot of a SharedState
+    def __init__(self, state, kind, slot):
+        self.state = state
+        self.view = state.view(kind, slot)
+        self.missing = 0 if kind == 'next_hop' else NO_ROUTE
+        self.index = state.addr.index_of_dpid
+
+    def get(self, dst, default=None):
+        d = self.state.dst_index.get(dst)
+        if d is None:
+            return default
+        return _Row(self.view, d * self.state.n_switch, self.missing, self.index,
+                    self.state.dpids)
+
+    def __getitem__(self, dst):
+        row = self.get(dst)
+        if row is None:
+            raise KeyError(dst)
+        return row
+
+    def __contains__(self, dst):
+        return dst in self.state.dst_index
+
+    def __iter__(self):
+        return iter(self.state.dsts)
+
+    def __len__(self):
+        return len(self.state.dsts)
+
+    def keys(self):
+        return list(self.state.dsts)
+
+    def items(self):
+        return [(dst, self[dst]) for dst in self.state.dsts]
+
+
+class SharedRouteTable(routing.RouteTable):
+    """
+    Read-only routing.RouteTable over the routes of a SharedState: lookup,
+    next_hops, backup, uturn and path as usual, on graph (the worker's own
+    copy, kept in line with the link state by the worker). The routes are
+    those of one slot until refresh() moves to the active one; changing
+    them is the coordinator's business.
+    """
+
+    def __init__(self, state, graph):
+        self.state = state
+        self.graph = graph
+        self.rgraph = {}
+        self.dsts = set(state.dsts)
+        self.recomputations = 0
+        self.touched = 0
+        self.slot = state.active
+        self.version = state.generation
+
+    @property
+    def next_hop(self):
+        return _Rows(self.state, 'next_hop', self.slot)
+
+    @property
+    def dist(self):
+        return _Rows(self.state, 'dist', self.slot)
+
+    def rows(self, slot=None):
+        # {dst: {dpid: out_port}} of slot (default the current one)
+        return _Rows(self.state, 'next_hop', self.slot if slot is None else slot)
+
+    def refresh(self):
+        # Move to the active slot; the destinations whose routes changed
+        state = self.state
+        if state.generation == self.version:
+            return set()
+        old, self.slot = self.slot, state.active
+        self.version = state.generation
+        return state.changed(old, self.slot) if old != self.slot else set(state.dsts)
+
+    def _read_only(self, *args, **kwargs):
+        raise NotImplementedError("shared routes are computed by the coordinator")
+
+    rebuild = load = add_switch = remove_switch = add_link = remove_link = _read_only
+    compute = _read_only
+
+
+class SharedHosts(object):
+    """
+    hostcache.HostCache-like {ip: (edge dpid, port)} over the host slots of
+    a SharedState, for the hosts of the addressing plan (other keys are
+    never stored). There is a slot per host, so no size bound. Entries
+    expire ttl seconds after they were stored; the controller of the
+    host's edge switch (owned hosts) drops them and calls on_evict, the
+    others only stop seeing them. time.monotonic() is system-wide on
+    Linux, so every process compares against the same clock.
+    """
+
+    def __init__(self, state, ttl, on_evict=None, owned=(), clock=time.monotonic):
+        self.state = state
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.owned = list(owned)    # host node indices
+        self.clock = clock
+        self.loc = state.views['host_loc']
+        self.expires = state.views['host_expires']
+        self.n_switch = state.n_switch
+        self.expirations = 0
+
+    def _slot(self, ip):
+        h = self.state.addr.host_of_ip(ip)
+        return None if h is None else h - self.n_switch
+
+    def __contains__(self, ip):
+        return self.get(ip) is not None
+
+    def __getitem__(self, ip):
+        value = self.get(ip)
+        if value is None:
+            raise KeyError(ip)
+        return value
+
+    def __setitem__(self, ip, location):
+        s = self._slot(ip)
+        if s is None:
+            return
+        # expiry first: a reader never sees a new location with an old expiry
+        self.expires[s] = self.clock() + self.ttl if self.ttl else float('inf')
+        self.loc[s] = location[0] << 16 | location[1]
+
+    def get(self, ip, default=None):
+        s = self._slot(ip)
+        if s is None:
+            return default
+        loc = self.loc[s]
+        if not loc or self.expires[s] <= self.clock():
+            return default
+        return loc >> 16, loc & 0xffff
+
+    def pop(self, ip, default=None):
+        s = self._slot(ip)
+        if s is None or not self.loc[s]:
+            return default
+        loc = self.loc[s]
+        self.loc[s] = 0
+        return loc >> 16, loc & 0xffff
+
+    def items(self):
+        addr = self.state.addr
+        now = self.clock()
+        return [(addr.ip(s + self.n_switch), (loc >> 16, loc & 0xffff))
+                for s, loc in enumerate(self.loc) if loc and self.expires[s] > now]
+
+    def __len__(self):
+        return len(self.items())
+
+    def expire(self):
+        # Drop the expired owned entries; returns how many
+        now = self.clock()
+        dead = 0
+        for h in self.owned:
+            s = h - self.n_switch
+            loc = self.loc[s]
+            if loc and self.expires[s] <= now:
+                self.loc[s] = 0
+                dead += 1
+                if self.on_evict is not None:
+                    self.on_evict(self.state.addr.ip(h), (loc >> 16, loc & 0xffff))
+        self.expirations += dead
+        return dead
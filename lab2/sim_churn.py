@@ -0,0 +1,168 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# SPRouter state while hosts come and go.
+#
+#   python3 sim_churn.py --k 8 --rounds 60
+#
+# A window of --active hosts slides over the fabric by --step hosts per
+# round, so every host is busy for a while and then falls silent. In each
+# round every active host pings --pings other active ones and two hosts in
+# different pods ping each other all along (a long-lived flow), then --interval
+# seconds pass on a simulated clock: idle rules time out on the stand-in
+# switches (reported to SPRouter as flow-removed) and the host cache
+# expires what its sweep would. Prints the host cache, flow rules on all
+# switches, FlowBatcher's record of installed rules, the memory Python
+# holds and the packet-ins the long-lived flow caused after its first
+# round, with timeouts (SP_HOST_CACHE/SP_HOST_TTL/SP_IDLE_TIMEOUT from the
+# options) and without (the old unbounded dicts and permanent rules).
+# Exits 1 if a ping got lost, the bounded run keeps growing or the
+# long-lived flow misses more than once per direction and host TTL.
+
+import argparse
+import random
+import sys
+import tracemalloc
+
+import topo
+import routing
+import pktparse
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame
+
+
+class Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def churn(ft_topo, args, bounded):
+    clock = Clock()
+    if bounded:
+        sp_routing.HOST_CACHE_SIZE, sp_routing.HOST_TTL = args.cache, args.ttl
+        sp_routing.IDLE_TIMEOUT = args.idle
+    else:
+        sp_routing.HOST_CACHE_SIZE, sp_routing.HOST_TTL = sys.maxsize, 0
+        sp_routing.IDLE_TIMEOUT = 0
+    router = sp_routing.SPRouter()
+    router.ip_location.clock = router.mac_location.clock = clock
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = StubFabric(router, ft_topo, clock)
+    fabric.connect()
+    addr = fabric.addr
+    rng = random.Random(args.seed)
+
+    hosts = list(range(ft_topo.n_switch, len(ft_topo)))
+    steady = (hosts[0], hosts[len(hosts) // 2])
+    steady_ins = 0
+    rows, lost = [], 0
+    tracemalloc.start()
+    for r in range(args.rounds):
+        start = r * args.step
+        active = [hosts[(start + i) % len(hosts)] for i in range(args.active)]
+        for src in active:
+            for dst in rng.sample(active, args.pings + 1):
+                if dst == src:
+                    continue
+                dst_ip = addr.ip(dst)
+                if dst_ip not in fabric.arp_cache.get(src, {}):
+                    fabric.send(src, pktparse.arp_frame(
+                        pktparse.ARP_REQUEST, pktparse.mac_bytes(addr.mac(src)),
+                        addr.ip(src), None, dst_ip))
+                for a, b in ((src, dst), (dst, src)):
+                    before = fabric.delivered
+                    fabric.send(a, ipv4_frame(addr.mac(a), addr.mac(b),
+                                              addr.ip(a), addr.ip(b)))
+                    lost += fabric.delivered == before
+        packet_ins = fabric.packet_ins
+        for a, b in (steady, steady[::-1]):
+            before = fabric.delivered
+            fabric.send(a, ipv4_frame(addr.mac(a), addr.mac(b), addr.ip(a), addr.ip(b)))
+            lost += fabric.delivered == before
+        if r:
+            steady_ins += fabric.packet_ins - packet_ins
+        # the stand-in switches log every message and hosts that left take
+        # their ARP cache along: only the controller's memory is of interest
+        fabric.inbox.clear()
+        for h in range(args.step):
+            fabric.arp_cache.pop(hosts[(start + h) % len(hosts)], None)
+        for dpid, dp in fabric.datapaths.items():
+            del dp.sent[:]
+            fabric.seen[dpid] = 0
+        clock.now += args.interval
+        fabric.expire()
+        router.ip_location.expire()     # what _expire_hosts does every TTL/4
+        rules = sum(len(dp.flows) for dp in fabric.datapaths.values())
+        recorded = sum(len(s) for s in router.batcher.sent.values())
+        rows.append((clock.now, len(router.ip_location), rules, recorded,
+                     tracemalloc.get_traced_memory()[0] / 1024, steady_ins))
+    tracemalloc.stop()
+    return rows, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter host cache and rules under host churn')
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=60)
+    parser.add_argument('--active', type=int, default=32, help='hosts active at a time')
+    parser.add_argument('--step', type=int, default=4, help='hosts replaced per round')
+    parser.add_argument('--pings', type=int, default=3, help='peers per active host and round')
+    parser.add_argument('--interval', type=float, default=10, help='seconds per round')
+    parser.add_argument('--cache', type=int, default=48, help='SP_HOST_CACHE')
+    parser.add_argument('--ttl', type=float, default=120, help='SP_HOST_TTL')
+    parser.add_argument('--idle', type=int, default=30, help='SP_IDLE_TIMEOUT')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    ft_topo = topo.Fattree(args.k)
+    ok = True
+    for bounded in (False, True):
+        rows, lost = churn(ft_topo, args, bounded)
+        print(f"\n{'timeouts' if bounded else 'no timeouts'}: {lost} pings lost")
+        print(f"{'time [s]':>8} {'hosts cached':>12} {'rules':>7} {'recorded':>9} "
+              f"{'memory [KB]':>12} {'long-lived pkt-ins':>18}")
+        for row in rows[::max(len(rows) // 10, 1)] + rows[-1:]:
+            print(f"{row[0]:>8.0f} {row[1]:>12} {row[2]:>7} {row[3]:>9} {row[4]:>12.0f} "
+                  f"{row[5]:>18}")
+        ok &= lost == 0
+        # a host entry that expires costs its flow one miss per direction
+        expiries = rows[-1][0] // args.ttl + 1 if bounded else 0
+        ok &= rows[-1][5] <= 2 * expiries
+        if bounded:
+            # after the first pass over all hosts nothing may grow any more
+            warm = len(range(ft_topo.n_switch, len(ft_topo))) // args.step
+            settled = rows[warm:]
+            if settled:
+                ok &= max(r[1] for r in rows) <= args.cache
+                ok &= max(r[2] for r in settled) <= max(r[2] for r in rows[:warm]) * 1.1
+                ok &= max(r[4] for r in settled) <= max(r[4] for r in rows[:warm]) * 1.1
+    print('OK' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
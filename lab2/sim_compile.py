@@ -0,0 +1,101 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Rules per switch: SPRouter's per-destination rules vs. compiled tables.
+#
+#   python3 sim_compile.py --k 4 8 16 32
+#
+# "current" is what SPRouter installs once all hosts talked to each other
+# (routing.sp_decisions: a /24 per destination edge switch, a /32 per local
+# host). "strict" is flowcompile.compile_rules() of the same decisions,
+# with addresses outside the fabric still missing to the controller;
+# "dont-care" may forward those anywhere. Every host address is looked up
+# in the compiled tables of a sample of switches (--check switches per
+# tier, all for k <= 8) and must leave on the same port; exits 1 otherwise.
+
+import argparse
+import random
+import sys
+
+import topo
+import routing
+import flowcompile
+from addressing import Addressing
+
+
+def verify(decisions, rules, addresses):
+    # Compiled rules must forward every fabric address like the decisions
+    for address in addresses:
+        if flowcompile.lookup(rules, address) != flowcompile.lookup(decisions, address):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='flow table size before/after compilation')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--check', type=int, default=4,
+                        help='switches per tier whose compiled table is verified')
+    parser.add_argument('--ecmp', action='store_true', help='next hops are ECMP port sets')
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{'k':>3} {'tier':>5} {'switches':>8} {'current':>10} {'strict':>10} "
+          f"{'dont-care':>10} {'max cur/strict/dc':>20}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        addr = Addressing(ft_topo)
+        table = routing.RouteTable(routing.edge_dpids(ft_topo))
+        table.rebuild(routing.fattree_graph(ft_topo))
+        decisions = routing.sp_decisions(ft_topo, table, args.ecmp)
+        addresses = [addr.ip_int(h) for h in range(ft_topo.n_switch, len(ft_topo))]
+
+        rng = random.Random(k)
+        by_tier = {}
+        for i in range(ft_topo.n_switch):
+            by_tier.setdefault(ft_topo.types[i], []).append(i)
+        totals = [0, 0, 0]
+        for t in (topo.EDGE, topo.AGG, topo.CORE):
+            nodes = by_tier[t]
+            checked = set(nodes if k <= 8 else rng.sample(nodes, min(args.check, len(nodes))))
+            counts = []
+            for i in nodes:
+                routes = decisions[addr.dpid(i)]
+                strict = flowcompile.compile_rules(routes)
+                loose = flowcompile.compile_rules(routes, dont_care=True)
+                counts.append((len(routes), len(strict), len(loose)))
+                if i in checked:
+                    ok &= verify(routes, strict, addresses) and verify(routes, loose, addresses)
+            sums = [sum(c[n] for c in counts) for n in range(3)]
+            maxes = '/'.join(str(max(c[n] for c in counts)) for n in range(3))
+            totals = [a + b for a, b in zip(totals, sums)]
+            print(f"{k:>3} {topo.TYPES[t]:>5} {len(nodes):>8} {sums[0]:>10} {sums[1]:>10} "
+                  f"{sums[2]:>10} {maxes:>20}")
+        print(f"{k:>3} {'all':>5} {ft_topo.n_switch:>8} {totals[0]:>10} {totals[1]:>10} "
+              f"{totals[2]:>10} {'':>20}")
+    print('OK' if ok else 'FAIL: compiled tables forward differently')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Core link load of SPRouter's single shortest path vs. ECMP select groups.
+#
+#   python3 sim_ecmp.py --k 4 8 --flows 8
+#
+# Every host opens --flows TCP flows to random hosts (a random traffic
+# matrix). Flows follow the route table hop by hop: "single" uses the one
+# next hop SPRouter installs, "ecmp" picks a bucket of the SELECT group by
+# hashing the 5-tuple (salted per switch, as switches do to avoid all of
+# them taking the same choice). Reports how many flows each agg->core link
+# carries and how many groups the switches need.
+
+import argparse
+import hashlib
+import random
+import statistics
+
+import topo
+import routing
+from addressing import Addressing
+
+
+def flow_paths(ft_topo, table, graph, flows, ecmp):
+    # Yields the directed switch links (u, v) each flow crosses
+    addr = Addressing(ft_topo)
+    port_peer = {u: {p: v for v, p in nbrs.items()} for u, nbrs in graph.items()}
+    for src, dst, sport in flows:
+        u = addr.dpid(ft_topo.neighbors(src)[0])
+        d = addr.dpid(ft_topo.neighbors(dst)[0])
+        key = f"{addr.ip(src)} {addr.ip(dst)} 6 {sport} 5001"
+        links = []
+        while u != d:
+            if ecmp:
+                ports = table.next_hops(u, d)
+                h = hashlib.blake2b(f"{key} {u}".encode(), digest_size=4).digest()
+                port = ports[int.from_bytes(h, 'big') % len(ports)]
+            else:
+                port = table.lookup(u, d)
+            v = port_peer[u][port]
+            links.append((u, v))
+            u = v
+        yield links
+
+
+def main():
+    parser = argparse.ArgumentParser(description='core link load, single path vs ECMP')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--flows', type=int, default=8, help='flows per host')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'k':>3} {'policy':>7} {'flows':>7} {'core links used':>16} "
+          f"{'max':>5} {'mean':>6} {'stdev':>6} {'groups/sw':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        graph = routing.fattree_graph(ft_topo)
+        table = routing.RouteTable(routing.edge_dpids(ft_topo))
+        table.rebuild(graph)
+
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [(src, dst, rng.randrange(1024, 65536))
+                 for src in hosts for dst in rng.sample(hosts, args.flows)
+                 if dst != src]
+
+        addr = Addressing(ft_topo)
+        cores = {addr.dpid(i) for i in range(ft_topo.n_switch)
+                 if ft_topo.types[i] == topo.CORE}
+        core_links = [(u, v) for u in graph for v in graph[u] if v in cores]
+
+        # distinct next-hop sets per switch = SELECT groups SPRouter shares
+        groups = [len({table.next_hops(u, d) for d in table.dsts} - {()}
+                      - {(p,) for p in graph[u].values()}) for u in graph]
+
+        for name, ecmp in (('single', False), ('ecmp', True)):
+            load = dict.fromkeys(core_links, 0)
+            for links in flow_paths(ft_topo, table, graph, flows, ecmp):
+                for link in links:
+                    if link in load:
+                        load[link] += 1
+            values = list(load.values())
+            used = sum(1 for v in values if v)
+            ngroups = f"{max(groups)}" if ecmp else '-'
+            print(f"{k:>3} {name:>7} {len(flows):>7} {used:>9}/{len(values):<6} "
+                  f"{max(values):>5} {statistics.mean(values):>6.1f} "
+                  f"{statistics.pstdev(values):>6.1f} {ngroups:>10}")
+
+
+if __name__ == '__main__':
+    main()
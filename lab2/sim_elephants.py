@@ -0,0 +1,190 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Aggregate throughput of FTRouter's two-level tables with and without
+# elephant scheduling (FT_ELEPHANTS), flow-level.
+#
+#   python3 sim_elephants.py --k 4 8 --rounds 3 --mice 2
+#
+# Every host starts one long TCP flow to another (a random permutation)
+# and --mice short UDP ones to random hosts that send at most --mouse of
+# a link. The first packet of every flow goes through FTRouter on
+# stand-in switches, then the flow follows the installed rules and gets
+# its max-min fair rate (sim_traffic.max_min, all links alike). Each
+# round --interval simulated seconds pass: the edge switches' counting
+# rules advance by the rates, FTRouter polls them and schedules (as its
+# polling thread would, without the thread). Reports the aggregate
+# throughput of the long flows after each round, as a share of what the
+# hosts' links could send, the elephants placed, mice placed (none
+# should be) and the controller's time for a poll and schedule.
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+import topo
+import ft_routing
+import pktparse
+import sim_traffic
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+from stub_datapath import StubFabric, ipv4_frame, flow_stats_reply_event
+
+
+def flow_path(fabric, src, data):
+    # Node indices, host to host, the installed rules carry data from src
+    # over; None if they do not deliver it
+    ft_topo = fabric.ft
+    addr = fabric.addr
+    node = ft_topo.neighbors(src)[0]
+    in_port = addr.port(node, src)
+    path = [src, node]
+    for _ in range(fabric.MAX_HOPS):
+        ports = fabric.forward(node, in_port, data)
+        if not ports or len(ports) > 1 or ports[0] >= ofproto_v1_3.OFPP_MAX:
+            return None
+        nxt = addr.neighbor(node, ports[0])
+        path.append(nxt)
+        if ft_topo.types[nxt] == topo.HOST:
+            return path
+        in_port = addr.port(nxt, node)
+        node = nxt
+    return None
+
+
+def rates(net, paths, demand):
+    # Max-min fair rate of every flow over its path, as a fraction of a link
+    flow_of = np.concatenate([np.full(len(p) - 1, f) for f, p in enumerate(paths)])
+    src = np.concatenate([p[:-1] for p in paths])
+    dst = np.concatenate([p[1:] for p in paths])
+    link_of = net.link_ids(src, dst)
+    capacity = np.ones(len(net.link_src))
+    return sim_traffic.max_min(len(paths), flow_of, link_of, capacity, demand)[0]
+
+
+def poll(router, fabric, sent, started, now):
+    # FTRouter asks the edge switches for their counting rules, they
+    # answer with the bytes sent so far, FTRouter schedules; returns the
+    # controller's CPU seconds for it
+    edges = [dp for dpid, dp in fabric.datapaths.items() if fabric.addr.is_edge_dpid(dpid)]
+    start = time.process_time()
+    router.request_flow_stats(edges)
+    spent = time.process_time() - start
+    replies = []
+    for dp in edges:
+        asked = sum(isinstance(msg, ofproto_v1_3_parser.OFPFlowStatsRequest)
+                    for msg in dp.sent[fabric.seen[dp.id]:])
+        entries = []
+        for _, _, _, mod in dp.flows.rules(0):
+            if mod.cookie == ft_routing.FLOW_COOKIE:
+                key = ft_routing.match_flow(mod.match)
+                entries.append((mod, sent[key], now - started[key]))
+        replies += [flow_stats_reply_event(dp, entries) for _ in range(asked)]
+    start = time.process_time()
+    for ev in replies:
+        router._flow_stats_reply_handler(ev)
+    router.schedule()
+    spent += time.process_time() - start
+    fabric.settle()
+    return spent
+
+
+def run(ft_topo, flows, args, elephants):
+    ft_routing.ELEPHANTS = elephants
+    ft_routing.LINK_MBPS = args.capacity
+    router = ft_routing.FTRouter()
+    router.set_fattree(ft_topo)
+    fabric = StubFabric(router, ft_topo)
+    addr = fabric.addr
+    net = sim_traffic.Fabric(ft_topo)
+    fabric.connect()
+
+    frames = []
+    for src, dst, proto, ports, _ in flows:
+        frames.append(ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst),
+                                 proto, ports=ports))
+        fabric.send(src, frames[-1])
+    keys = [pktparse.flow_key(data) for data in frames]
+    demand = np.array([d for _, _, _, _, d in flows])
+    long_flows = demand >= 1
+    sent = dict.fromkeys(keys, 0)
+    started = dict.fromkeys(keys, 0.0)
+    now = 0.0
+    throughput = []
+    cpu = []
+    for i in range(args.rounds + 1):
+        paths = [flow_path(fabric, src, data) for (src, _, _, _, _), data in zip(flows, frames)]
+        if None in paths:
+            raise SystemExit(f"{sum(p is None for p in paths)} flows not routed")
+        rate = rates(net, paths, demand)
+        throughput.append(rate[long_flows].sum() / long_flows.sum())
+        if i == args.rounds or not elephants:
+            break
+        now += args.interval
+        for key, r in zip(keys, rate):
+            sent[key] += r * args.capacity * 1e6 / 8 * args.interval
+        cpu.append(poll(router, fabric, sent, started, now))
+    mice = set(k for k, d in zip(keys, demand) if d < 1)
+    return throughput, router.elephants, len(mice & set(router.elephants)), cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FTRouter throughput with and without '
+                                                 'elephant scheduling')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--rounds', type=int, default=3, help='polls and schedules')
+    parser.add_argument('--mice', type=int, default=2, help='short flows per host')
+    parser.add_argument('--mouse', type=float, default=0.02, help='their rate, of a link')
+    parser.add_argument('--capacity', type=float, default=15, help='Mbit/s per link')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between polls')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'k':>3} {'policy':>9} {'flows':>6} {'Mbit/s':>9} {'of hosts':>9} "
+          f"{'by round':>24} {'elephants':>10} {'mice placed':>12} {'poll [ms]':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        rng = random.Random(args.seed)
+        hosts = list(range(ft_topo.n_switch, len(ft_topo)))
+        order = hosts[:]
+        rng.shuffle(order)
+        flows = [(order[i], order[i - 1], pktparse.IP_PROTO_TCP, (10000 + i, 5001), 1.0)
+                 for i in range(len(order))]
+        for h in hosts:
+            for m in range(args.mice):
+                dst = rng.choice([d for d in hosts if d != h])
+                flows.append((h, dst, pktparse.IP_PROTO_UDP, (20000 + m, 53), args.mouse))
+        n = len(hosts)
+        for name, elephants in (('two-level', False), ('hedera', True)):
+            throughput, placed, mice, cpu = run(ft_topo, flows, args, elephants)
+            rounds = ' '.join(f"{t:.2f}" for t in throughput)
+            mean_cpu = sum(cpu) / len(cpu) * 1e3 if cpu else 0.0
+            print(f"{k:>3} {name:>9} {len(flows):>6} "
+                  f"{throughput[-1] * n * args.capacity:>9.1f} {throughput[-1]:>9.2f} "
+                  f"{rounds:>24} {len(placed):>10} {mice:>12} {mean_cpu:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# All-to-all reachability of SPRouter and FTRouter on the in-process
+# fabric (stub_datapath.StubFabric), at sizes Mininet cannot run.
+#
+#   python3 sim_fabric.py --k 16 32 --router sp ft
+#   SP_ECMP=1 python3 sim_fabric.py --k 16 --router sp
+#
+# The router's switches connect and host locations are known (as after
+# the first ARP exchange), then every host sends an IPv4 packet to every
+# other host. A packet is first followed through the flow tables alone;
+# where it would miss, it is sent for real: table misses are packet-ins,
+# the router's flow-mods, group-mods and packet-outs act on the stand-in
+# switches, and the tables must then carry it.
+#
+# Per destination, where a packet goes from a switch depends only on
+# the port it came in on, and only if the switch matches on in_port:
+# the outcome of each such state is found once and holds for every host
+# whose packet gets there, so the hosts of an edge switch mostly count
+# at once instead of one walk each. Past a switch whose forwarding looks
+# at the source (a SELECT group or an ipv4_src match) every host is
+# walked with its own packet. --one-per-edge takes one source host per
+# edge switch. Reported: packet-ins per flow (the first host of an edge
+# switch raises the misses, its neighbors then find the rules), path
+# length in switches, rules per switch by tier and the time taken.
+# Exits 1 if a flow is not delivered.
+#
+# Every destination still costs a table lookup at each switch its
+# packets pass. All pairs take seconds at k=16 for FTRouter and tens of
+# seconds for SPRouter (mostly the router handling its packet-ins), and
+# minutes for either at k=32. --one-per-edge cuts the sends, not the
+# lookups.
+
+import argparse
+import socket
+import struct
+import sys
+import time
+
+import pktparse
+import routing
+import topo
+from stub_datapath import StubFabric, ipv4_frame
+from ryu.ofproto import ofproto_v1_3
+
+_IPV4_HEADER = struct.Struct('!10H')
+
+
+def readdress(frame, src_mac, src_ip):
+    # frame (untagged IPv4) as sent by another host: source MAC and IP,
+    # and the IPv4 header checksum
+    b = bytearray(frame)
+    b[6:12] = src_mac
+    b[26:30] = socket.inet_aton(src_ip)
+    b[24:26] = b'\x00\x00'
+    total = sum(_IPV4_HEADER.unpack_from(b, 14))
+    total = (total & 0xffff) + (total >> 16)
+    total = (total & 0xffff) + (total >> 16)
+    b[24:26] = struct.pack('!H', ~total & 0xffff)
+    return bytes(b)
+
+
+def make_router(name, ft_topo):
+    if name == 'sp':
+        import sp_routing
+        sp_routing.logger.disabled = True
+        router = sp_routing.SPRouter()
+        router.set_fattree(ft_topo)
+        router.routes.rebuild(routing.fattree_graph(ft_topo))
+    else:
+        import ft_routing
+        router = ft_routing.FTRouter()
+        router.set_fattree(ft_topo)
+    return router
+
+
+def on_source(dp):
+    # Whether switch dp forwards by the source address: an ipv4_src match,
+    # or a SELECT group, which picks a bucket by source and destination
+    return 'ipv4_src' in dp.flows.fields_used or any(
+        group_type == ofproto_v1_3.OFPGT_SELECT for group_type, _ in dp.groups.values())
+
+
+def outcome(fabric, node, in_port, data, cache, memo):
+    """
+    (node it ends at, switches on the way, forwarded by the source on
+    the way) of data coming in on in_port of switch node, as path()
+    follows it. memo {decision key: outcome} holds them for one
+    destination while the tables stay as they are.
+    """
+    ft = fabric.ft
+    trail = []      # (decision key, on_source) of the switches passed
+    while True:
+        if ft.types[node] == topo.HOST:
+            result = (node, 0, False)
+            break
+        key = fabric.decision_key(node, in_port)
+        result = memo.get(key)
+        if result is not None:
+            break
+        dp = fabric.datapaths[fabric.addr.dpid(node)]
+        trail.append((key, on_source(dp)))
+        link = fabric.next_hop(node, in_port, data, cache) \
+            if len(trail) <= fabric.MAX_HOPS else None
+        if link is None:
+            result = (node, 0, False)
+            break
+        node, in_port = link
+    end, n, by_source = result
+    for key, source in reversed(trail):
+        n += 1
+        by_source = by_source or source
+        memo[key] = result = (end, n, by_source)
+    return result
+
+
+class Tally(object):
+    # Flows by packet-ins and by path length, flows lost, counted n at a time
+
+    def __init__(self):
+        self.flows = self.lost = self.walked = 0
+        self.packet_ins = {}    # packet-ins of a flow -> flows
+        self.lengths = {}       # switches on the path -> flows
+
+    def add(self, delivered, switches, packet_ins=0, n=1):
+        self.flows += n
+        self.packet_ins[packet_ins] = self.packet_ins.get(packet_ins, 0) + n
+        if delivered:
+            self.lengths[switches] = self.lengths.get(switches, 0) + n
+        else:
+            self.lost += n
+
+
+def walk(fabric, tally, src, dst, frame):
+    # One flow on its own: followed, and sent for real if it would miss
+    tally.walked += 1
+    before = fabric.packet_ins
+    switches, end = fabric.path(src, frame)
+    if end != dst:
+        fabric.send(src, frame)
+        switches, end = fabric.path(src, frame)
+    tally.add(end == dst, len(switches), fabric.packet_ins - before)
+
+
+def run(name, k, one_per_edge):
+    ft_topo = topo.Fattree(k)
+    start = time.perf_counter()
+    router = make_router(name, ft_topo)
+    fabric = StubFabric(router, ft_topo)
+    addr = fabric.addr
+    hosts = list(range(ft_topo.n_switch, len(ft_topo)))
+    if name == 'sp':
+        for h in hosts:
+            router.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+    fabric.connect()
+    connected = time.perf_counter()
+
+    by_edge = {}        # edge switch -> its (source) hosts
+    for h in hosts:
+        by_edge.setdefault(ft_topo.neighbors(h)[0], []).append(h)
+    if one_per_edge:
+        by_edge = {edge: group[:1] for edge, group in by_edge.items()}
+    macs = {h: pktparse.mac_bytes(addr.mac(h)) for h in hosts}
+    tally = Tally()
+    for dst in hosts:
+        frame = ipv4_frame(addr.mac(dst), addr.mac(dst), addr.ip(dst), addr.ip(dst))
+        cache, memo = {}, {}
+        for edge, group in by_edge.items():
+            # hosts whose packets start in the same state go together
+            states = {}
+            for h in group:
+                if h != dst:
+                    key = fabric.decision_key(edge, addr.port(edge, h))
+                    states.setdefault(key, []).append(h)
+            for srcs in states.values():
+                in_port = addr.port(edge, srcs[0])
+                for i, src in enumerate(srcs):
+                    end, n, by_source = outcome(fabric, edge, in_port, frame, cache, memo)
+                    if by_source:
+                        walk(fabric, tally, src, dst, readdress(frame, macs[src], addr.ip(src)))
+                        continue
+                    if end == dst:
+                        tally.add(True, n, n=len(srcs) - i)
+                        break
+                    before = fabric.packet_ins
+                    fabric.send(src, readdress(frame, macs[src], addr.ip(src)))
+                    memo.clear()
+                    end, n, _ = outcome(fabric, edge, in_port, frame, cache, memo)
+                    tally.add(end == dst, n, fabric.packet_ins - before)
+    done = time.perf_counter()
+
+    rules = {}
+    for i in range(ft_topo.n_switch):
+        rules.setdefault(topo.TYPES[ft_topo.types[i]], []).append(
+            len(fabric.datapaths[addr.dpid(i)].flows))
+    groups = sum(len(dp.groups) for dp in fabric.datapaths.values())
+    delivered = tally.flows - tally.lost
+    mean_len = sum(n * c for n, c in tally.lengths.items()) / max(delivered, 1)
+    print(f"{name} k={k}: {len(hosts)} hosts, {tally.flows} flows "
+          f"({'one source per edge switch' if one_per_edge else 'all pairs'}, "
+          f"{tally.walked} walked one by one), {delivered} delivered, "
+          f"connect {connected - start:.2f}s, flows {done - connected:.2f}s")
+    print("  packet-ins/flow: " + "  ".join(
+        f"{n}:{c}" for n, c in sorted(tally.packet_ins.items())) +
+        f"  (total {fabric.packet_ins})")
+    print("  switches/path:   " + "  ".join(
+        f"{n}:{c}" for n, c in sorted(tally.lengths.items())) + f"  (mean {mean_len:.2f})")
+    print("  rules/switch:    " + "  ".join(
+        f"{tier} {min(v)}/{sum(v) / len(v):.0f}/{max(v)}" for tier, v in sorted(rules.items())) +
+        f"  (min/mean/max), groups {groups}")
+    return tally.lost == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='All-to-all reachability on the stand-in fabric')
+    parser.add_argument('--k', type=int, nargs='+', default=[16])
+    parser.add_argument('--router', choices=('sp', 'ft'), nargs='+', default=['sp', 'ft'])
+    parser.add_argument('--one-per-edge', action='store_true',
+                        help='one source host per edge switch, not every host')
+    args = parser.parse_args()
+
+    ok = True
+    for k in args.k:
+        for name in args.router:
+            ok &= run(name, k, args.one_per_edge)
+    if not ok:
+        print("FAIL: flows not delivered")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Single link failures under SPRouter, with and without fast failover.
+#
+#   python3 sim_failover.py --k 4 8 --flows 200 --failures 16
+#
+# For every failed switch-to-switch link (all of them, or --failures
+# random ones) a fresh SPRouter on stand-in switches first routes --flows
+# random host pairs. Then the link goes down and each flow sends a packet
+# three times:
+#   before  - the switches noticed, the controller not yet
+#   repair  - the port status of both ends reaches the controller
+#   after   - with whatever the controller did about it
+#   current - the link only leaves the graph (what the LLDP link delete
+#             did so far), installed rules stay until they idle out
+#   repair  - PortStatus moves the installed routes that used the link
+#   failover- repair plus SP_FAILOVER: FF groups with precomputed backups
+#             and their U-turn rules, so "before" needs no controller
+# Reports per failure: packets lost before/after, the controller's CPU
+# time for the port status and for packet-ins, and the flow/group-mods it
+# sent. Exits 1 if failover lost a packet or a route loops.
+
+import argparse
+import random
+import sys
+import time
+
+import topo
+import routing
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class CurrentSPRouter(sp_routing.SPRouter):
+
+    def link_down(self, u, v):
+        self.routes.remove_link(u, v)
+        self.routes.remove_link(v, u)
+
+
+class Meter(object):
+    # Controller CPU time per handler, and the flow/group-mods it sent
+
+    def __init__(self, router, fabric):
+        self.fabric = fabric
+        self.cpu = {}
+        for name in ('_packet_in_handler', '_port_status_handler'):
+            setattr(router, name, self.timed(name, getattr(router, name)))
+
+    def timed(self, name, handler):
+        def run(ev):
+            start = time.process_time()
+            handler(ev)
+            self.cpu[name] = self.cpu.get(name, 0) + time.process_time() - start
+        return run
+
+    def mods(self):
+        return sum(isinstance(m, (ofproto_v1_3_parser.OFPFlowMod,
+                                  ofproto_v1_3_parser.OFPGroupMod))
+                   for dp in self.fabric.datapaths.values() for m in dp.sent)
+
+
+def send_all(fabric, flows):
+    # One packet per flow; returns how many did not arrive
+    addr = fabric.addr
+    lost = 0
+    for src, dst in flows:
+        before = fabric.delivered
+        fabric.send(src, ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst)))
+        lost += fabric.delivered == before
+    return lost
+
+
+def fail(cls, ft_topo, flows, link):
+    router = cls()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = StubFabric(router, ft_topo)
+    meter = Meter(router, fabric)
+    fabric.connect()
+    addr = fabric.addr
+    for h in range(ft_topo.n_switch, len(ft_topo)):
+        router.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+    send_all(fabric, flows)
+    row = {'install': meter.mods()}
+
+    fabric.fail_link(*link)
+    meter.cpu.clear()
+    packet_ins, dropped = fabric.packet_ins, fabric.dropped
+    row['lost_before'] = send_all(fabric, flows)
+    mods = meter.mods()
+    fabric.report_link(*link)
+    row['repair_mods'] = meter.mods() - mods
+    mods = meter.mods()
+    row['lost_after'] = send_all(fabric, flows)
+    row['after_mods'] = meter.mods() - mods
+    row['packet_ins'] = fabric.packet_ins - packet_ins
+    row['repair_ms'] = meter.cpu.get('_port_status_handler', 0) * 1e3
+    row['packet_in_ms'] = meter.cpu.get('_packet_in_handler', 0) * 1e3
+    # frames that neither arrived nor hit the dead link went round in circles
+    row['looped'] = row['lost_before'] + row['lost_after'] - (fabric.dropped - dropped)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter link failure handling')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--flows', type=int, default=200)
+    parser.add_argument('--failures', type=int, default=16,
+                        help='random switch links to fail, 0 for all')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    ok = True
+    print(f"{'k':>3} {'mode':>8} {'install':>8} {'lost before':>11} {'lost after':>10} "
+          f"{'repair ms':>9} {'repair mods':>11} {'pkt-ins':>8} {'pkt-in ms':>9} "
+          f"{'after mods':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [tuple(rng.sample(hosts, 2)) for _ in range(args.flows)]
+        links = [(a, b) for a in range(ft_topo.n_switch) for b in ft_topo.neighbors(a)
+                 if a < b < ft_topo.n_switch]
+        if args.failures:
+            links = rng.sample(links, min(args.failures, len(links)))
+        for name, cls, failover in (('current', CurrentSPRouter, False),
+                                    ('repair', sp_routing.SPRouter, False),
+                                    ('failover', sp_routing.SPRouter, True)):
+            sp_routing.FAILOVER = failover
+            rows = [fail(cls, ft_topo, flows, link) for link in links]
+            mean = {key: sum(r[key] for r in rows) / len(rows) for key in rows[0]}
+            print(f"{k:>3} {name:>8} {mean['install']:>8.0f} {mean['lost_before']:>11.1f} "
+                  f"{mean['lost_after']:>10.1f} {mean['repair_ms']:>9.2f} "
+                  f"{mean['repair_mods']:>11.1f} {mean['packet_ins']:>8.1f} "
+                  f"{mean['packet_in_ms']:>9.2f} {mean['after_mods']:>10.1f}")
+            ok &= not any(r['looped'] for r in rows)
+            if failover:
+                ok &= not any(r['lost_before'] or r['lost_after'] for r in rows)
+    print('OK' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
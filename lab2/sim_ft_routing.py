@@ -0,0 +1,124 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# Checks FTRouter's proactive two-level tables against stand-in datapaths.
+#
+#   python3 sim_ft_routing.py --k 4 8
+#
+# Every switch "connects" (EventOFPSwitchFeatures), then an IPv4 packet and
+# an ARP request are walked hop by hop through the installed flow tables for
+# every ordered host pair. Reports rules per switch tier, deliveries and
+# table misses (which would be packet-ins); exits 1 if anything is wrong.
+
+import argparse
+import sys
+
+import topo
+import ft_routing
+from ryu.ofproto import ofproto_v1_3
+from addressing import Addressing
+from stub_datapath import stub_datapaths, switch_features_event, to_int
+
+
+def out_port(entry):
+    for inst in entry[2]:
+        for action in getattr(inst, 'actions', []):
+            if hasattr(action, 'port'):
+                return action.port
+    return None
+
+
+def walk(ft_topo, addr, datapaths, src, dst_ip, field, eth_type):
+    # Follow the flow tables from src's edge switch; returns (node, hops, misses)
+    node = ft_topo.neighbors(src)[0]
+    port = addr.port(node, src)
+    hops = 0
+    while ft_topo.types[node] != topo.HOST and hops < 8:
+        dp = datapaths[addr.dpid(node)]
+        entry = dp.flows.lookup({'in_port': port, 'eth_type': eth_type,
+                                 field: to_int(dst_ip)})
+        out = out_port(entry) if entry is not None else None
+        if out is None or out == ofproto_v1_3.OFPP_CONTROLLER:
+            return node, hops, 1
+        nxt = addr.neighbor(node, out)
+        port = addr.port(nxt, node)
+        node = nxt
+        hops += 1
+    return node, hops, 0
+
+
+def check(k):
+    ft_topo = topo.Fattree(k)
+    addr = Addressing(ft_topo)
+    datapaths = stub_datapaths(ft_topo)
+
+    router = ft_routing.FTRouter()
+    router.set_fattree(ft_topo)
+    for dp in datapaths.values():
+        router.switch_features_handler(switch_features_event(dp))
+
+    ok = True
+    half = k // 2
+    expected = {'edge': 1 + 2 * (half + half), 'agg': 1 + 2 * (half + half),
+                'core': 1 + 2 * k}
+    sizes = {}
+    for i in range(ft_topo.n_switch):
+        kind = topo.TYPES[ft_topo.types[i]]
+        n = len(datapaths[addr.dpid(i)].flows)
+        sizes.setdefault(kind, set()).add(n)
+        ok &= n == expected[kind]
+
+    hosts = range(ft_topo.n_switch, len(ft_topo))
+    pairs = delivered = misses = total_hops = 0
+    for src in hosts:
+        for dst in hosts:
+            if src == dst:
+                continue
+            dst_ip = addr.ip(dst)
+            for field, eth_type in (('ipv4_dst', 0x0800), ('arp_tpa', 0x0806)):
+                node, hops, miss = walk(ft_topo, addr, datapaths, src, dst_ip,
+                                        field, eth_type)
+                pairs += 1
+                misses += miss
+                if node == dst:
+                    delivered += 1
+                    total_hops += hops
+    ok &= delivered == pairs and misses == 0
+
+    tiers = ' '.join(f"{t}={'/'.join(map(str, sorted(v)))}" for t, v in sorted(sizes.items()))
+    print(f"k={k:<3} rules/switch {tiers}  walks={pairs} delivered={delivered} "
+          f"packet-ins={misses} mean-hops={total_hops / max(delivered, 1):.2f} "
+          f"{'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='check FTRouter proactive tables')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    args = parser.parse_args()
+    results = [check(k) for k in args.k]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Hottest link under SPRouter with and without load-aware routing
+# (SP_LOAD_AWARE), with stand-in port statistics.
+#
+#   python3 sim_loadaware.py --k 4 8 --flows 400 --rate 1
+#
+# Flows between random hosts start --every at a time; each sends --rate
+# Mbit/s until the end. A flow's first packet goes through SPRouter on
+# stand-in switches, then the flow follows the installed rules and its
+# rate adds to the load of every switch link on its path. After each
+# batch --interval simulated seconds pass: the switches' tx counters
+# advance by their load, SPRouter sends its port stats requests and the
+# switches answer them (as its polling thread would, without the thread).
+# Reports per policy the utilization of the hottest link and the mean of
+# the used ones, the links over capacity, and the time one stats round
+# (requests and replies for every switch) costs the controller.
+
+import argparse
+import random
+import statistics
+import time
+
+import topo
+import routing
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame, port_stats_reply_event, to_int
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+def flow_links(fabric, src, dst):
+    # (dpid, out port) of the switch links the installed rules carry src's
+    # packets to dst over, None if they do not get there
+    addr = fabric.addr
+    ft_topo = fabric.ft
+    node = ft_topo.neighbors(src)[0]
+    in_port = addr.port(node, src)
+    links = []
+    for _ in range(fabric.MAX_HOPS):
+        dp = fabric.datapaths[addr.dpid(node)]
+        entry = dp.flows.lookup({'in_port': in_port, 'eth_type': 0x0800,
+                                 'ipv4_dst': to_int(addr.ip(dst))})
+        if entry is None:
+            return None
+        port = entry[2][0].actions[0].port
+        nxt = addr.neighbor(node, port)
+        if nxt == dst:
+            return links
+        if ft_topo.types[nxt] == topo.HOST:
+            return None
+        links.append((dp.id, port))
+        in_port = addr.port(nxt, node)
+        node = nxt
+    return None
+
+
+def stats_round(router, fabric, counters, now):
+    # SPRouter asks every switch for its port stats, the switches answer;
+    # returns the controller's CPU seconds for it (requests and replies,
+    # not the stand-ins building the replies)
+    start = time.process_time()
+    router.request_port_stats(list(fabric.datapaths.values()))
+    spent = time.process_time() - start
+    replies = []
+    for dpid, dp in fabric.datapaths.items():
+        asked = sum(isinstance(msg, ofproto_v1_3_parser.OFPPortStatsRequest)
+                    for msg in dp.sent[fabric.seen[dpid]:])
+        fabric.seen[dpid] = len(dp.sent)
+        tx = {port: counters.get((dpid, port), 0) for port in dp.ports}
+        replies += [port_stats_reply_event(dp, tx, now) for _ in range(asked)]
+    start = time.process_time()
+    for ev in replies:
+        router._port_stats_reply_handler(ev)
+    return spent + time.process_time() - start
+
+
+def run(ft_topo, flows, args, load_aware):
+    sp_routing.LOAD_AWARE = load_aware
+    sp_routing.LINK_MBPS = args.capacity
+    sp_routing.HOST_CACHE_SIZE = len(ft_topo) - ft_topo.n_switch    # every host known
+    router = sp_routing.SPRouter()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = StubFabric(router, ft_topo)
+    addr = fabric.addr
+    fabric.connect()
+    for h in range(ft_topo.n_switch, len(ft_topo)):
+        router.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+
+    load = {}           # (dpid, port) -> Mbit/s
+    counters = {}       # (dpid, port) -> tx bytes
+    now = 1.0
+    stats = []
+    for i in range(0, len(flows), args.every):
+        for src, dst in flows[i:i + args.every]:
+            fabric.send(src, ipv4_frame(addr.mac(src), addr.mac(dst),
+                                        addr.ip(src), addr.ip(dst)))
+            links = flow_links(fabric, src, dst)
+            if links is None:
+                raise SystemExit(f"flow {addr.ip(src)} -> {addr.ip(dst)} not routed")
+            for link in links:
+                load[link] = load.get(link, 0) + args.rate
+        for link, mbps in load.items():
+            counters[link] = counters.get(link, 0) + mbps * 1e6 / 8 * args.interval
+        now += args.interval
+        stats.append(stats_round(router, fabric, counters, now))
+    return load, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hottest link, SPRouter with and '
+                                                 'without load-aware routing')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--flows', type=int, default=400)
+    parser.add_argument('--rate', type=float, default=1, help='Mbit/s per flow')
+    parser.add_argument('--capacity', type=float, default=15, help='Mbit/s per link')
+    parser.add_argument('--every', type=int, default=10, help='new flows per interval')
+    parser.add_argument('--interval', type=float, default=2, help='seconds between polls')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    print(f"{'k':>3} {'policy':>10} {'flows':>6} {'links used':>10} {'max util':>9} "
+          f"{'mean util':>10} {'over cap':>9} {'switches':>9} {'stats round [ms]':>17}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [tuple(rng.sample(hosts, 2)) for _ in range(args.flows)]
+        for name, load_aware in (('sp', False), ('load-aware', True)):
+            load, stats = run(ft_topo, flows, args, load_aware)
+            util = [mbps / args.capacity for mbps in load.values()]
+            print(f"{k:>3} {name:>10} {len(flows):>6} {len(util):>10} {max(util):>9.2f} "
+                  f"{statistics.mean(util):>10.2f} {sum(u > 1 for u in util):>9} "
+                  f"{ft_topo.n_switch:>9} {statistics.mean(stats) * 1e3:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+#!/usr/bin/env python3
+
+# All-to-all ping (Mininet's pingall) through SPRouter on stand-in switches.
+#
+#   python3 sim_ping.py --k 4 8
+#
+# Every host pings every other one: an ARP request if it does not know the
+# MAC yet, then an IPv4 echo and its reply. Hosts answer ARP and learn from
+# it as Linux does. Reports packet-ins, controller CPU time spent in
+# SPRouter's handlers and packets delivered, with the ARP proxy on
+# (SP_ARP_PROXY=1) and off; exits 1 if a ping got lost.
+
+import argparse
+import sys
+import time
+
+import topo
+import routing
+import pktparse
+import sp_routing
+from stub_datapath import StubFabric, ipv4_frame
+
+
+class TimedFabric(StubFabric):
+    # Counts the controller's CPU time in packet-in handling
+
+    cpu = 0.0
+
+    def packet_in(self, dp, in_port, data):
+        start = time.process_time()
+        super(TimedFabric, self).packet_in(dp, in_port, data)
+        self.cpu += time.process_time() - start
+
+
+def pingall(ft_topo, proxy):
+    sp_routing.ARP_PROXY = proxy
+    router = sp_routing.SPRouter()
+    router.set_fattree(ft_topo)
+    router.routes.rebuild(routing.fattree_graph(ft_topo))
+    fabric = TimedFabric(router, ft_topo)
+    fabric.connect()
+    addr = fabric.addr
+
+    hosts = range(ft_topo.n_switch, len(ft_topo))
+    lost = 0
+    for src in hosts:
+        for dst in hosts:
+            if src == dst:
+                continue
+            src_ip, dst_ip = addr.ip(src), addr.ip(dst)
+            if dst_ip not in fabric.arp_cache.get(src, {}):
+                request = pktparse.arp_frame(pktparse.ARP_REQUEST,
+                                             pktparse.mac_bytes(addr.mac(src)), src_ip,
+                                             None, dst_ip)
+                fabric.send(src, request)
+                if dst_ip not in fabric.arp_cache.get(src, {}):
+                    lost += 1
+                    continue
+            for a, b in ((src, dst), (dst, src)):
+                before = len(fabric.inbox.get(b, ()))
+                fabric.send(a, ipv4_frame(addr.mac(a), addr.mac(b), addr.ip(a), addr.ip(b)))
+                if len(fabric.inbox.get(b, ())) == before:
+                    lost += 1
+                    break
+    return fabric, lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description='pingall packet-ins, ARP proxy on/off')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    ok = True
+    print(f"{'k':>3} {'arp proxy':>9} {'pings':>7} {'lost':>5} {'packet-ins':>11} "
+          f"{'cpu [s]':>8} {'delivered':>10}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        n_hosts = len(ft_topo) - ft_topo.n_switch
+        for proxy in (False, True):
+            fabric, lost = pingall(ft_topo, proxy)
+            ok &= lost == 0
+            print(f"{k:>3} {'on' if proxy else 'off':>9} {n_hosts * (n_hosts - 1):>7} "
+                  f"{lost:>5} {fabric.packet_ins:>11} {fabric.cpu:>8.2f} {fabric.delivered:>10}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
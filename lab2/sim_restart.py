@@ -0,0 +1,215 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Controller restarts under SPRouter: cold (what a restart does now) and
+# warm (SP_WARM: checkpoint plus flow table reconciliation).
+#
+#   python3 sim_restart.py --k 4 8 --flows 500
+#
+# A first SPRouter on stand-in switches routes --flows random host pairs
+# and writes a checkpoint. Then a fresh SPRouter takes over the same
+# switches, which keep their tables (--lost: they restarted too and come
+# back empty), and the flows send a packet per round until a round needs
+# no packet-in:
+#   cold - nothing carried over; the topology is there as soon as the
+#          switches connect (LLDP discovery is not simulated), hosts and
+#          routes come back through packet-ins
+#   warm - the checkpoint is read, every switch's groups and flow entries
+#          are read on connect and only what is missing or stale is sent
+# Reported per routing mode: controller CPU time from the first switch
+# connecting to that round (reconverge), flow/group-mods sent and
+# packet-ins, packets lost in the first round, and the rules on the
+# switches the new controller knows about. Finally a link of the flows'
+# paths fails: packets lost after the controller repaired the routes
+# (routes it does not know about are not moved). Exits 1 if a warm
+# restart needed a packet-in, lost a packet or leaves rules unknown.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import topo
+import routing
+import sp_routing
+from stub_datapath import StubFabric, FlowTable, ipv4_frame
+from ryu.ofproto import ofproto_v1_3_parser
+
+MODES = {
+    'default': {},
+    'ecmp': {'ECMP': True},
+    'failover': {'FAILOVER': True},
+    'aggregate': {'AGGREGATE': True},
+}
+MAX_ROUNDS = 5
+
+
+class Meter(object):
+    # Controller CPU time in the handlers the fabric calls
+
+    HANDLERS = ('switch_features_handler', '_packet_in_handler', '_barrier_reply_handler',
+                '_port_status_handler', '_flow_removed_handler',
+                '_flow_stats_reply_handler', '_group_desc_reply_handler')
+
+    def __init__(self, router):
+        self.cpu = 0.0
+        for name in self.HANDLERS:
+            setattr(router, name, self.timed(getattr(router, name)))
+
+    def timed(self, handler):
+        def run(ev):
+            start = time.process_time()
+            handler(ev)
+            self.cpu += time.process_time() - start
+        return run
+
+
+def mods(fabric):
+    return sum(isinstance(m, (ofproto_v1_3_parser.OFPFlowMod, ofproto_v1_3_parser.OFPGroupMod))
+               for dp in fabric.datapaths.values() for m in dp.sent)
+
+
+def send_all(fabric, flows):
+    # One packet per flow; returns how many did not arrive
+    addr = fabric.addr
+    lost = 0
+    for src, dst in flows:
+        before = fabric.delivered
+        fabric.send(src, ipv4_frame(addr.mac(src), addr.mac(dst), addr.ip(src), addr.ip(dst)))
+        lost += fabric.delivered == before
+    return lost
+
+
+def known(router, fabric):
+    # Share of the route rules on the switches the controller has as sent
+    # (with AGGREGATE: compiled)
+    have = mine = 0
+    for dpid, dp in fabric.datapaths.items():
+        sent = router.batcher.sent.get(dpid, {})
+        for e in dp.flows.entries:
+            if sp_routing.ROUTE_PRIORITY <= e[0] <= sp_routing.ROUTE_PRIORITY + 32:
+                have += 1
+                mine += router.batcher.rule(e[3].table_id, e[0], e[3].match) in sent
+    return mine / have if have else 1.0
+
+
+def router_for(ft_topo):
+    warm = sp_routing.WARM
+    sp_routing.WARM = False     # no checkpoint thread, no checkpoint of the default fabric
+    router = sp_routing.SPRouter()
+    sp_routing.WARM = warm
+    router.set_fattree(ft_topo)
+    return router
+
+
+def restart(ft_topo, flows, warm, lost_tables, link, path):
+    graph = routing.fattree_graph(ft_topo)
+    sp_routing.WARM = False
+    first = router_for(ft_topo)
+    first.routes.rebuild(graph)
+    fabric = StubFabric(first, ft_topo, stats=True)
+    fabric.connect()
+    addr = fabric.addr
+    for h in range(ft_topo.n_switch, len(ft_topo)):
+        first.ip_location[addr.ip(h)] = addr.host_location(addr.ip(h))
+    send_all(fabric, flows)
+    first.write_checkpoint(path)
+    if lost_tables:
+        for dp in fabric.datapaths.values():
+            dp.flows = FlowTable()
+            dp.groups.clear()
+
+    sp_routing.WARM = warm
+    router = router_for(ft_topo)
+    if warm:
+        router.load_checkpoint(path)
+    else:
+        router.routes.rebuild(graph)
+    meter = Meter(router)
+    fabric.router = router
+    row = {'mods': mods(fabric), 'packet_ins': fabric.packet_ins}
+    fabric.connect()
+    rounds = []
+    for _ in range(MAX_ROUNDS):
+        packet_ins = fabric.packet_ins
+        rounds.append(send_all(fabric, flows))
+        if fabric.packet_ins == packet_ins:
+            break
+    row['reconverge_ms'] = meter.cpu * 1e3
+    row['mods'] = mods(fabric) - row['mods']
+    row['packet_ins'] = fabric.packet_ins - row['packet_ins']
+    row['lost'] = rounds[0]
+    row['rounds'] = len(rounds)
+    row['known'] = known(router, fabric)
+
+    fabric.fail_link(*link)
+    fabric.report_link(*link)
+    row['lost_failure'] = send_all(fabric, flows)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SPRouter cold and warm controller restart')
+    parser.add_argument('--k', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--flows', type=int, default=500)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--lost', action='store_true',
+                        help='the switches restart too, with empty tables')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sp_routing.logger.disabled = True
+    path = os.path.join(tempfile.mkdtemp(), 'sp_routing.ckpt')
+    ok = True
+    print(f"{'k':>3} {'mode':>9} {'restart':>7} {'reconverge ms':>13} {'mods':>6} "
+          f"{'pkt-ins':>7} {'lost':>5} {'rounds':>6} {'known':>6} {'lost on failure':>15}")
+    for k in args.k:
+        ft_topo = topo.Fattree(k)
+        rng = random.Random(args.seed)
+        hosts = range(ft_topo.n_switch, len(ft_topo))
+        flows = [tuple(rng.sample(hosts, 2)) for _ in range(args.flows)]
+        # an aggregation-core link: some of the flows cross it
+        agg = ft_topo.agg_index(0, 0)
+        link = (agg, next(v for v in ft_topo.neighbors(agg) if ft_topo.types[v] == topo.CORE))
+        for mode in args.modes:
+            for name, value in (('ECMP', False), ('FAILOVER', False), ('AGGREGATE', False)):
+                setattr(sp_routing, name, MODES[mode].get(name, value))
+            for warm in (False, True):
+                row = restart(ft_topo, flows, warm, args.lost, link, path)
+                print(f"{k:>3} {mode:>9} {'warm' if warm else 'cold':>7} "
+                      f"{row['reconverge_ms']:>13.1f} {row['mods']:>6} {row['packet_ins']:>7} "
+                      f"{row['lost']:>5} {row['rounds']:>6} {row['known']:>6.0%} "
+                      f"{row['lost_failure']:>15}")
+                if warm:
+                    ok &= not row['packet_ins'] and not row['lost'] and row['known'] == 1.0
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+    print('OK' if ok else 'FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
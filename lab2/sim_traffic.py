@@ -0,0 +1,490 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Flow-level traffic simulator: how routing policies spread load over a
+# fat-tree, without Mininet.
+#
+#   python3 sim_traffic.py --k 16 --traffic permutation
+#   python3 sim_traffic.py --k 64 --traffic hotspot --hotspots 8 --top 5
+#   python3 sim_traffic.py --k 8 --traffic file --file flows.txt --json out.json
+#
+# Traffic matrices (host pairs, all flows elastic unless --demand/the file
+# gives a rate in Mbit/s):
+#   permutation - every host sends to one other, every host receives once
+#   all-to-all  - every host to every other (--fanout: to that many, the
+#                 same random offsets for every host, so all receive equally)
+#   hotspot     - every host to one of --hotspots random hosts
+#   file        - lines "src dst [Mbit/s]", hosts as ids (h000) or IPs
+# Policies choose each flow's path through the fabric:
+#   sp          - SPRouter's route table: the lowest-port equal-cost next hop
+#   two-level   - Al-Fares prefix/suffix tables (FTRouter): uplinks by the
+#                 destination's host id
+#   ecmp        - a SELECT group per hop, a hash of the flow's addresses
+# Paths are rows of directed link ids (Fattree's CSR adjacency entries),
+# rates the max-min fair share (progressive filling, --tolerance) with
+# every link at --bw; per link loads come from NumPy bincounts over the
+# incidences, so k=64 (65536 hosts) takes seconds. sp and two-level paths are checked
+# against routing.RouteTable and routing.two_level_tables() (all flows for
+# k <= 8, --check of them otherwise); exits 1 on a mismatch.
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import topo
+import routing
+from addressing import Addressing
+
+POLICIES = ('sp', 'two-level', 'ecmp')
+TRAFFIC = ('permutation', 'all-to-all', 'hotspot', 'file')
+TIERS = ('host up', 'pod up', 'core up', 'core down', 'pod down', 'host down')
+MAX_FLOWS = 20000000
+
+
+def _np(values):
+    # array.array / bytearray of a Fattree as a NumPy view, no copy
+    if isinstance(values, bytearray):
+        return np.frombuffer(values, dtype=np.uint8)
+    return np.frombuffer(values, dtype=f"i{values.itemsize}")
+
+
+def _mix(*columns):
+    # splitmix64 of the columns combined: a per-flow hash, uniform enough
+    # to stand in for a switch's SELECT group hash
+    h = np.zeros(len(columns[0]), dtype=np.uint64)
+    for n, col in enumerate(columns):
+        h ^= (col.astype(np.uint64) + np.uint64(n + 1)) * np.uint64(0x9e3779b97f4a7c15)
+        h ^= h >> np.uint64(30)
+        h *= np.uint64(0xbf58476d1ce4e5b9)
+        h ^= h >> np.uint64(27)
+        h *= np.uint64(0x94d049bb133111eb)
+        h ^= h >> np.uint64(31)
+    return h
+
+
+class Fabric(object):
+    """
+    NumPy view of a topo.Fattree for the simulator. Directed link l is
+    adjacency entry l: from link_src[l] to link_dst[l] (node indices).
+    """
+
+    def __init__(self, ft_topo):
+        self.ft = ft_topo
+        self.k = ft_topo.num_ports
+        self.half = self.k // 2
+        self.n = len(ft_topo)
+        self.types = _np(ft_topo.types)
+        self.pods = _np(ft_topo.pods)
+        self.subs = _np(ft_topo.subs)
+        self.idxs = _np(ft_topo.idxs)
+        indptr = _np(ft_topo.indptr).astype(np.int64)
+        self.link_dst = _np(ft_topo.indices).astype(np.int64)
+        self.link_src = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(indptr))
+        keys = self.link_src * self.n + self.link_dst
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+        self.hosts = np.arange(ft_topo.n_switch, self.n, dtype=np.int64)
+
+        # tier of every directed link, an index into TIERS
+        lo = np.minimum(self.types[self.link_src], self.types[self.link_dst])
+        up = self.types[self.link_dst] > self.types[self.link_src]
+        lo = np.where(lo == topo.HOST, 0, np.where(lo == topo.EDGE, 1, 2))
+        self.link_tier = np.where(up, lo, 5 - lo)
+
+    def link_ids(self, src, dst):
+        # Directed link ids of node index pairs; all of them must be links
+        keys = src * self.n + dst
+        pos = np.searchsorted(self._keys, keys)
+        pos = np.minimum(pos, len(self._keys) - 1)
+        if not np.array_equal(self._keys[pos], keys):
+            raise ValueError("path crosses a pair of nodes that is not linked")
+        return self._order[pos]
+
+    def link_name(self, link):
+        ids = self.ft.ids
+        return f"{ids[self.link_src[link]]}->{ids[self.link_dst[link]]}"
+
+    def agg(self, pod, i):
+        return self.ft.n_core + pod * self.k + 2 * i
+
+    def edge(self, pod, i):
+        return self.ft.n_core + pod * self.k + 2 * i + 1
+
+    def paths(self, src, dst, policy):
+        """
+        Node index paths of the flows src[f] -> dst[f] under policy: an
+        (F, 7) array, host, edge, agg, core, agg, edge, host, shorter paths
+        end early and are padded with -1.
+        """
+        half = self.half
+        ps, pd = self.pods[src], self.pods[dst]
+        es, ed = self.subs[src], self.subs[dst]
+        hd = self.idxs[dst]
+        src_edge = self.edge(ps, es)
+        dst_edge = self.edge(pd, ed)
+
+        # uplink choices: agg a of the source pod, then core a * half + j
+        if policy == 'sp':
+            a = np.zeros_like(src)
+            j = np.zeros_like(src)
+        elif policy == 'two-level':
+            a = (hd + es) % half
+            j = (hd + a) % half
+        elif policy == 'ecmp':
+            a = (_mix(src, dst, src_edge) % np.uint64(half)).astype(np.int64)
+            j = (_mix(src, dst, self.agg(ps, a)) % np.uint64(half)).astype(np.int64)
+        else:
+            raise ValueError(f"unknown policy {policy}")
+
+        same_edge = (ps == pd) & (es == ed)
+        same_pod = (ps == pd) & ~same_edge
+        other = ps != pd
+        nodes = np.full((len(src), 7), -1, dtype=np.int64)
+        nodes[:, 0] = src
+        nodes[:, 1] = src_edge
+        nodes[same_edge, 2] = dst[same_edge]
+        up = self.agg(ps, a)
+        nodes[same_pod, 2] = up[same_pod]
+        nodes[same_pod, 3] = dst_edge[same_pod]
+        nodes[same_pod, 4] = dst[same_pod]
+        nodes[other, 2] = up[other]
+        nodes[other, 3] = a[other] * half + j[other]      # core_index()
+        nodes[other, 4] = self.agg(pd, a)[other]
+        nodes[other, 5] = dst_edge[other]
+        nodes[other, 6] = dst[other]
+        return nodes
+
+    def incidence(self, nodes):
+        # (flow of each incidence, link of each incidence) of node paths
+        flows = []
+        links = []
+        for h in range(nodes.shape[1] - 1):
+            hop = np.nonzero(nodes[:, h + 1] >= 0)[0]
+            flows.append(hop)
+            links.append(self.link_ids(nodes[hop, h], nodes[hop, h + 1]))
+        return np.concatenate(flows), np.concatenate(links)
+
+
+def _ranges(ptr, ids):
+    # Concatenated ranges ptr[i]:ptr[i + 1] of every i in ids
+    starts = ptr[ids]
+    lengths = ptr[ids + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def max_min(n_flows, flow_of, link_of, capacity, demand=None, tolerance=0.0):
+    """
+    Max-min fair rates by progressive filling: all unfrozen flows grow
+    together until a link is full (or a flow reaches its demand), the flows
+    crossing full links freeze at that rate, repeat. Returns (rates, rounds).
+
+    Each round only touches the links that still carry unfrozen flows and
+    the incidences of the flows it freezes. A random traffic matrix fills
+    its links at many slightly different rates, one round each; with a
+    tolerance, links whose fair share is within that fraction of the
+    smallest one count as full in the same round. That takes a tenth of the
+    rounds for tolerance=0.001 (ECMP all-to-all), with single rates within
+    about 1% and the total within 0.02% of the exact ones; links are never
+    filled beyond capacity.
+    """
+    n_links = len(capacity)
+    by_link = np.argsort(link_of, kind='stable')
+    link_ptr = np.searchsorted(link_of[by_link], np.arange(n_links + 1))
+    by_flow = np.argsort(flow_of, kind='stable')
+    flow_ptr = np.searchsorted(flow_of[by_flow], np.arange(n_flows + 1))
+
+    count = np.bincount(link_of, minlength=n_links).astype(float)   # unfrozen flows
+    remaining = capacity.astype(float)
+    rate = np.zeros(n_flows)
+    active = np.ones(n_flows, dtype=bool)
+    left = n_flows
+    if demand is not None:
+        active &= demand > 0
+        left = int(active.sum())
+        by_demand = np.argsort(demand, kind='stable')
+        next_demand = 0
+    live = np.nonzero(count)[0]
+    level = 0.0
+    rounds = 0
+    while left:
+        share = remaining[live] / count[live]
+        delta = share.min() if len(live) else np.inf
+        # fair rate a link fills at, compared to the lowest one
+        full = live[level + share <= (level + delta) * (1 + max(tolerance, 1e-9))]
+        if demand is not None:
+            while not active[by_demand[next_demand]]:
+                next_demand += 1
+            if demand[by_demand[next_demand]] - level < delta:
+                delta = demand[by_demand[next_demand]] - level
+                full = full[:0]
+        level += delta
+        remaining[live] -= delta * count[live]
+
+        frozen = flow_of[by_link[_ranges(link_ptr, full)]]
+        if demand is not None:
+            frozen = np.concatenate((frozen, np.nonzero(active & (demand <= level * (1 + 1e-9)))[0]))
+        frozen = np.unique(frozen)
+        frozen = frozen[active[frozen]]
+        rate[frozen] = level
+        active[frozen] = False
+        left -= len(frozen)
+        count -= np.bincount(link_of[by_flow[_ranges(flow_ptr, frozen)]], minlength=n_links)
+        live = live[count[live] > 0]
+        rounds += 1
+    return rate, rounds
+
+
+# ---------- traffic matrices: (src, dst, demand or None) ----------
+def permutation(fabric, rng):
+    # One random cycle through all hosts: nobody sends to itself
+    hosts = fabric.hosts
+    order = rng.permutation(len(hosts))
+    dst = np.empty_like(hosts)
+    dst[order] = hosts[np.roll(order, -1)]
+    return hosts, dst, None
+
+
+def all_to_all(fabric, rng, fanout=None):
+    hosts = fabric.hosts
+    n = len(hosts)
+    if fanout is None or fanout >= n - 1:
+        offsets = np.arange(1, n)
+    else:
+        offsets = 1 + rng.choice(n - 1, fanout, replace=False)
+    if n * len(offsets) > MAX_FLOWS:
+        raise ValueError(f"all-to-all is {n * len(offsets)} flows, more than "
+                         f"{MAX_FLOWS}; limit it with --fanout")
+    i = np.arange(n)
+    src = np.repeat(hosts, len(offsets))
+    dst = hosts[(np.repeat(i, len(offsets)) + np.tile(offsets, n)) % n]
+    return src, dst, None
+
+
+def hotspot(fabric, rng, hotspots=1):
+    hosts = fabric.hosts
+    hot = rng.choice(hosts, hotspots, replace=False)
+    dst = hot[rng.integers(0, hotspots, len(hosts))]
+    keep = hosts != dst
+    return hosts[keep], dst[keep], None
+
+
+def from_file(fabric, path):
+    # "src dst [Mbit/s]" per line, '#' starts a comment; hosts by id or IP
+    ft = fabric.ft
+    addr = Addressing(ft)
+
+    def host(name):
+        i = addr.host_of_ip(name) if name[0].isdigit() else ft.index_of(name)
+        if i is None or ft.types[i] != topo.HOST:
+            raise KeyError(name)
+        return i
+
+    src, dst, demand = [], [], []
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            try:
+                s, d = host(fields[0]), host(fields[1])
+                rate = float(fields[2]) if len(fields) > 2 else np.inf
+            except (IndexError, KeyError, ValueError) as e:
+                raise ValueError(f"{path}:{n}: bad flow {line.strip()!r} ({e})")
+            if s != d:
+                src.append(s)
+                dst.append(d)
+                demand.append(rate)
+    demand = np.array(demand, dtype=float)
+    return (np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+            None if np.isinf(demand).all() else demand)
+
+
+# ---------- checks against the controllers' tables ----------
+def check_paths(fabric, policy, nodes, sample):
+    # Walk sample flows through routing's tables and compare the nodes;
+    # returns the number of mismatches
+    ft = fabric.ft
+    addr = Addressing(ft)
+    if policy == 'sp':
+        # routes only towards the edge switches of the sample
+        dsts = {addr.dpid(ft.neighbors(nodes[f][nodes[f] >= 0][-1])[0]) for f in sample}
+        table = routing.RouteTable(dsts)
+        table.rebuild(routing.fattree_graph(ft))
+    elif policy == 'two-level':
+        tables = routing.two_level_tables(ft)
+    else:
+        return 0
+    bad = 0
+    for f in sample:
+        src = nodes[f, 0]
+        dst = nodes[f][nodes[f] >= 0][-1]
+        dst_edge = ft.neighbors(dst)[0]
+        dst_ip = addr.ip_int(dst)
+        walked = [src, ft.neighbors(src)[0]]
+        while walked[-1] != dst and len(walked) < 8:
+            u = walked[-1]
+            if policy == 'sp':
+                port = (addr.port(u, dst) if u == dst_edge
+                        else table.lookup(addr.dpid(u), addr.dpid(dst_edge)))
+            else:
+                rules = [(prio, port) for prio, ip, mask, port in tables[addr.dpid(u)]
+                         if dst_ip & _ip(mask) == _ip(ip) & _ip(mask)]
+                port = max(rules)[1]
+            walked.append(addr.neighbor(u, port))
+        bad += walked != list(nodes[f][nodes[f] >= 0])
+    return bad
+
+
+def _ip(dotted):
+    a, b, c, d = map(int, dotted.split('.'))
+    return a << 24 | b << 16 | c << 8 | d
+
+
+# ---------- results ----------
+def simulate(fabric, src, dst, demand, policy, bw, tolerance=0.0):
+    start = time.perf_counter()
+    nodes = fabric.paths(src, dst, policy)
+    flow_of, link_of = fabric.incidence(nodes)
+    capacity = np.full(len(fabric.link_src), float(bw))
+    rate, rounds = max_min(len(src), flow_of, link_of, capacity, demand, tolerance)
+    load = np.bincount(link_of, weights=rate[flow_of], minlength=len(capacity))
+    flows = np.bincount(link_of, minlength=len(capacity))
+    elapsed = time.perf_counter() - start
+    return nodes, rate, load / capacity, flows, rounds, elapsed
+
+
+def summary(fabric, policy, rate, util, flows, rounds, elapsed, top):
+    tiers = {}
+    for t, name in enumerate(TIERS):
+        sel = fabric.link_tier == t
+        tiers[name] = {'max_util': float(util[sel].max()), 'mean_util': float(util[sel].mean()),
+                       'max_flows': int(flows[sel].max())}
+    busiest = np.lexsort((-flows, -np.round(util, 6)))[:top]
+    return {
+        'policy': policy,
+        'flows': len(rate),
+        'throughput_mbit': float(rate.sum()),
+        'mean_rate_mbit': float(rate.mean()),
+        'min_rate_mbit': float(rate.min()),
+        'jain': float(rate.sum() ** 2 / (len(rate) * (rate ** 2).sum())),
+        'rounds': rounds,
+        'time_s': elapsed,
+        'tiers': tiers,
+        'top_links': [{'link': fabric.link_name(l), 'util': float(util[l]),
+                       'flows': int(flows[l])} for l in busiest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='flow-level traffic simulator for routing policies')
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--traffic', choices=TRAFFIC, default='permutation')
+    parser.add_argument('--policy', nargs='+', choices=POLICIES, default=list(POLICIES))
+    parser.add_argument('--bw', type=float, default=15, help='link capacity, Mbit/s')
+    parser.add_argument('--demand', type=float, default=0,
+                        help='Mbit/s every generated flow asks for (0 = elastic)')
+    parser.add_argument('--fanout', type=int, help='all-to-all: destinations per host')
+    parser.add_argument('--hotspots', type=int, default=1, help='hotspot: receiving hosts')
+    parser.add_argument('--file', help='file: the traffic matrix')
+    parser.add_argument('--tolerance', type=float, default=0.001,
+                        help='max-min: fill links within this fraction together (0 = exact)')
+    parser.add_argument('--top', type=int, default=3, help='most loaded links to list')
+    parser.add_argument('--check', type=int, default=20,
+                        help='flows checked against the tables for k > 8')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    try:
+        start = time.perf_counter()
+        ft_topo = topo.Fattree(args.k)
+        Addressing(ft_topo)     # ValueError for a k the addressing plan has no room for
+        fabric = Fabric(ft_topo)
+        if args.traffic == 'permutation':
+            src, dst, demand = permutation(fabric, rng)
+        elif args.traffic == 'all-to-all':
+            src, dst, demand = all_to_all(fabric, rng, args.fanout)
+        elif args.traffic == 'hotspot':
+            src, dst, demand = hotspot(fabric, rng, args.hotspots)
+        else:
+            if not args.file:
+                parser.error('--traffic file needs --file')
+            src, dst, demand = from_file(fabric, args.file)
+        setup = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if demand is None and args.demand:
+        demand = np.full(len(src), args.demand)
+    if not len(src):
+        parser.error('no flows')
+
+    print(f"k={args.k}: {len(fabric.hosts)} hosts, {len(fabric.link_src)} directed links "
+          f"at {args.bw:g} Mbit/s, {len(src)} {args.traffic} flows "
+          f"({'elastic' if demand is None else 'with demands'}), setup {setup:.2f}s")
+    print(f"{'policy':>9} {'Gbit/s':>9} {'mean':>7} {'min':>7} {'jain':>5} "
+          f"{'max util host/pod/core':>23} {'core flows':>10} {'rounds':>6} "
+          f"{'time [s]':>8} {'check':>6}")
+    ok = True
+    results = []
+    for policy in args.policy:
+        nodes, rate, util, flows, rounds, elapsed = simulate(fabric, src, dst, demand,
+                                                             policy, args.bw, args.tolerance)
+        row = summary(fabric, policy, rate, util, flows, rounds, elapsed, args.top)
+        n_check = len(src) if args.k <= 8 else min(args.check, len(src))
+        sample = rng.choice(len(src), n_check, replace=False)
+        bad = check_paths(fabric, policy, nodes, sample)
+        ok &= bad == 0
+        row['checked'] = n_check if policy != 'ecmp' else 0
+        row['mismatches'] = bad
+        results.append(row)
+
+        t = row['tiers']
+        util = '/'.join(f"{max(t[up]['max_util'], t[down]['max_util']):.2f}"
+                        for up, down in zip(TIERS[:3], TIERS[:2:-1]))
+        check = '-' if policy == 'ecmp' else ('ok' if not bad else f"{bad} bad")
+        print(f"{policy:>9} {row['throughput_mbit'] / 1000:>9.2f} {row['mean_rate_mbit']:>7.3g} "
+              f"{row['min_rate_mbit']:>7.3g} {row['jain']:>5.2f} {util:>23} "
+              f"{t['core up']['max_flows']:>10} {rounds:>6} {elapsed:>8.2f} {check:>6}")
+    for row in results:
+        links = ', '.join(f"{l['link']} {l['util']:.2f} ({l['flows']} flows)"
+                          for l in row['top_links'])
+        print(f"{row['policy']:>9} busiest: {links}")
+
+    if args.json:
+        meta = {'k': args.k, 'traffic': args.traffic, 'flows': len(src), 'bw_mbit': args.bw,
+                'tolerance': args.tolerance, 'seed': args.seed}
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+    if not ok:
+        print('FAIL: paths differ from the controllers\' tables')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
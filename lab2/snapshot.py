@@ -0,0 +1,281 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Compiled fat-tree snapshot shared by Mininet and the controllers.
+#
+#   python3 snapshot.py --k 16 -o fattree-k16.snap
+#   ./run.sh --snapshot fattree-k16.snap
+#   SP_SNAPSHOT=fattree-k16.snap ryu-manager sp_routing.py
+#
+# One file holds a topo.Fattree (node arrays and CSR adjacency), the
+# addressing plan (switch DPIDs, host IPs), the port of every adjacency
+# entry and SPRouter's route table: next-hop port and distance of every
+# switch towards every edge switch. Sections are flat native-order arrays
+# at 8-byte aligned offsets after a fixed header, so Snapshot maps the
+# file with mmap and reads them as memoryviews without parsing.
+#
+#   header  magic, version, byte order mark, k, counts, CRC-32 of the body
+#   body    ids ('\n' separated), types, pods, subs, idxs, indptr, indices,
+#           ports, dpids, ips, dsts, next_hop (0 = none), dist (NO_ROUTE)
+
+import argparse
+import array
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+import topo
+import routing
+from addressing import Addressing
+
+MAGIC = b'FTSN'
+VERSION = 1
+BYTE_ORDER_MARK = 0x0102
+NO_ROUTE = 0xffff
+
+# magic, version, byte order mark, k, id bytes, nodes, switches, adjacency
+# entries, destinations, body CRC-32
+_HEADER = struct.Struct('=4sHHIIIIIII')
+_ALIGN = 8
+
+
+def _sections(k, id_bytes, n, n_switch, nnz, n_dst):
+    # (name, typecode, item count) of the body, in file order
+    return (
+        ('ids', 'B', id_bytes),
+        ('types', 'B', n),
+        ('pods', 'i', n),
+        ('subs', 'i', n),
+        ('idxs', 'i', n),
+        ('indptr', 'i', n + 1),
+        ('indices', 'i', nnz),
+        ('ports', 'H', nnz),
+        ('dpids', 'I', n_switch),
+        ('ips', 'I', n - n_switch),
+        ('dsts', 'I', n_dst),
+        ('next_hop', 'H', n_dst * n_switch),
+        ('dist', 'H', n_dst * n_switch),
+    )
+
+
+def layout(sections):
+    # name -> (offset in the body, typecode, count); body size. Every
+    # section starts 8-byte aligned (shard.py lays out its memory the same way)
+    layout = {}
+    offset = 0
+    for name, code, count in sections:
+        layout[name] = (offset, code, count)
+        offset += -(-count * array.array(code).itemsize // _ALIGN) * _ALIGN
+    return layout, offset
+
+
+def compile_snapshot(ft_topo, table=None):
+    """
+    Snapshot file contents of ft_topo. table is a routing.RouteTable over
+    routing.fattree_graph(ft_topo); one is computed if not given.
+    """
+    addr = Addressing(ft_topo)
+    n = len(ft_topo)
+    n_switch = ft_topo.n_switch
+    if table is None:
+        table = routing.RouteTable(routing.edge_dpids(ft_topo))
+        table.rebuild(routing.fattree_graph(ft_topo))
+    dpids = [addr.dpid(i) for i in range(n_switch)]
+    dsts = sorted(table.next_hop)
+    next_hop = array.array('H')
+    dist = array.array('H')
+    for d in dsts:
+        ports = table.next_hop[d]
+        hops = table.dist[d]
+        next_hop.extend(ports.get(u, 0) for u in dpids)
+        dist.extend(hops.get(u, NO_ROUTE) for u in dpids)
+    ids = '\n'.join(ft_topo.ids).encode()
+
+    data = {
+        'ids': ids,
+        'types': bytes(ft_topo.types),
+        'pods': array.array('i', ft_topo.pods),
+        'subs': array.array('i', ft_topo.subs),
+        'idxs': array.array('i', ft_topo.idxs),
+        'indptr': array.array('i', ft_topo.indptr),
+        'indices': array.array('i', ft_topo.indices),
+        'ports': array.array('H', (addr.port(i, j) for i in range(n)
+                                   for j in ft_topo.neighbors(i))),
+        'dpids': array.array('I', dpids),
+        'ips': array.array('I', (addr.ip_int(h) for h in range(n_switch, n))),
+        'dsts': array.array('I', dsts),
+        'next_hop': next_hop,
+        'dist': dist,
+    }
+    counts = (ft_topo.num_ports, len(ids), n, n_switch, len(ft_topo.indices), len(dsts))
+    sections, size = layout(_sections(*counts))
+    body = bytearray(size)
+    for name, (offset, code, count) in sections.items():
+        chunk = bytes(data[name])
+        body[offset:offset + len(chunk)] = chunk
+    header = _HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, *counts, zlib.crc32(body))
+    return header + bytes(-len(header) % _ALIGN) + body
+
+
+def write(path, ft_topo, table=None):
+    # Compile ft_topo into path; replaced atomically, so a controller that
+    # has the old file mapped keeps reading consistent data. Returns the size.
+    data = compile_snapshot(ft_topo, table)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+class Snapshot(object):
+    """
+    Read-only view of a snapshot file through mmap. Sections are
+    memoryviews into the mapping (snap.section('dpids')[i] ...) until
+    close(); fattree(), graph() and load_routes() build the objects the
+    routers use from them. Raises ValueError for files that are not a
+    snapshot of this VERSION, or are truncated or corrupt.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = {}
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        if len(self.map) < _HEADER.size:
+            raise ValueError(f"{self.path}: not a fat-tree snapshot")
+        (magic, version, bom, k, id_bytes, n, n_switch, nnz, n_dst,
+         crc) = _HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not a fat-tree snapshot")
+        if version != VERSION:
+            raise ValueError(f"{self.path}: snapshot version {version}, "
+                             f"expected {VERSION}; compile it again")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{self.path}: written on a machine of the other byte order")
+        self.k = k
+        self.n_switch = n_switch
+        start = -(-_HEADER.size // _ALIGN) * _ALIGN
+        sections, size = layout(_sections(k, id_bytes, n, n_switch, nnz, n_dst))
+        if len(self.map) != start + size:
+            raise ValueError(f"{self.path}: truncated snapshot")
+        body = memoryview(self.map)[start:]
+        self.views['body'] = body
+        if zlib.crc32(body) != crc:
+            raise ValueError(f"{self.path}: snapshot checksum mismatch")
+        for name, (offset, code, count) in sections.items():
+            nbytes = count * array.array(code).itemsize
+            self.views[name] = body[offset:offset + nbytes].cast(code)
+
+    def section(self, name):
+        return self.views[name]
+
+    def close(self):
+        # The mapping can only go once no view into it is left
+        for view in reversed(list(self.views.values())):
+            view.release()
+        self.views.clear()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fattree(self):
+        # topo.Fattree of the snapshot; raises ValueError if the addressing
+        # plan changed since the snapshot was compiled
+        v = self.views
+        ft = topo.Fattree.from_arrays(
+            self.k, bytes(v['ids']).decode().split('\n'), v['types'], v['pods'],
+            v['subs'], v['idxs'], v['indptr'], v['indices'])
+        addr = Addressing(ft)
+        if (list(v['dpids']) != [addr.dpid(i) for i in range(ft.n_switch)]
+                or list(v['ips']) != [addr.ip_int(h) for h in range(ft.n_switch, len(ft))]):
+            raise ValueError(f"{self.path}: addressing plan changed; compile it again")
+        return ft
+
+    def graph(self):
+        # {dpid: {neighbor dpid: out_port}} as routing.fattree_graph()
+        v = self.views
+        dpids = v['dpids']
+        indptr = v['indptr']
+        indices = v['indices']
+        ports = v['ports']
+        n_switch = self.n_switch
+        graph = {}
+        for i in range(n_switch):
+            lo, hi = indptr[i], indptr[i + 1]
+            graph[dpids[i]] = {dpids[j]: p for j, p in zip(indices[lo:hi], ports[lo:hi])
+                               if j < n_switch}
+        return graph
+
+    def routes(self):
+        # ({dst: {dpid: out_port}}, {dst: {dpid: hops}}) as in routing.RouteTable
+        v = self.views
+        dpids = v['dpids'].tolist()
+        n_switch = self.n_switch
+        next_hop = {}
+        dist = {}
+        for d, dst in enumerate(v['dsts']):
+            lo = d * n_switch
+            hi = lo + n_switch
+            next_hop[dst] = {u: p for u, p in zip(dpids, v['next_hop'][lo:hi]) if p}
+            dist[dst] = {u: h for u, h in zip(dpids, v['dist'][lo:hi]) if h != NO_ROUTE}
+        return next_hop, dist
+
+    def load_routes(self, table):
+        # Fill routing.RouteTable table with the snapshot's graph and routes
+        table.load(self.graph(), *self.routes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compile a fat-tree snapshot file')
+    parser.add_argument('--k', type=int, default=4, help='switch ports (even)')
+    parser.add_argument('-o', '--output', help='file name (default fattree-k<k>.snap)')
+    args = parser.parse_args()
+
+    path = args.output or f"fattree-k{args.k}.snap"
+    start = time.perf_counter()
+    try:
+        size = write(path, topo.Fattree(args.k))
+    except ValueError as e:
+        parser.error(str(e))
+    sys.stderr.write(f"{path}: k={args.k}, {size} bytes in "
+                     f"{time.perf_counter() - start:.2f}s\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -24,93 +24,374 @@
 from ryu.base import app_manager
 from ryu.controller import mac_to_port
 from ryu.controller import ofp_event
-from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
+from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER, DEAD_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
+from ryu.lib import hub
 from ryu.lib.mac import haddr_to_bin
-from ryu.lib.packet import packet, ethernet, arp, ipv4
 
 from ryu.topology import event, switches
-from ryu.topology.api import get_switch, get_link
-from ryu.app.wsgi import ControllerBase
+from ryu.app.wsgi import WSGIApplication
 
 import topo
+import routing
+import addressing
+import logutil
+import pktparse
+import flowbatch
+import flowcompile
+import hostcache
+import linkload
+import metrics
+import pktrace
+import snapshot
 import heapq
+import json
 import os
-import logging
+import signal
+import time
 
-# Configure logging to file
+# Configure logging to file; records are written by a background thread,
+# per-packet records are DEBUG (SP_LOG_LEVEL=DEBUG) and rate-limited
 script_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(script_dir, "sp_routing.log")
 
-logger = logging.getLogger("ryu.app.sp_routing")
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler(log_file)
-fh.setLevel(logging.DEBUG)
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-fh.setFormatter(formatter)
-logger.addHandler(fh)
+logger = logutil.setup_logger("ryu.app.sp_routing", log_file)
+
+# ECMP: spread flows over all equal-cost next hops with OpenFlow SELECT groups
+ECMP = os.environ.get("SP_ECMP", "0") == "1"
+# Aggregate: install each switch's routes as a compiled (minimal) prefix table
+AGGREGATE = os.environ.get("SP_AGGREGATE", "0") == "1"
+# Failover: every route gets a precomputed backup next hop, both in an
+# OpenFlow fast-failover group, so the switch reroutes on its own
+FAILOVER = os.environ.get("SP_FAILOVER", "0") == "1"
+# ARP proxy: the controller answers ARP requests at the first edge switch
+ARP_PROXY = os.environ.get("SP_ARP_PROXY", "1") == "1"
+# Host cache: at most SP_HOST_CACHE locations, each forgotten SP_HOST_TTL
+# seconds after the host was last seen (least recently used first if full)
+HOST_CACHE_SIZE = int(os.environ.get("SP_HOST_CACHE", "4096"))
+HOST_TTL = float(os.environ.get("SP_HOST_TTL", "300"))
+# Routing rules expire after SP_IDLE_TIMEOUT seconds without traffic (0 = never)
+IDLE_TIMEOUT = int(os.environ.get("SP_IDLE_TIMEOUT", "60"))
+# Snapshot: fabric and routes from a snapshot.py file, so routing starts
+# before LLDP discovery, which then only confirms it; SP_SNAPSHOT_CHECK
+# seconds after startup what it did not confirm is taken down (0 = never)
+SNAPSHOT = os.environ.get("SP_SNAPSHOT", "")
+# Without a snapshot, the fabric is the k-ary fat-tree with k = SP_K; it has
+# to match the network's (fat-tree.py --k), or other pods' hosts are unknown
+K = int(os.environ.get("SP_K", "4"))
+SNAPSHOT_CHECK = float(os.environ.get("SP_SNAPSHOT_CHECK", "30"))
+# Load-aware: poll port statistics every SP_STATS_INTERVAL seconds and put
+# the routes of new destinations on the least-loaded shortest path (link
+# utilization as an EWMA with weight SP_STATS_ALPHA, of SP_LINK_MBPS links;
+# not with ECMP, whose groups spread the load already)
+LOAD_AWARE = os.environ.get("SP_LOAD_AWARE", "0") == "1"
+STATS_INTERVAL = float(os.environ.get("SP_STATS_INTERVAL", "2"))
+STATS_ALPHA = float(os.environ.get("SP_STATS_ALPHA", "0.5"))
+LINK_MBPS = float(os.environ.get("SP_LINK_MBPS", "15"))
+# Metrics: counters, handler latencies and table sizes at /metrics of
+# ryu-manager's web server (--wsapi-port, 8080), written to SP_METRICS_FILE
+# every SP_METRICS_INTERVAL seconds if set; /metrics/profile?seconds=N
+# profiles the controller for N seconds (raw stats in sp_routing.prof)
+METRICS = metrics.Registry(os.environ.get("SP_METRICS", "0") == "1")
+METRICS_FILE = os.environ.get("SP_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("SP_METRICS_INTERVAL", "5"))
+# Warm restart: graph, hosts and installed routes are checkpointed to
+# SP_CHECKPOINT every SP_CHECKPOINT_INTERVAL seconds and read back at
+# startup; a connecting switch's flow table (and groups) is read first and
+# only the rules it is missing or has stale are sent
+WARM = os.environ.get("SP_WARM", "0") == "1"
+CHECKPOINT = os.environ.get("SP_CHECKPOINT", os.path.join(script_dir, "sp_routing.ckpt"))
+CHECKPOINT_INTERVAL = float(os.environ.get("SP_CHECKPOINT_INTERVAL", "10"))
+CHECKPOINT_VERSION = 1
+# Packet-in storm protection: table-miss packet-ins are metered to at most
+# SP_PACKET_IN_RATE per second per switch (bursts of SP_PACKET_IN_BURST;
+# 0 = no meter), packet-ins for a route still being installed only wait
+# for it (SP_COALESCE) and at most SP_PACKET_OUT_QUEUE packet-outs wait
+# for barriers (0 = no limit), more are dropped
+PACKET_IN_RATE = int(os.environ.get("SP_PACKET_IN_RATE", "0"))
+PACKET_IN_BURST = int(os.environ.get("SP_PACKET_IN_BURST", "0")) or PACKET_IN_RATE
+COALESCE = os.environ.get("SP_COALESCE", "1") == "1"
+PACKET_OUT_QUEUE = int(os.environ.get("SP_PACKET_OUT_QUEUE", "1024"))
+# Trace: every packet-in is appended to the file SP_TRACE, for replay.py
+TRACE = pktrace.Capture(os.environ.get("SP_TRACE", ""))
+
+ROUTE_PRIORITY = 10     # routes; compiled ones 10 + prefix length
+UTURN_PRIORITY = 60     # in_port-specific U-turns of backup next hops
+STATS_BATCH = 64        # port stats requests sent at once, batches spread over the interval
+PACKET_IN_METER = 1     # meter id of the table-miss packet-ins
+
+def subnet_of(ip):
+    # 10.pod.switch.host -> 10.pod.switch.0, the edge switch's /24
+    return ip.rsplit('.', 1)[0] + '.0'
+
+
+class TimedRouteTable(routing.RouteTable):
+    # RouteTable with its route computations in METRICS: route_rebuild for
+    # all destinations, route_compute for one destination's BFS (those of
+    # a rebuild or a link removal included), route_add_link and
+    # route_remove_link for the incremental updates
+    rebuild = METRICS.timed('route_rebuild')(routing.RouteTable.rebuild)
+    compute = METRICS.timed('route_compute')(routing.RouteTable.compute)
+    add_link = METRICS.timed('route_add_link')(routing.RouteTable.add_link)
+    remove_link = METRICS.timed('route_remove_link')(routing.RouteTable.remove_link)
+
 
 class SPRouter(app_manager.RyuApp):
 
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
+    _CONTEXTS = {'wsgi': WSGIApplication} if METRICS.enabled else {}
 
     def __init__(self, *args, **kwargs):
         super(SPRouter, self).__init__(*args, **kwargs)
         
-        # Initialize the topology with #ports=4
-        self.topo_net = topo.Fattree(4)  # Initialize fat-tree
-        self.graph = {}                  # Graph: dpid -> {neighbor: out_port}
-        self.ip_location = {}            # dpid -> {mac -> port}
-        self.mac_location = {}           # mac -> (dpid, port)
+        self.routes = TimedRouteTable()  # (dpid, dst edge dpid) -> out_port
+        self.graph = self.routes.graph   # Graph: dpid -> {neighbor: out_port}
+        self.unconfirmed = None          # snapshot links LLDP has not seen yet
+        # Initialize the topology with #ports=SP_K, or from the snapshot
+        if SNAPSHOT:
+            self.load_snapshot(SNAPSHOT)
+            if SNAPSHOT_CHECK:
+                hub.spawn_after(SNAPSHOT_CHECK, self.check_snapshot)
+        else:
+            self.set_fattree(topo.Fattree(K))
+        # ip -> (edge dpid, host port); its host rule goes when the entry does
+        self.ip_location = hostcache.HostCache(HOST_CACHE_SIZE, HOST_TTL, self.host_expired)
+        self.mac_location = hostcache.HostCache(HOST_CACHE_SIZE, HOST_TTL)  # mac -> (dpid, port)
+        self.groups = {}                 # dpid -> {next-hop ports: group_id}
+        self.datapaths = {}              # dpid -> datapath, to install whole paths
+        self.batcher = flowbatch.FlowBatcher(PACKET_OUT_QUEUE)
+        self.installing = {}             # (dpid, dst IP) -> (held entry, actions)
+        self.coalesced = 0               # packet-ins that waited for a route being installed
+        self.decisions = {}              # dpid -> {(network, prefix len): next hop}
+        self.compiled = {}               # dpid -> compiled rules installed from them
+        self.dirty = set()               # dpids whose decisions changed
+        self.load = linkload.LinkLoad(LINK_MBPS * 1e6, STATS_ALPHA)
+        self.placed = {}                 # dst -> {dpid: out_port} by load (LOAD_AWARE)
+        self.reconciling = {}            # dpid -> flow stats entries read on a warm connect
+        self.warm_routes = {}            # dpid -> (dst edge dpids, host IPs) at the checkpoint
         # self.discovery_started = False
 
+        if HOST_TTL:
+            self.expire_thread = hub.spawn(self._expire_hosts)
+        if LOAD_AWARE and not ECMP:
+            self.stats_thread = hub.spawn(self._poll_port_stats)
+        if METRICS.enabled:
+            self.register_metrics(kwargs.get('wsgi'))
+        if TRACE.enabled:
+            TRACE.start(self.topo_net.num_ports)
+            self.trace_thread = hub.spawn(TRACE.run, hub.sleep)
+        if WARM:
+            if self.load_checkpoint(CHECKPOINT) and SNAPSHOT_CHECK and not SNAPSHOT:
+                hub.spawn_after(SNAPSHOT_CHECK, self.check_snapshot)
+            self.checkpoint_thread = hub.spawn(self._write_checkpoints)
+
+        # kill -USR1 <ryu-manager pid> writes the controller state to the log
+        try:
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump_state())
+        except (AttributeError, ValueError):
+            pass    # no SIGUSR1 or not the main thread (e.g. benchmarks)
+
+    def register_metrics(self, wsgi=None):
+        # What /metrics and the snapshot file report besides the latencies
+        batcher = self.batcher
+        METRICS.counter('flow_mods', lambda: batcher.flow_mods)
+        METRICS.counter('duplicate_flow_mods', lambda: batcher.duplicates)
+        METRICS.counter('adopted_flow_mods', lambda: batcher.adopted)
+        METRICS.counter('messages', lambda: batcher.messages)
+        METRICS.counter('writes', lambda: batcher.writes)
+        METRICS.counter('coalesced_packet_ins', lambda: self.coalesced)
+        METRICS.counter('dropped_packet_outs', lambda: batcher.dropped)
+        METRICS.gauge('held_messages', lambda: batcher.held_messages)
+        METRICS.gauge('installing', lambda: len(self.installing))
+        METRICS.gauge('switches', lambda: len(self.datapaths))
+        METRICS.gauge('links', lambda: sum(len(nbrs) for nbrs in self.graph.values()))
+        METRICS.gauge('destinations', lambda: len(self.routes.next_hop))
+        METRICS.gauge('topology_version', lambda: self.routes.version)
+        METRICS.gauge('hosts', lambda: len(self.ip_location))
+        METRICS.gauge('rules', lambda: sum(len(rules) for rules in batcher.sent.values()))
+        METRICS.gauge('groups', lambda: sum(len(g) for g in self.groups.values()))
+        METRICS.gauge('placed', lambda: sum(len(p) for p in self.placed.values()))
+        self.metrics_thread = hub.spawn(METRICS.run, METRICS_FILE, METRICS_INTERVAL, hub.sleep)
+        if wsgi is not None:
+            wsgi.register(metrics.MetricsController, {
+                'registry': METRICS, 'sleep': hub.sleep,
+                'profile_path': os.path.join(script_dir, "sp_routing.prof")})
+
+    def set_fattree(self, ft_topo):
+        # Fabric the addressing plan and the route destinations come from
+        self.topo_net = ft_topo
+        self.addr = addressing.Addressing(ft_topo)
+        self.edge_dpids = routing.edge_dpids(ft_topo)
+        self.routes.dsts = set(self.edge_dpids)
+        # ip -> MAC (6 bytes) for the ARP proxy: the address plan's hosts,
+        # plus whatever ARP packet-ins teach
+        self.arp_table = {self.addr.ip(h): pktparse.mac_bytes(self.addr.mac(h))
+                          for h in range(ft_topo.n_switch, len(ft_topo))}
+
+    def load_snapshot(self, path):
+        # Fabric, addressing plan and routes as compiled by snapshot.py; the
+        # links are unconfirmed until LLDP reports them
+        start = time.perf_counter()
+        with snapshot.Snapshot(path) as snap:
+            self.set_fattree(snap.fattree())
+            snap.load_routes(self.routes)
+        self.unconfirmed = {(u, v) for u, nbrs in self.graph.items() for v in nbrs}
+        logger.info("snapshot %s: k=%d, %d switches, %d links in %.3fs", path,
+                    self.topo_net.num_ports, len(self.graph), len(self.unconfirmed),
+                    time.perf_counter() - start)
+
+    def check_snapshot(self):
+        # End of the snapshot check: links LLDP did not confirm although both
+        # switches are connected go down, switches that never connected go
+        if self.unconfirmed is None:
+            return
+        stale = sorted((u, v) for u, v in self.unconfirmed
+                       if u in self.datapaths and v in self.datapaths)
+        missing = sorted(u for u in self.graph if u not in self.datapaths)
+        self.unconfirmed = None
+        for u, v in stale:
+            if v in self.graph.get(u, {}):
+                self.link_down(u, v)
+        for u in missing:
+            for v in list(self.graph.get(u, {})):
+                self.link_down(u, v)
+            self.routes.remove_switch(u)
+        if stale or missing:
+            logger.warning("snapshot: %d links not confirmed, %d switches not connected: %s %s",
+                           len(stale), len(missing), stale, missing)
+        else:
+            logger.info("snapshot: all links confirmed")
+
+    def _expire_hosts(self):
+        # Hosts nobody looks up any more still go after their TTL
+        while True:
+            hub.sleep(max(HOST_TTL / 4, 1))
+            self.ip_location.expire()
+            self.mac_location.expire()
 
     # ================= TOPOLOGY DISCOVERY =================
+    # The graph is kept up to date from the individual switch/link events;
+    # the route table only recomputes the destinations a change affects.
     @set_ev_cls(event.EventSwitchEnter)
-    def get_topology_data(self, ev):
-
-        switch_list = get_switch(self, None)
-        self.graph.clear()
-
-        # logger.info(f"switch_list: {switch_list}")
-        for sw in switch_list:
-            # logger.info(f"sw: {sw}")
-            self.graph[sw.dp.id] = {}
-
-        link_list = get_link(self, None)
-        # logger.info(f"link_list: {link_list}")
-        for link in link_list:
-            # logger.info(f"Link: src={link.src.dpid} (port {link.src.port_no}) -> dst={link.dst.dpid} (port {link.dst.port_no})")
-            src = link.src.dpid
-            dst = link.dst.dpid
-            out_port = link.src.port_no
-            self.graph[src][dst] = out_port
-        logger.info("graph built: %s", self.graph)
-
-    # @set_ev_cls(event.EventLinkAdd)
-    # def _link_add_handler(self, ev):
-    #     self.logger.info("Link detected: rebuilding topology...")
-    #     self.build_topology_graph()
-    
-    # def build_topology_graph(self):
-    #     self.graph.clear()
-    #     switch_list = get_switch(self, None)
-    #     for sw in switch_list:
-    #         # logger.info(f"sw: {sw}")
-    #         self.graph[sw.dp.id] = {}
-
-    #     link_list = get_link(self, None)
-    #     for link in link_list:
-    #         # logger.info(f"link: {link}")
-    #         src = link.src.dpid
-    #         dst = link.dst.dpid
-    #         out_port = link.src.port_no
-    #         self.graph[src][dst] = out_port
-    #     logger.info(f"TOPOLOGY Graph: {self.graph}")
+    @METRICS.timed('switch_enter')
+    def _switch_enter_handler(self, ev):
+        if self.unconfirmed is not None and ev.switch.dp.id not in self.graph:
+            logger.warning("snapshot: switch %s is not in it", ev.switch.dp.id)
+        self.routes.add_switch(ev.switch.dp.id)
+        logger.info("switch enter %s: topology v%d", ev.switch.dp.id, self.routes.version)
+
+    @set_ev_cls(event.EventSwitchLeave)
+    @METRICS.timed('switch_leave')
+    def _switch_leave_handler(self, ev):
+        self.switch_gone(ev.switch.dp)
+        self.routes.remove_switch(ev.switch.dp.id)
+        logger.info("switch leave %s: topology v%d", ev.switch.dp.id, self.routes.version)
+
+    @set_ev_cls(ofp_event.EventOFPStateChange, DEAD_DISPATCHER)
+    def _state_change_handler(self, ev):
+        if ev.datapath.id is not None:
+            self.switch_gone(ev.datapath)
+
+    def switch_gone(self, datapath):
+        # The switch disconnected, its barriers never come back: what waited
+        # for them goes, and packets for routes that were being installed
+        # over it are no longer held for them but routed anew. A late event
+        # of a connection the switch has replaced already changes nothing.
+        if self.datapaths.get(datapath.id) is not datapath:
+            return
+        waited = {id(entry) for entry in self.batcher.reset(datapath.id)}
+        for key in [k for k, (entry, _) in self.installing.items() if id(entry) in waited]:
+            del self.installing[key]
+
+    @set_ev_cls(event.EventLinkAdd)
+    @METRICS.timed('link_add')
+    def _link_add_handler(self, ev):
+        link = ev.link
+        if self.unconfirmed is not None:
+            self.unconfirmed.discard((link.src.dpid, link.dst.dpid))
+            if self.graph.get(link.src.dpid, {}).get(link.dst.dpid) != link.src.port_no:
+                logger.warning("snapshot: link %s:%s -> %s is not in it", link.src.dpid,
+                               link.src.port_no, link.dst.dpid)
+        self.routes.add_link(link.src.dpid, link.dst.dpid, link.src.port_no)
+        logger.debug("link add %s:%s -> %s: topology v%d", link.src.dpid,
+                     link.src.port_no, link.dst.dpid, self.routes.version)
+
+    @set_ev_cls(event.EventLinkDelete)
+    @METRICS.timed('link_delete')
+    def _link_delete_handler(self, ev):
+        link = ev.link
+        self.link_down(link.src.dpid, link.dst.dpid)
+        logger.info("link delete %s -> %s: topology v%d", link.src.dpid,
+                    link.dst.dpid, self.routes.version)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    @METRICS.timed('port_status')
+    def _port_status_handler(self, ev):
+        # A switch port went down: repair the routes over its link now
+        # instead of waiting for LLDP to miss it (with FAILOVER the switches
+        # already forward over the backups meanwhile)
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        port = msg.desc
+        if msg.reason != ofproto.OFPPR_DELETE and not port.state & ofproto.OFPPS_LINK_DOWN:
+            return
+        dpid = msg.datapath.id
+        for v, p in list(self.graph.get(dpid, {}).items()):
+            if p == port.port_no:
+                self.link_down(dpid, v)
+                logger.info("port %s:%s down: topology v%d", dpid, p, self.routes.version)
+
+    @METRICS.timed('link_down')
+    def link_down(self, u, v):
+        # Drop the link u <-> v and move the installed routes that used it;
+        # returns the destinations whose routes were recomputed
+        old = dict(self.routes.next_hop)
+        placed = self.unplace(u, v) | self.unplace(v, u)
+        for d, ports in self.placed.items():
+            old[d] = {**old.get(d, {}), **ports}
+        affected = self.routes.remove_link(u, v) | self.routes.remove_link(v, u)
+        for d in affected | placed:
+            self.placed.pop(d, None)
+        moved = self.move_routes(affected | placed, old, self.routes.next_hop)
+        if moved:
+            logger.info("link %s <-> %s down: %d routes moved", u, v, moved)
+        self.flush()
+        return affected
+
+    def unplace(self, u, v):
+        # Destinations whose placed route (LOAD_AWARE) crosses u -> v
+        port = self.graph.get(u, {}).get(v)
+        if port is None:
+            return set()
+        return {d for d, ports in self.placed.items() if ports.get(u) == port}
+
+    def move_routes(self, dsts, before, after):
+        # Installed routes towards dsts whose next hop is not the same in
+        # after as in before ({dst: {dpid: out_port}}) go to the new one, or
+        # are removed if there is none; returns how many
+        moved = 0
+        for d in dsts:
+            old = before.get(d, {})
+            new = after.get(d, {})
+            subnet = addressing.int_to_ip(routing.edge_subnet(d))
+            for w, port in old.items():
+                datapath = self.datapaths.get(w)
+                if new.get(w) == port or datapath is None \
+                        or not self.has_route(datapath, subnet, 24):
+                    continue
+                if new.get(w) is None:
+                    self.remove_route(datapath, subnet, 24)
+                else:
+                    # the switches of the new path too, they may not have it
+                    self.install_path(w, d, subnet)
+                    self.add_subnet_route(datapath, d, subnet, new[w])
+                moved += 1
+        return moved
 
     # ================= FLOW TABLE INIT =================
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    @METRICS.timed('switch_features')
     def switch_features_handler(self, ev):
         # Delay LLDP/startup discovery
         # if not self.discovery_started:
@@ -119,6 +400,26 @@ class SPRouter(app_manager.RyuApp):
         datapath = ev.msg.datapath
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
+        self.datapaths[datapath.id] = datapath
+        self.batcher.reset(datapath.id)
+        self.decisions.pop(datapath.id, None)
+        self.compiled.pop(datapath.id, None)
+        self.load.forget(datapath.id)
+        if WARM:
+            # Keep what the switch has: its groups and flow tables are read
+            # first, reconcile() sends only what is missing or stale
+            self.reconciling[datapath.id] = []
+            self.batcher.hold(datapath.id)
+            self.groups.pop(datapath.id, None)
+            if ECMP or FAILOVER:
+                datapath.send_msg(parser.OFPGroupDescStatsRequest(datapath, 0))
+            datapath.send_msg(parser.OFPFlowStatsRequest(
+                datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                0, 0, parser.OFPMatch()))
+            logger.info("Switch connected: DPID = %s, reading its flow table", datapath.id)
+            return
+        for ports in self.placed.values():
+            ports.pop(datapath.id, None)
 
         # ports = datapath.ports
         # logger.info(f"default flow rule added {ports}")
@@ -130,29 +431,324 @@ class SPRouter(app_manager.RyuApp):
         # for port_no, port in ports.items():
         #     logger.info(f"Switch {datapath.id} has port {port_no} with MAC {port.hw_addr}")
 
+        self.add_default_flows(datapath)
+        logger.info("Switch connected: DPID = %s", datapath.id)
+
+        if ECMP or FAILOVER:
+            self.delete_groups(datapath)
+        self.batcher.flush()
+
+    def add_default_flows(self, datapath):
         # Install Default flow entry
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
         match = parser.OFPMatch()
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
                                           ofproto.OFPCML_NO_BUFFER)]
-        self.add_flow(datapath, 0, match, actions)
-        logger.info(f"Switch connected: DPID = {datapath.id}")
+        meter = None
+        if PACKET_IN_RATE:
+            self.add_meter(datapath)
+            meter = PACKET_IN_METER
+        self.add_flow(datapath, 0, match, actions, meter=meter)
+
+        if ARP_PROXY and self.addr.is_edge_dpid(datapath.id):
+            # ARP from the hosts always comes to the controller, never takes
+            # a forwarding rule
+            match = parser.OFPMatch(eth_type=pktparse.ETH_TYPE_ARP)
+            self.add_flow(datapath, 100, match, actions, meter=meter)
+
+    def add_meter(self, datapath):
+        # Packet-in meter: drops what exceeds PACKET_IN_RATE packets/s. Added,
+        # then modified: the switch rejects one of them (already there after
+        # a restart, or not yet), either way it ends up with this rate.
+        # Not deleted first, that would delete the rules using it.
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        bands = [parser.OFPMeterBandDrop(rate=PACKET_IN_RATE, burst_size=PACKET_IN_BURST)]
+        for command in (ofproto.OFPMC_ADD, ofproto.OFPMC_MODIFY):
+            datapath.send_msg(parser.OFPMeterMod(
+                datapath, command, ofproto.OFPMF_PKTPS | ofproto.OFPMF_BURST,
+                PACKET_IN_METER, bands))
+
+    def delete_groups(self, datapath):
+        # Group ids are handed out from 1 again, drop what a previous run left
+        ofproto = datapath.ofproto
+        self.groups.pop(datapath.id, None)
+        datapath.send_msg(datapath.ofproto_parser.OFPGroupMod(
+            datapath, ofproto.OFPGC_DELETE, ofproto.OFPGT_SELECT, ofproto.OFPG_ALL))
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def _barrier_reply_handler(self, ev):
+        # Rules of a batch are in place: release what waited for them
+        self.batcher.barrier_reply(ev.msg.datapath, ev.msg.xid)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    @METRICS.timed('flow_removed')
+    def _flow_removed_handler(self, ev):
+        # A rule idled out (or was deleted): it may be installed again, and
+        # a host whose /32 rule idled out is forgotten along with it
+        msg = ev.msg
+        dpid = msg.datapath.id
+        self.batcher.removed(dpid, msg.table_id, msg.priority, msg.match)
+        ip = msg.match.get('ipv4_dst')
+        if isinstance(ip, tuple) and self.placed:
+            # a /24 route: the next one towards it is placed anew
+            self.placed.get(self.subnet_dst(ip[0]), {}).pop(dpid, None)
+        if msg.reason == msg.datapath.ofproto.OFPRR_IDLE_TIMEOUT and isinstance(ip, str):
+            location = self.ip_location.get(ip)
+            if location is not None and location[0] == dpid:
+                self.ip_location.pop(ip)
+                logger.debug("host %s idle, forgotten", ip)
+
+    # ================= WARM RESTART =================
+    @set_ev_cls(ofp_event.EventOFPGroupDescStatsReply, MAIN_DISPATCHER)
+    def _group_desc_reply_handler(self, ev):
+        # Warm connect: the groups the switch kept, by the ports of their
+        # buckets, so the routes over them are recognized
+        msg = ev.msg
+        datapath = msg.datapath
+        if datapath.id not in self.reconciling:
+            return
+        ofproto = datapath.ofproto
+        groups = self.groups.setdefault(datapath.id, {})
+        for desc in msg.body:
+            ports = tuple(a.port for b in desc.buckets for a in b.actions
+                          if a.type == ofproto.OFPAT_OUTPUT)
+            if desc.type == ofproto.OFPGT_FF and len(ports) == 2:
+                groups[routing.Failover(*ports)] = desc.group_id
+            else:
+                groups[ports] = desc.group_id
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    @METRICS.timed('flow_stats')
+    def _flow_stats_reply_handler(self, ev):
+        # Warm connect: the switch's flow entries, possibly in several parts
+        msg = ev.msg
+        datapath = msg.datapath
+        entries = self.reconciling.get(datapath.id)
+        if entries is None:
+            return
+        entries.extend(msg.body)
+        if msg.flags & datapath.ofproto.OFPMPF_REPLY_MORE:
+            return
+        del self.reconciling[datapath.id]
+        self.reconcile(datapath, entries)
+
+    @METRICS.timed('reconcile')
+    def reconcile(self, datapath, entries):
+        """
+        Warm connect of datapath, whose tables hold entries (OFPFlowStats).
+        Its rules are queued as routing wants them now: the default ones,
+        host rules and /24 routes for what it has rules for (learning the
+        hosts from their /32 rules), or for what the checkpoint had on it
+        if it lost its tables (no table-miss entry). With AGGREGATE the
+        checkpoint tells the routes always, the compiled rules hide them.
+        The batcher sends only the rules the switch does not have like
+        that; routes it has that nobody asked for are deleted (other rules,
+        such as the U-turns of a neighbor's routes, stay).
+        """
+        dpid = datapath.id
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        sent = self.batcher.flow_mods
+        kept = any(e.priority == 0 and not e.match.items() for e in entries)
+        if not kept and (ECMP or FAILOVER):
+            self.delete_groups(datapath)
+        dsts, hosts = self.warm_routes.pop(dpid, (set(), set()))
+        if kept and not AGGREGATE:
+            dsts, hosts = set(), set()
+        subnet_mask, host_mask = flowcompile.mask_of(24), flowcompile.mask_of(32)
+        for e in entries:
+            if not ROUTE_PRIORITY <= e.priority <= ROUTE_PRIORITY + 32:
+                continue
+            ip = e.match.get('ipv4_dst')
+            port = self.output_port(datapath, e)
+            if port is not None and port >= ofproto.OFPP_MAX:
+                continue    # to the controller (a hole of compiled rules)
+            if isinstance(ip, tuple) and ip[1] == host_mask:
+                ip = ip[0]
+            if isinstance(ip, tuple):
+                dst = self.subnet_dst(ip[0]) if ip[1] == subnet_mask else None
+                if dst in self.routes.dsts:
+                    dsts.add(dst)
+            elif ip is not None and port is not None and self.ip_to_edge_dpid(ip) == dpid:
+                self.ip_location[ip] = (dpid, port)
+                hosts.add(ip)
+
+        self.batcher.reconcile(datapath, entries)
+        self.add_default_flows(datapath)
+        for ip in sorted(hosts):
+            location = self.ip_location.get(ip)
+            if location is not None:
+                self.add_route(datapath, ip, 32, location[1])
+        for dst in sorted(dsts - {dpid}):
+            port = self.route_port(dpid, dst)
+            if port is not None:
+                subnet = addressing.int_to_ip(routing.edge_subnet(dst))
+                self.add_subnet_route(datapath, dst, subnet, port)
+        self.flush()
+
+        stale = [(rule, match) for rule, match in self.batcher.unclaimed(dpid).items()
+                 if ROUTE_PRIORITY <= rule[1] <= ROUTE_PRIORITY + 32]
+        for (table_id, priority, _), match in stale:
+            self.batcher.removed(dpid, table_id, priority, match)
+            self.batcher.add(datapath, parser.OFPFlowMod(
+                datapath=datapath, table_id=table_id, priority=priority,
+                command=ofproto.OFPFC_DELETE_STRICT, out_port=ofproto.OFPP_ANY,
+                out_group=ofproto.OFPG_ANY, match=match))
+        self.flush()
+        logger.info("dpid %s reconciled (%s): %d entries, %d hosts, %d routes; "
+                    "%d flow-mods sent, %d of them stale deletes", dpid,
+                    'kept its tables' if kept else 'lost its tables', len(entries),
+                    len(hosts), len(dsts), self.batcher.flow_mods - sent, len(stale))
+
+    def output_port(self, datapath, entry):
+        # Port the first output action of a flow stats entry sends to, None
+        # if it has none (e.g. it outputs to a group)
+        for inst in entry.instructions:
+            for action in getattr(inst, 'actions', ()):
+                if action.type == datapath.ofproto.OFPAT_OUTPUT:
+                    return action.port
+        return None
+
+    def subnet_dst(self, network):
+        # 10.pod.switch.0 -> DPID of that edge switch
+        value = addressing.ip_to_int(network)
+        return self.addr.edge_dpid(value >> 16 & 0xff, value >> 8 & 0xff)
 
+    def routed(self, dpid):
+        # Destination edge switches and host IPs dpid has a /24 or /32
+        # route (decision) for
+        if AGGREGATE:
+            prefixes = list(self.decisions.get(dpid, {}))
+        else:
+            prefixes = [(addressing.ip_to_int(ip[0] if isinstance(ip, tuple) else ip),
+                         24 if isinstance(ip, tuple) else 32)
+                        for _, priority, match in self.batcher.sent.get(dpid, {})
+                        if priority == ROUTE_PRIORITY
+                        for field, ip in match if field == 'ipv4_dst']
+        dsts = [self.subnet_dst(addressing.int_to_ip(network))
+                for network, plen in prefixes if plen == 24]
+        hosts = [addressing.int_to_ip(network) for network, plen in prefixes if plen == 32]
+        return sorted(dsts), sorted(hosts)
+
+    def write_checkpoint(self, path):
+        # What a restarted controller needs to take the switches over as
+        # they are, as JSON (written to a temporary file, then renamed).
+        # Switches not reconciled yet keep the routes of the checkpoint read.
+        routes = {dpid: (sorted(dsts), sorted(hosts))
+                  for dpid, (dsts, hosts) in self.warm_routes.items()}
+        routes.update((dpid, self.routed(dpid)) for dpid in self.datapaths
+                      if dpid not in self.warm_routes)
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'time': time.time(),
+            'k': self.topo_net.num_ports,
+            'graph': self.graph,
+            'hosts': dict(self.ip_location.items()),
+            'arp': {ip: mac.hex() for ip, mac in self.arp_table.items()},
+            'placed': self.placed,
+            'routes': routes,
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def load_checkpoint(self, path):
+        # State of the run that wrote the checkpoint; its links are
+        # unconfirmed until LLDP reports them, as a snapshot's. False if
+        # there is none (or it is not for this fabric): a cold start.
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("checkpoint %s: %s, starting cold", path, e)
+            return False
+        if state.get('version') != CHECKPOINT_VERSION or state.get('k') != self.topo_net.num_ports:
+            logger.warning("checkpoint %s: not for this fabric, starting cold", path)
+            return False
+        graph = {int(u): {int(v): port for v, port in nbrs.items()}
+                 for u, nbrs in state['graph'].items()}
+        self.routes.rebuild(graph)
+        self.unconfirmed = {(u, v) for u, nbrs in self.graph.items() for v in nbrs}
+        for ip, location in state['hosts'].items():
+            self.ip_location[ip] = tuple(location)
+        self.arp_table.update((ip, bytes.fromhex(mac)) for ip, mac in state['arp'].items())
+        self.placed = {int(d): {int(u): port for u, port in ports.items()}
+                       for d, ports in state['placed'].items()}
+        self.warm_routes = {int(u): (set(dsts), set(hosts))
+                            for u, (dsts, hosts) in state['routes'].items()}
+        logger.info("checkpoint %s from %.0fs ago: %d switches, %d links, %d hosts, %d routes",
+                    path, time.time() - state['time'], len(self.graph),
+                    len(self.unconfirmed), len(self.ip_location),
+                    sum(len(dsts) + len(hosts) for dsts, hosts in self.warm_routes.values()))
+        return True
+
+    def _write_checkpoints(self):
+        while True:
+            hub.sleep(CHECKPOINT_INTERVAL)
+            try:
+                self.write_checkpoint(CHECKPOINT)
+            except OSError as e:
+                logger.warning("checkpoint %s: %s", CHECKPOINT, e)
+
+    # ================= PORT STATISTICS =================
+    def _poll_port_stats(self):
+        # One request for all ports of every switch per interval, in
+        # batches spread over it, so the replies do not all come at once
+        while True:
+            datapaths = list(self.datapaths.values())
+            batches = max(1, -(-len(datapaths) // STATS_BATCH))
+            for i in range(0, batches * STATS_BATCH, STATS_BATCH):
+                self.request_port_stats(datapaths[i:i + STATS_BATCH])
+                hub.sleep(STATS_INTERVAL / batches)
+
+    def request_port_stats(self, datapaths):
+        for datapath in datapaths:
+            ofproto = datapath.ofproto
+            datapath.send_msg(datapath.ofproto_parser.OFPPortStatsRequest(
+                datapath, 0, ofproto.OFPP_ANY))
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    @METRICS.timed('port_stats')
+    def _port_stats_reply_handler(self, ev):
+        # Counters of every port (a reply may come in several parts); the
+        # switch's port durations time the samples where it has them
+        msg = ev.msg
+        dpid = msg.datapath.id
+        ofproto = msg.datapath.ofproto
+        now = time.monotonic()
+        update = self.load.update
+        for stat in msg.body:
+            if stat.port_no >= ofproto.OFPP_MAX:
+                continue
+            t = stat.duration_sec + stat.duration_nsec * 1e-9
+            if stat.duration_sec == 0xffffffff or not t:
+                t = now
+            update(dpid, stat.port_no, stat.tx_bytes, t)
 
     # Add a flow entry to the flow-table
-    def add_flow(self, datapath, priority, match, actions):
+    @METRICS.timed('add_flow')
+    def add_flow(self, datapath, priority, match, actions, idle_timeout=0, meter=None):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
-        # Construct flow_mod message and send it
+        # Construct flow_mod message and queue it; sent with the next flush.
+        # Rules that can idle out report it (EventOFPFlowRemoved).
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+        if meter is not None:
+            inst.insert(0, parser.OFPInstructionMeter(meter, ofproto.OFPIT_METER))
+        flags = ofproto.OFPFF_SEND_FLOW_REM if idle_timeout else 0
         mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
+                                idle_timeout=idle_timeout, flags=flags,
                                 match=match, instructions=inst)
-        datapath.send_msg(mod)
+        self.batcher.add(datapath, mod)
 
 
     # ================== DIJKSTRA ALGORITHM ==================
     def dijkstra(self, start, target):
-        logger.info(f"start: {start} target: {target}")
+        logger.debug("start: %s target: %s", start, target)
         dist = {node: float('inf') for node in self.graph}
         prev = {node: None for node in self.graph}
         dist[start] = 0
@@ -174,11 +770,13 @@ class SPRouter(app_manager.RyuApp):
         while u is not None:
             path.insert(0, u)
             u = prev[u]
-        logger.info(f"path:{path}")
+        logger.debug("path: %s", path)
         return path if path[0] == start else []
 
     # ================== PACKET HANDLER ==================
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @TRACE.captured
+    @METRICS.timed('packet_in')
     def _packet_in_handler(self, ev):
         msg = ev.msg
         datapath = msg.datapath
@@ -188,40 +786,40 @@ class SPRouter(app_manager.RyuApp):
         # logger.info(f"dpid: {dpid}")
         in_port = msg.match['in_port']
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
-        # Ignore LLDP
-        if eth.ethertype == 0x88cc:
+        # Ethertype and IPs straight from msg.data (LLDP has no IPs)
+        ethertype, src_ip, dst_ip = pktparse.parse_headers(msg.data)
+        if src_ip is None:
             return
-        arp_pkt = pkt.get_protocol(arp.arp)
-        ip_pkt = pkt.get_protocol(ipv4.ipv4)
-        if not arp_pkt and not ip_pkt:
-            return
-        elif arp_pkt:
-            src_ip = arp_pkt.src_ip
-            dst_ip = arp_pkt.dst_ip
-        else:
-            src_ip = ip_pkt.src
-            dst_ip = ip_pkt.dst
+        arp_pkt = ethertype == pktparse.ETH_TYPE_ARP
+        ip_pkt = not arp_pkt
 
-        logger.info(f"dpid: {dpid} src_ip: {src_ip} dst_ip:{dst_ip}")
+        logger.debug("dpid: %s src_ip: %s dst_ip: %s", dpid, src_ip, dst_ip)
 
         # Learn location
         is_src_edge = self.ip_to_edge_dpid(src_ip)
         if dpid == is_src_edge:
             self.ip_location[src_ip] = (dpid, in_port)
 
+        if ARP_PROXY and arp_pkt and self.handle_arp(datapath, in_port, msg.data):
+            return
+
         # Handle ARP or IP similar
         if arp_pkt or ip_pkt:
             dst_edge_dpid = self.ip_to_edge_dpid(dst_ip)
             if dpid == dst_edge_dpid:
+                if ip_pkt and dst_ip not in self.ip_location:
+                    # Once its routes are in, a busy host's own packets no
+                    # longer come here to be learned from, so its entry can
+                    # only expire: learn it again from the address plan and
+                    # put its /32 rule back
+                    self.ip_location[dst_ip] = self.addr.host_location(dst_ip)
                 if dst_ip in self.ip_location:
                     _, out_port = self.ip_location[dst_ip]
                     broadcast_ports = {out_port}
-                    logger.info(f"broadcast_ports if- {broadcast_ports}")
+                    logger.debug("broadcast_ports if- %s", out_port)
                 else:
                     broadcast_ports = self.get_host_ports(datapath, self.graph) - {in_port}
-                    logger.info(f"broadcast_ports else- {broadcast_ports}") 
+                    logger.debug("broadcast_ports else- %s", broadcast_ports)
 
                 actions = []
                 for port in broadcast_ports:
@@ -236,26 +834,42 @@ class SPRouter(app_manager.RyuApp):
                         actions=actions,
                         data=msg.data if msg.buffer_id == ofproto.OFP_NO_BUFFER else None
                     )
-                    logger.info(f"Broadcast to end hosts - dpid: {dpid} src_ip: {src_ip} dst_ip: {dst_ip} host_ports: {broadcast_ports}")
-                    logger.info(f"Graph: {self.graph}")
-                    logger.info(f"ip_location - {self.ip_location}")
+                    logger.debug("Broadcast to end hosts - dpid: %s src_ip: %s dst_ip: %s",
+                                 dpid, src_ip, dst_ip)
                     if dst_ip in self.ip_location:
-                        match = parser.OFPMatch(eth_type=0x0800, ipv4_dst=(dst_ip))
-                        self.add_flow(datapath, 10, match, actions)
-                    datapath.send_msg(out)
+                        self.add_route(datapath, dst_ip, 32, self.ip_location[dst_ip][1])
+                    self.batcher.send_after(datapath, out)
+                    self.flush()
                     return
 
             # Only handle ARP if we can determine the destination switch
             if dst_edge_dpid is not None and dst_edge_dpid in self.graph:
-                path = self.dijkstra(dpid, dst_edge_dpid)
-                logger.info("pkt path %s → %s: %s", dpid, dst_edge_dpid, path)
-
-                if len(path) >= 2:
-                    next_hop = path[1]
-                    out_port = self.graph[dpid][next_hop]
-                    match = parser.OFPMatch(eth_type=0x0800, ipv4_dst=(dst_ip, "255.255.255.0"))
-                    actions = [parser.OFPActionOutput(out_port)]
-                    self.add_flow(datapath, 10, match, actions)
+                key = (dpid, dst_ip)
+                installing = self.installing.get(key)
+                if installing is not None:
+                    # The route is on its way: this packet leaves with the
+                    # first one's, nothing to compute or install again
+                    self.coalesced += 1
+                    entry, actions = installing
+                    out = parser.OFPPacketOut(
+                        datapath=datapath,
+                        buffer_id=msg.buffer_id,
+                        in_port=in_port,
+                        actions=actions,
+                        data=msg.data if msg.buffer_id == ofproto.OFP_NO_BUFFER else None
+                    )
+                    self.batcher.send_along(entry, datapath, out)
+                    return
+                out_port = self.next_hop_port(dpid, dst_edge_dpid)
+                logger.debug("pkt next hop %s → %s: port %s", dpid, dst_edge_dpid, out_port)
+
+                if out_port is not None:
+                    # Rules for the whole path, destination end first, so the
+                    # packet-out below only leaves once all of them are in place
+                    self.install_path(dpid, dst_edge_dpid, dst_ip)
+                    nh = self.add_subnet_route(datapath, dst_edge_dpid,
+                                               subnet_of(dst_ip), out_port)
+                    actions = self.next_hop_actions(datapath, nh)
                     out = parser.OFPPacketOut(
                         datapath=datapath,
                         buffer_id=msg.buffer_id,
@@ -263,21 +877,326 @@ class SPRouter(app_manager.RyuApp):
                         actions=actions,
                         data=msg.data if msg.buffer_id == ofproto.OFP_NO_BUFFER else None
                     )
-                    logger.info(f"Forwarded - dpid: {dpid} src_ip: {src_ip} dst_ip: {dst_ip} out_port: {out_port}")
-                    logger.info(f"Graph: {self.graph}")
-                    datapath.send_msg(out)
+                    logger.debug("Forwarded - dpid: %s src_ip: %s dst_ip: %s out_port: %s",
+                                 dpid, src_ip, dst_ip, out_port)
+                    if COALESCE:
+                        entry = self.batcher.send_after(
+                            datapath, out, done=lambda: self.installing.pop(key, None))
+                        if entry is not None:
+                            self.installing[key] = (entry, actions)
+                    else:
+                        self.batcher.send_after(datapath, out)
+                    self.flush()
                     return
 
+    def handle_arp(self, datapath, in_port, data):
+        # ARP proxy: answer a request with one packet-out on the port it came
+        # in, probe only the target's port if its MAC is unknown, and hand
+        # the probe's reply straight to the requester. False leaves the frame
+        # to the routing path (not Ethernet/IPv4 ARP, e.g. VLAN tagged).
+        message = pktparse.arp_message(data)
+        if message is None:
+            return False
+        opcode, sha, spa, tpa = message
+        if spa != '0.0.0.0':
+            self.arp_table[spa] = sha
+        if opcode == pktparse.ARP_REQUEST and spa != tpa:
+            mac = self.arp_table.get(tpa)
+            if mac is not None:
+                reply = pktparse.arp_frame(pktparse.ARP_REPLY, mac, tpa, sha, spa)
+                self.send_packet(datapath, in_port, reply)
+                logger.debug("arp: %s is-at %s, to dpid %s port %s", tpa, mac.hex(),
+                             datapath.id, in_port)
+            else:
+                self.send_to_host(tpa, data)
+        elif opcode == pktparse.ARP_REPLY:
+            self.send_to_host(tpa, data)
+        return True
+
+    def send_to_host(self, ip, data):
+        # Packet-out of data on the host port of ip, where it was seen or
+        # where the address plan puts it
+        location = self.ip_location.get(ip) or self.addr.host_location(ip)
+        datapath = self.datapaths.get(location[0]) if location else None
+        if datapath is None:
+            logger.debug("arp: no location for %s, dropped", ip)
+            return
+        self.send_packet(datapath, location[1], data)
+
+    def send_packet(self, datapath, port, data):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        out = parser.OFPPacketOut(datapath=datapath, buffer_id=ofproto.OFP_NO_BUFFER,
+                                  in_port=ofproto.OFPP_CONTROLLER,
+                                  actions=[parser.OFPActionOutput(port)], data=data)
+        datapath.send_msg(out)
+
+    @METRICS.timed('install_path')
+    def install_path(self, dpid, dst_edge_dpid, dst_ip):
+        # Queue the rules towards dst_ip on the switches after dpid, nearest
+        # to the destination first (the host rule on its edge switch too, if
+        # the host was seen). dpid itself is left to the caller.
+        if dst_ip in self.ip_location:
+            edge_dpid, host_port = self.ip_location[dst_ip]
+            dp = self.datapaths.get(edge_dpid)
+            if dp is not None:
+                self.add_route(dp, dst_ip, 32, host_port)
+        subnet = subnet_of(dst_ip)
+        path = self.route_path(dpid, dst_edge_dpid)
+        for u in path:
+            dp = self.datapaths.get(u)
+            port = self.route_port(u, dst_edge_dpid)
+            if u == dpid or dp is None or port is None:
+                continue
+            self.add_subnet_route(dp, dst_edge_dpid, subnet, port)
+        if FAILOVER:
+            self.install_backups(path, dst_edge_dpid, subnet)
+
+    def install_backups(self, path, dst_edge_dpid, subnet):
+        # The route on the switches a failed link of path diverts traffic
+        # to: from the backup next hop (or where its U-turn sends on) to the
+        # destination, so failing over needs no packet-in
+        for u in path:
+            port = self.routes.backup(u, dst_edge_dpid)
+            if port is None:
+                continue
+            v = next(w for w, p in self.graph[u].items() if p == port)
+            uturn = self.routes.uturn(u, dst_edge_dpid, ECMP)
+            if uturn is not None:
+                v = next(w for w, p in self.graph[v].items() if p == uturn[2])
+            for w in self.routes.path(v, dst_edge_dpid):
+                dp = self.datapaths.get(w)
+                if dp is not None and w not in path:
+                    self.add_subnet_route(dp, dst_edge_dpid, subnet,
+                                          self.routes.lookup(w, dst_edge_dpid))
+
+    def add_subnet_route(self, datapath, dst_edge_dpid, subnet, out_port):
+        # Route subnet, the /24 of dst_edge_dpid, over out_port; with
+        # FAILOVER also the U-turn its backup needs. Returns the next hop.
+        nh = self.route_next_hop(datapath.id, dst_edge_dpid, out_port)
+        if isinstance(nh, routing.Failover):
+            uturn = self.routes.uturn(datapath.id, dst_edge_dpid, ECMP)
+            dp = self.datapaths.get(uturn[0]) if uturn else None
+            if dp is not None:
+                # permanent: it only carries traffic while a link is down
+                match = self.route_match(dp, subnet, 24, in_port=uturn[1])
+                self.add_flow(dp, UTURN_PRIORITY, match,
+                              [dp.ofproto_parser.OFPActionOutput(uturn[2])])
+        self.add_route(datapath, subnet, 24, nh)
+        return nh
+
+    def add_route(self, datapath, ip, plen, nh):
+        # Forward ip/plen to next hop nh (out port, ECMP port tuple or
+        # routing.Failover). With AGGREGATE this only records the decision;
+        # flush() installs the switch's compiled table.
+        if AGGREGATE:
+            self.decisions.setdefault(datapath.id, {})[(addressing.ip_to_int(ip), plen)] = nh
+            self.dirty.add(datapath.id)
+            self.datapaths.setdefault(datapath.id, datapath)
+            return
+        match = self.route_match(datapath, ip, plen)
+        self.add_flow(datapath, ROUTE_PRIORITY, match, self.next_hop_actions(datapath, nh),
+                      IDLE_TIMEOUT)
+
+    def has_route(self, datapath, ip, plen):
+        # Whether a route for ip/plen is installed (or decided) on datapath
+        if AGGREGATE:
+            return (addressing.ip_to_int(ip), plen) in self.decisions.get(datapath.id, {})
+        rule = self.batcher.rule(0, ROUTE_PRIORITY, self.route_match(datapath, ip, plen))
+        return rule in self.batcher.sent.get(datapath.id, {})
+
+    def remove_route(self, datapath, ip, plen):
+        # Take the route for ip/plen off datapath; False if there was none
+        dpid = datapath.id
+        if AGGREGATE:
+            if self.decisions.get(dpid, {}).pop((addressing.ip_to_int(ip), plen), None) is None:
+                return False
+            self.dirty.add(dpid)
+            return True
+        ofproto = datapath.ofproto
+        match = self.route_match(datapath, ip, plen)
+        rule = self.batcher.rule(0, ROUTE_PRIORITY, match)
+        if self.batcher.sent.get(dpid, {}).pop(rule, None) is None:
+            return False
+        self.batcher.add(datapath, datapath.ofproto_parser.OFPFlowMod(
+            datapath=datapath, priority=ROUTE_PRIORITY, command=ofproto.OFPFC_DELETE_STRICT,
+            out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match))
+        return True
+
+    def route_match(self, datapath, ip, plen, **fields):
+        ipv4_dst = ip if plen == 32 else (ip, flowcompile.mask_of(plen))
+        return datapath.ofproto_parser.OFPMatch(eth_type=0x0800, ipv4_dst=ipv4_dst, **fields)
+
+    def host_expired(self, ip, location):
+        # ip_location dropped ip (TTL or size bound): take its /32 rule off
+        # the edge switch, if it is there
+        datapath = self.datapaths.get(location[0])
+        if datapath is None or not self.remove_route(datapath, ip, 32):
+            return
+        logger.debug("host %s expired, rule removed from dpid %s", ip, datapath.id)
+        # Evictions happen while a handler learns and looks up hosts, before
+        # it queued any rule of its own: the delete goes out right away
+        self.flush()
+
+    @METRICS.timed('flush')
+    def flush(self):
+        # Push the compiled tables of changed switches, then send the batches
+        for dpid in self.dirty:
+            datapath = self.datapaths.get(dpid)
+            if datapath is not None:
+                self.push_compiled(datapath)
+        self.dirty.clear()
+        self.batcher.flush()
+
+    def push_compiled(self, datapath):
+        # Install only the difference between the switch's compiled table
+        # and what is on it. A rule's priority grows with its prefix length,
+        # so the most specific one wins as in longest prefix match.
+        dpid = datapath.id
+        installed = self.compiled.get(dpid, {})
+        wanted = flowcompile.compile_rules(self.decisions.get(dpid, {}))
+        add, delete = flowcompile.diff(installed, wanted)
+        for prefix, nh in delete.items():
+            self.batcher.forget(dpid, self.prefix_flow(datapath, prefix, nh))
+            self.batcher.add(datapath, self.prefix_flow(datapath, prefix, nh,
+                                                        datapath.ofproto.OFPFC_DELETE_STRICT))
+        for prefix, nh in add.items():
+            self.batcher.add(datapath, self.prefix_flow(datapath, prefix, nh))
+        self.compiled[dpid] = wanted
+        if add or delete:
+            logger.debug("dpid %s: %d compiled rules for %d routes (+%d -%d)", dpid,
+                         len(wanted), len(self.decisions.get(dpid, {})), len(add), len(delete))
+
+    def prefix_flow(self, datapath, prefix, nh, command=None):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        network, plen = prefix
+        match = parser.OFPMatch(eth_type=0x0800, ipv4_dst=(addressing.int_to_ip(network),
+                                                           flowcompile.mask_of(plen)))
+        if command is None:
+            command = ofproto.OFPFC_ADD
+        inst = []
+        if command == ofproto.OFPFC_ADD:
+            inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS,
+                                                 self.next_hop_actions(datapath, nh))]
+        return parser.OFPFlowMod(datapath=datapath, priority=ROUTE_PRIORITY + plen,
+                                 command=command,
+                                 out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY,
+                                 match=match, instructions=inst)
+
+    def dump_state(self):
+        # Graph, host locations and groups, on demand only (SIGUSR1). Copies,
+        # since the writer thread formats them after the handler returns.
+        logger.info("state dump: topology v%d, %d switches\ngraph: %s\n"
+                    "ip_location: %s\ngroups: %s", self.routes.version,
+                    len(self.graph), {u: dict(v) for u, v in self.graph.items()},
+                    dict(self.ip_location.items()), {u: dict(g) for u, g in self.groups.items()})
+
+    def next_hop_port(self, dpid, dst_edge_dpid):
+        # Out port towards the destination edge switch from the route table,
+        # with LOAD_AWARE the one its route is placed on
+        if LOAD_AWARE and not ECMP:
+            return self.place(dpid, dst_edge_dpid)
+        return self.routes.lookup(dpid, dst_edge_dpid)
+
+    def place(self, dpid, dst_edge_dpid):
+        # Out port of dpid on the least-loaded shortest path to the
+        # destination edge switch. The switches after it are placed along
+        # (those placed already keep their next hop), so install_path puts
+        # the whole path there.
+        placed = self.placed.setdefault(dst_edge_dpid, {})
+        port = placed.get(dpid)
+        if port is None:
+            path = self.routes.least_loaded_path(dpid, dst_edge_dpid,
+                                                 self.load.utilization, placed)
+            for u, v in zip(path, path[1:]):
+                placed.setdefault(u, self.graph[u][v])
+            port = placed.get(dpid)
+        return port
+
+    def route_port(self, dpid, dst_edge_dpid):
+        # Out port of an installed route: placed or from the route table
+        port = self.placed.get(dst_edge_dpid, {}).get(dpid)
+        return self.routes.lookup(dpid, dst_edge_dpid) if port is None else port
+
+    def route_path(self, dpid, dst_edge_dpid):
+        # Switches of the route from dpid before the destination, nearest to
+        # it first, as RouteTable.path(); placed routes followed hop by hop
+        placed = self.placed.get(dst_edge_dpid)
+        if not placed:
+            return self.routes.path(dpid, dst_edge_dpid, ECMP)
+        path = []
+        u = dpid
+        while u is not None and u != dst_edge_dpid and u not in path:
+            path.append(u)
+            port = self.route_port(u, dst_edge_dpid)
+            u = next((v for v, p in self.graph.get(u, {}).items() if p == port), None)
+        return path[::-1]
+
+    def route_next_hop(self, dpid, dst_edge_dpid, out_port):
+        # out_port, with ECMP the tuple of all equal-cost out ports towards
+        # the destination edge switch, with FAILOVER out_port and its backup
+        if ECMP:
+            ports = self.routes.next_hops(dpid, dst_edge_dpid)
+            if len(ports) > 1:
+                return ports
+        if FAILOVER:
+            backup = self.routes.backup(dpid, dst_edge_dpid)
+            if backup is not None and backup != out_port:
+                return routing.Failover(out_port, backup)
+        return out_port
+
+    def next_hop_actions(self, datapath, nh):
+        # Output to the next hop port, to a SELECT group for a port tuple, to
+        # an FF group for a routing.Failover, or to the controller for
+        # flowcompile.MISS
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        if nh is flowcompile.MISS:
+            return [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, ofproto.OFPCML_NO_BUFFER)]
+        if isinstance(nh, routing.Failover):
+            return [parser.OFPActionGroup(self.failover_group(datapath, nh))]
+        if isinstance(nh, tuple):
+            return [parser.OFPActionGroup(self.select_group(datapath, nh))]
+        return [parser.OFPActionOutput(nh)]
+
+    def select_group(self, datapath, ports):
+        # One SELECT group per distinct next-hop set on a switch, shared by
+        # every destination reached over the same set of ports
+        return self.group(datapath, ports, datapath.ofproto.OFPGT_SELECT, ports)
+
+    def failover_group(self, datapath, nh):
+        # One FF group per (primary, backup) pair on a switch: the switch
+        # forwards to the first of the two whose port is up
+        return self.group(datapath, nh, datapath.ofproto.OFPGT_FF, (nh.primary, nh.backup))
+
+    def group(self, datapath, key, group_type, ports):
+        # Group of group_type with one output bucket per port, created the
+        # first time key is asked for on the switch
+        groups = self.groups.setdefault(datapath.id, {})
+        group_id = groups.get(key)
+        if group_id is None:
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            group_id = len(groups) + 1
+            groups[key] = group_id
+            # watch_port lets the switch skip buckets whose port is down
+            weight = 1 if group_type == ofproto.OFPGT_SELECT else 0
+            buckets = [parser.OFPBucket(weight=weight, watch_port=port,
+                                        watch_group=ofproto.OFPG_ANY,
+                                        actions=[parser.OFPActionOutput(port)])
+                       for port in ports]
+            datapath.send_msg(parser.OFPGroupMod(datapath, ofproto.OFPGC_ADD,
+                                                 group_type, group_id, buckets))
+            logger.info("dpid %s: group %d (%s) over ports %s", datapath.id,
+                        group_id, 'select' if weight else 'fast-failover', ports)
+        return group_id
+
     def ip_to_edge_dpid(self, ip_str):
-        # Example IP: 10.pod.switch.host
-        try:
-            parts = list(map(int, ip_str.split('.')))
-            pod = parts[1]
-            edge = parts[2]
-            return int(f"2{pod}{edge}")  # matches our dpid scheme for edge switches
-        except:
-            return None
-        
+        # Example IP: 10.pod.switch.host -> DPID of that edge switch, None
+        # for addresses outside the fabric
+        return self.addr.edge_dpid_of_ip(ip_str)
+
     def get_host_ports(self, datapath, graph):
         """
         Returns a set of port numbers on the given datapath (switch)
@@ -0,0 +1,307 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+
+#!/usr/bin/env python3
+
+# Pod-sharded SPRouter for large fabrics: a coordinator process for the
+# core switches and N worker processes, each the controller of a group of
+# pods (shard.py).
+#
+#   python3 snapshot.py --k 16 -o fattree-k16.snap
+#   python3 sp_shard.py --snapshot fattree-k16.snap --workers 4
+#   ./run.sh --snapshot fattree-k16.snap --shards 4
+#
+# The launcher puts the snapshot's routes into shared memory and starts
+# one ryu-manager per shard (SP_SHARD=core/N or <worker>/N) on ports 6653
+# (coordinator) and 6654.. (workers); fat-tree.py --shards N points every
+# switch at its shard. Workers route packet-ins on their own switches as
+# SPRouter does and only install rules there, so a new flow between pods
+# of different workers misses once in each. The coordinator installs the
+# core switches' routes to every destination when they connect: it handles
+# the topology, not the flows.
+#
+# Routes and host locations live in shared memory. Topology changes go
+# through it as well: every shard marks the ports of its switches down or
+# up (port status, LLDP within the pod, switch leave/enter), the
+# coordinator recomputes the routes every 2 * SP_SHARD_POLL seconds and
+# publishes them, and the workers move their installed routes to the new
+# ones on their next poll. Shards do not see each other's LLDP, so the
+# fabric always comes from the snapshot (SP_SNAPSHOT).
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.controller.handler import set_ev_cls
+from ryu.lib import hub
+from ryu.topology import event
+
+import addressing
+import routing
+import shard
+import snapshot
+import sp_routing
+from sp_routing import logger
+
+SHARD = os.environ.get("SP_SHARD", "")                 # core/N or <worker>/N
+SHARD_SHM = os.environ.get("SP_SHARD_SHM", "sp_shard") # shared memory name
+SHARD_POLL = float(os.environ.get("SP_SHARD_POLL", "0.2"))
+
+
+class ShardedSPRouter(sp_routing.SPRouter):
+
+    def __init__(self, *args, **kwargs):
+        super(ShardedSPRouter, self).__init__(*args, **kwargs)
+        self.shard = None               # shard.COORDINATOR or worker number
+        if SHARD:
+            if not sp_routing.SNAPSHOT:
+                raise ValueError("SP_SHARD needs SP_SNAPSHOT: a shard cannot discover "
+                                 "the fabric on its own")
+            self.attach(*shard.parse_shard(SHARD), SHARD_SHM)
+            self.poll_thread = hub.spawn(self._poll_shard)
+            if self.shard == shard.COORDINATOR and sp_routing.SNAPSHOT_CHECK:
+                hub.spawn_after(sp_routing.SNAPSHOT_CHECK, self.check_connected)
+
+    def attach(self, shard_id, workers, name, shared_tracker=False):
+        # Join as shard_id of a controller with `workers` workers over the
+        # shared memory `name`; the fabric is the snapshot's (load_snapshot())
+        self.unconfirmed = None         # LLDP does not cross shards
+        self.state = shard.SharedState.attach(name, self.topo_net, shared_tracker)
+        self.plan = shard.ShardPlan(self.topo_net, workers)
+        self.shard = shard_id
+        self.fabric = {u: dict(nbrs) for u, nbrs in self.graph.items()}
+        self.down = set()               # (u, v) of the links down, both directions
+        if shard_id == shard.COORDINATOR:
+            self.routes.load(self.graph, *self.state.routes())
+        else:
+            self.routes = shard.SharedRouteTable(self.state, self.graph)
+        self.ip_location = shard.SharedHosts(self.state, sp_routing.HOST_TTL,
+                                             self.host_expired, self.plan.hosts(shard_id))
+        logger.info("shard %s of %d: %d switches, shared memory %s, generation %d",
+                    shard_id, workers, len(self.plan.switches(shard_id)), name,
+                    self.state.generation)
+
+    def owns(self, dpid):
+        return self.plan.owner_of_dpid(dpid) == self.shard
+
+    # ================= TOPOLOGY =================
+    # Events only mark the state of this shard's switches; sync() turns it
+    # into routes
+    @set_ev_cls(event.EventSwitchEnter)
+    def _switch_enter_handler(self, ev):
+        if self.shard is None:
+            return super(ShardedSPRouter, self)._switch_enter_handler(ev)
+        dpid = ev.switch.dp.id
+        if not self.owns(dpid):
+            logger.warning("shard %s: switch %s belongs to shard %s", self.shard, dpid,
+                           self.plan.owner_of_dpid(dpid))
+            return
+        self.state.set_switch(dpid, down=False)
+        self.state.set_connected(dpid, True)
+        logger.info("shard %s: switch enter %s", self.shard, dpid)
+        if self.shard == shard.COORDINATOR:
+            self.install_all(dpid)
+
+    def install_all(self, dpid):
+        # Routes of switch dpid to every destination, so it raises no
+        # packet-ins (until one idles out: that one comes back reactively)
+        datapath = self.datapaths.get(dpid)
+        if datapath is None:
+            return
+        for d in sorted(self.routes.dsts):
+            port = self.routes.lookup(dpid, d)
+            if port is not None:
+                subnet = addressing.int_to_ip(routing.edge_subnet(d))
+                self.add_subnet_route(datapath, d, subnet, port)
+        self.flush()
+
+    @set_ev_cls(event.EventSwitchLeave)
+    def _switch_leave_handler(self, ev):
+        if self.shard is None:
+            return super(ShardedSPRouter, self)._switch_leave_handler(ev)
+        dpid = ev.switch.dp.id
+        if self.owns(dpid):
+            self.switch_gone(ev.switch.dp)
+            self.state.set_switch(dpid, down=True)
+            self.state.set_connected(dpid, False)
+            logger.info("shard %s: switch leave %s", self.shard, dpid)
+
+    @set_ev_cls(event.EventLinkAdd)
+    def _link_add_handler(self, ev):
+        if self.shard is None:
+            return super(ShardedSPRouter, self)._link_add_handler(ev)
+        src = ev.link.src
+        if self.owns(src.dpid):
+            self.state.set_link(src.dpid, src.port_no, down=False)
+
+    @set_ev_cls(event.EventLinkDelete)
+    def _link_delete_handler(self, ev):
+        if self.shard is None:
+            return super(ShardedSPRouter, self)._link_delete_handler(ev)
+        src = ev.link.src
+        if self.owns(src.dpid):
+            self.state.set_link(src.dpid, src.port_no, down=True)
+            logger.info("shard %s: link delete %s:%s", self.shard, src.dpid, src.port_no)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def _port_status_handler(self, ev):
+        if self.shard is None:
+            return super(ShardedSPRouter, self)._port_status_handler(ev)
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        port = msg.desc
+        down = msg.reason == ofproto.OFPPR_DELETE or bool(port.state & ofproto.OFPPS_LINK_DOWN)
+        if self.owns(msg.datapath.id) and self.state.set_link(msg.datapath.id, port.port_no, down):
+            logger.info("shard %s: port %s:%s %s", self.shard, msg.datapath.id,
+                        port.port_no, 'down' if down else 'up')
+
+    def check_connected(self):
+        # Coordinator, SP_SNAPSHOT_CHECK seconds after startup: the links of
+        # switches no shard has connected go down
+        missing = [u for u in self.state.dpids if not self.state.connected(u)]
+        for u in missing:
+            self.state.set_switch(u, down=True)
+        if missing:
+            logger.warning("shard %s: %d switches not connected: %s", self.shard,
+                           len(missing), missing)
+
+    # ================= SHARED STATE =================
+    def _poll_shard(self):
+        # The coordinator polls at half the workers' rate, so a worker always
+        # sees a generation before the slot it was in is written again
+        interval = SHARD_POLL * 2 if self.shard == shard.COORDINATOR else SHARD_POLL
+        while True:
+            hub.sleep(interval)
+            self.sync()
+
+    def sync(self):
+        """
+        Take over the link state of the shared memory. The coordinator
+        recomputes the routes a change affects, moves its own installed
+        ones and publishes them; a worker updates its graph and moves its
+        installed routes to the published ones. Returns the destinations
+        whose routes changed.
+        """
+        down = self.state.down_links()
+        failed = down - self.down
+        restored = self.down - down
+        self.down = down
+        if self.shard == shard.COORDINATOR:
+            affected = set()
+            for u, v in sorted(failed):
+                if v in self.graph.get(u, {}):
+                    affected |= self.link_down(u, v)
+            for u, v in restored:
+                self.routes.add_link(u, v, self.fabric[u][v])
+            if restored:
+                affected = set(self.routes.dsts)
+            if affected:
+                self.state.publish(self.routes, affected)
+                logger.info("shard %s: %d links down, %d up: %d destinations published, "
+                            "generation %d", self.shard, len(failed) // 2, len(restored) // 2,
+                            len(affected), self.state.generation)
+            return affected
+
+        for u, v in failed:
+            self.graph.get(u, {}).pop(v, None)
+        for u, v in restored:
+            self.graph.setdefault(u, {})[v] = self.fabric[u][v]
+        before = self.routes.rows()
+        changed = self.routes.refresh()
+        if changed:
+            moved = self.move_routes(changed, before, self.routes.next_hop)
+            self.flush()
+            logger.info("shard %s: generation %d, %d destinations changed, %d routes moved",
+                        self.shard, self.routes.version, len(changed), moved)
+        return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='pod-sharded SPRouter: a coordinator and N worker ryu-managers',
+        epilog='arguments after -- go to every ryu-manager')
+    parser.add_argument('--snapshot', required=True, help='snapshot.py file of the fabric')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes')
+    parser.add_argument('--port', type=int, default=6653,
+                        help='coordinator port, workers on the next ones')
+    parser.add_argument('--ryu-manager', default='ryu-manager')
+    parser.add_argument('--wsapi-port', type=int, default=8080,
+                        help='with SP_METRICS: /metrics of the coordinator, workers on the next ports')
+    parser.add_argument('--name', default=f"sp_shard_{os.getpid()}",
+                        help='shared memory name')
+    args, extra = parser.parse_known_args()
+    extra = [a for a in extra if a != '--']
+
+    try:
+        with snapshot.Snapshot(args.snapshot) as snap:
+            ft_topo = snap.fattree()
+            table = routing.RouteTable()
+            snap.load_routes(table)
+        plan = shard.ShardPlan(ft_topo, args.workers)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    state = shard.SharedState.create(ft_topo, table, args.name)
+    app = os.path.abspath(__file__)
+    procs = []
+    try:
+        for s in plan.shards:
+            env = dict(os.environ, SP_SHARD=f"{s}/{args.workers}", SP_SHARD_SHM=state.name,
+                       SP_SNAPSHOT=os.path.abspath(args.snapshot))
+            port = plan.port(s, args.port)
+            cmd = [args.ryu_manager, '--ofp-tcp-listen-port', str(port)]
+            if sp_routing.METRICS.enabled:
+                # one web server and snapshot file per shard
+                cmd += ['--wsapi-port', str(plan.port(s, args.wsapi_port))]
+                if sp_routing.METRICS_FILE:
+                    root, ext = os.path.splitext(sp_routing.METRICS_FILE)
+                    env['SP_METRICS_FILE'] = f"{root}-{s}{ext}"
+            if sp_routing.WARM:
+                # one checkpoint per shard, each has its own switches
+                root, ext = os.path.splitext(sp_routing.CHECKPOINT)
+                env['SP_CHECKPOINT'] = f"{root}-{s}{ext}"
+            if sp_routing.TRACE.enabled:
+                # one trace per shard, of the packet-ins it handled
+                root, ext = os.path.splitext(sp_routing.TRACE.path)
+                env['SP_TRACE'] = f"{root}-{s}{ext}"
+            procs.append(subprocess.Popen(cmd + extra + [app], env=env))
+            pods = 'core switches' if s == shard.COORDINATOR else f"pods {plan.pods(s)}"
+            sys.stderr.write(f"shard {s}: {pods} on port {port}, pid {procs[-1].pid}\n")
+        # until one of them exits or Ctrl-C
+        while all(p.poll() is None for p in procs):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            p.wait()
+        state.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,835 @@
+"""
+ Copyright (c) 2025 Computer Networks Group @ UPB
+
+ Permission is hereby granted, free of charge, to any person obtaining a copy of
+ this software and associated documentation files (the "Software"), to deal in
+ the Software without restriction, including without limitation the rights to
+ use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+ the Software, and to permit persons to whom the Software is furnished to do so,
+ subject to the following conditions:
+
+ The above copyright notice and this permission notice shall be included in all
+ copies or substantial portions of the Software.
+
+ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+ FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+ COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+ """
+
+# Stand-in datapaths to drive the Ryu apps without Mininet/OVS.
+# Needs Ryu (for the OpenFlow parser), but no switch and no root.
+
+import bisect
+import socket
+import struct
+import time
+import zlib
+
+from ryu.controller import ofp_event
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+from ryu.lib.packet import packet, ethernet, arp, ipv4, tcp, udp, ether_types
+
+import topo
+import pktparse
+from addressing import Addressing
+
+
+def to_int(value):
+    # OFPMatch field value (int, IPv4 or MAC string) as an integer
+    if isinstance(value, int):
+        return value
+    if ':' in value:
+        return int(value.replace(':', ''), 16)
+    return struct.unpack('!I', socket.inet_aton(value))[0]
+
+
+def _match_key(match):
+    # OFPMatch -> sorted ((field, value, mask), ...), mask -1 for exact
+    key = []
+    for name, value in match.items():
+        if isinstance(value, tuple):
+            key.append((name, to_int(value[0]), to_int(value[1])))
+        else:
+            key.append((name, to_int(value), -1))
+    return tuple(sorted(key))
+
+
+class FlowTable(object):
+    """
+    Priority-ordered flow tables applying the OFPFlowMods sent to a stub
+    datapath. Entries are (priority, match key, instructions, flow_mod),
+    of every table in one list (flow_mod.table_id tells them apart). A
+    modify takes the instructions and keeps the entry's flow-mod, as a
+    switch keeps its timeouts, flags, cookie and counters. Entries with an
+    idle_timeout go when expire() finds them unused for that long on
+    `clock`.
+
+    Lookups are a tuple space search, as in Open vSwitch: the entries of
+    a table are grouped by the fields and masks they match on, each group
+    a dict from the masked values to its best entry, and only the groups
+    that could still beat the best match so far are probed. Equal
+    priorities go to the entry added first, as in the list. version
+    counts the changes, fields_used has the fields any entry matches on.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.entries = []
+        self._order = []    # -priority of each entry, for bisect
+        self.clock = clock
+        self.used = {}      # (table, priority, match key) -> last hit
+        self.version = 0
+        self._seq = {}      # (table, priority, match key) -> order it was added in
+        self._added = 0
+        # table -> [[max priority, fields, masks, {masked values: entry}]],
+        # highest max priority first
+        self._tuples = {}
+        # (table, packet's fields) -> [[max priority, (field, mask) pairs,
+        # group dict]] of the groups the packet has all fields of
+        self._probes = {}
+        self.fields_used = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def apply(self, mod):
+        # Returns the flow-mods of the entries a delete removed
+        ofp = ofproto_v1_3
+        key = _match_key(mod.match)
+        table = mod.table_id
+        if mod.command in (ofp.OFPFC_ADD, ofp.OFPFC_MODIFY, ofp.OFPFC_MODIFY_STRICT):
+            rule = (table, mod.priority, key)
+            self.used[rule] = self.clock()
+            self.version += 1
+            if rule in self._seq:
+                i = bisect.bisect_left(self._order, -mod.priority)
+                while self.entries[i][1] != key or self.entries[i][3].table_id != table:
+                    i += 1
+                e = self.entries[i]
+                if mod.command == ofp.OFPFC_ADD:
+                    e = self.entries[i] = (mod.priority, key, mod.instructions, mod)
+                else:
+                    e = self.entries[i] = e[:2] + (mod.instructions, e[3])
+                self._index(table, e, replace=True)
+                return []
+            # after the entries of equal priority, like a switch keeps them
+            i = bisect.bisect_right(self._order, -mod.priority)
+            self._order.insert(i, -mod.priority)
+            e = (mod.priority, key, mod.instructions, mod)
+            self.entries.insert(i, e)
+            self._seq[rule] = self._added
+            self._added += 1
+            self._index(table, e)
+        elif mod.command == ofp.OFPFC_DELETE_STRICT:
+            return self._keep(lambda e: not (e[0] == mod.priority and e[1] == key
+                                             and e[3].table_id == table))
+        elif mod.command == ofp.OFPFC_DELETE:
+            fields = set(key)
+            return self._keep(lambda e: not (fields <= set(e[1]) and
+                                             table in (ofp.OFPTT_ALL, e[3].table_id)))
+        return []
+
+    def _index(self, table, entry, replace=False):
+        # Put entry into the group of its fields and masks, where it
+        # replaces a worse entry with the same masked values (or, with
+        # replace, the entry of the same rule)
+        fields = tuple(name for name, _, _ in entry[1])
+        masks = tuple(mask for _, _, mask in entry[1])
+        values = tuple(value & mask for _, value, mask in entry[1])
+        groups = self._tuples.setdefault(table, [])
+        for group in groups:
+            if group[1] == fields and group[2] == masks:
+                break
+        else:
+            group = [entry[0], fields, masks, {}]
+            groups.append(group)
+            groups.sort(key=lambda g: -g[0])
+            self.fields_used.update(fields)
+            self._probes = {}
+        have = group[3].get(values)
+        if have is None or (have[:2] == entry[:2] if replace else
+                            self._better(table, entry, have)):
+            group[3][values] = entry
+        if entry[0] > group[0]:
+            group[0] = entry[0]
+            groups.sort(key=lambda g: -g[0])
+            self._probes = {}
+
+    def _better(self, table, a, b):
+        # Entry a wins over entry b when both match
+        if a[0] != b[0]:
+            return a[0] > b[0]
+        return self._seq[(table, a[0], a[1])] < self._seq[(table, b[0], b[1])]
+
+    def expire(self):
+        # Remove the entries idle for their idle_timeout; their flow-mods
+        now = self.clock()
+        return self._keep(lambda e: not e[3].idle_timeout
+                          or now - self.used[(e[3].table_id, e[0], e[1])] < e[3].idle_timeout)
+
+    def _keep(self, pred):
+        removed = [e[3] for e in self.entries if not pred(e)]
+        if removed:
+            self.entries = [e for e in self.entries if pred(e)]
+            self._order = [-e[0] for e in self.entries]
+            for mod in removed:
+                rule = (mod.table_id, mod.priority, _match_key(mod.match))
+                self.used.pop(rule, None)
+                self._seq.pop(rule, None)
+            self.version += 1
+            self._tuples = {}
+            self._probes = {}
+            self.fields_used = set()
+            for e in self.entries:
+                self._index(e[3].table_id, e)
+        return removed
+
+    def lookup(self, pkt, table_id=0):
+        """
+        Highest-priority entry of table table_id matching pkt, a {field:
+        int value} dict with the same field names OFPMatch uses. None on a
+        table miss.
+        """
+        probes = self._probes.get((table_id, tuple(pkt)))
+        if probes is None:
+            probes = self._probes[(table_id, tuple(pkt))] = [
+                (g[0], tuple(zip(g[1], g[2])), g[3]) for g in self._tuples.get(table_id, ())
+                if all(name in pkt for name in g[1])]
+        best = None
+        for priority, pairs, index in probes:
+            if best is not None and priority < best[0]:
+                break
+            entry = index.get(tuple([pkt[name] & mask for name, mask in pairs]))
+            if entry is not None and (best is None or self._better(table_id, entry, best)):
+                best = entry
+        if best is not None:
+            self.used[(table_id, best[0], best[1])] = self.clock()
+        return best
+
+    def rules(self, table_id=0):
+        # Entries of table table_id
+        return [e for e in self.entries if e[3].table_id == table_id]
+
+
+class StubDatapath(object):
+    """
+    Looks like ryu.controller.controller.Datapath to the apps: same
+    ofproto/parser attributes and port dict, but send_msg/send only record
+    the messages in self.sent (send_msg serializes, as the real one does).
+    Flow-mods are also applied to self.flows, barrier requests are kept in
+    self.barriers until answered with barrier_reply_event(). Entries that
+    leave the table with OFPFF_SEND_FLOW_REM set are queued in self.removed
+    as (flow-mod, reason) for flow_removed_event(). Group-mods are applied
+    to self.groups, {group id: (type, buckets)}; a group delete takes the
+    flow entries using the group along.
+
+    With deferred set, flow-mods and group-mods only take effect when the
+    barrier after them is answered (complete()), as a busy switch may
+    take its time. Meter-mods are applied to self.meters, {meter id:
+    token bucket}; meter() takes a token for a packet, False if none is
+    left (the packet is dropped). version changes with the flow and group
+    tables.
+    """
+
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, dpid, ports=(), clock=time.monotonic, deferred=False):
+        self.id = dpid
+        self.ports = dict.fromkeys(ports)
+        self.xid = 0
+        self.sent = []
+        self.writes = 0
+        self.barriers = []
+        self.removed = []
+        self.flows = FlowTable(clock)
+        self.groups = {}
+        self.meters = {}    # meter id -> [rate/s, burst, tokens, last refill]
+        self.group_changes = 0
+        self.touched = None     # set the dpid goes into when there is news (StubFabric)
+        self.clock = clock
+        self.deferred = deferred
+        self._queued = []   # mods sent since the last barrier (deferred)
+        self._at_barrier = {}   # barrier xid -> mods it completes (deferred)
+        self._by_xid = {}   # xid -> message, to map raw writes back to them
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+        self._by_xid[self.xid] = msg
+        return self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        self._by_xid[msg.xid] = msg
+        return self.send(msg.buf)
+
+    def send(self, buf):
+        # One write to the switch, possibly several messages
+        self.writes += 1
+        if self.touched is not None:
+            self.touched.add(self.id)
+        off = 0
+        while off + ofproto_v1_3.OFP_HEADER_SIZE <= len(buf):
+            _, _, length, xid = struct.unpack_from(ofproto_v1_3.OFP_HEADER_PACK_STR,
+                                                   buf, off)
+            off += length
+            msg = self._by_xid.pop(xid)
+            self.sent.append(msg)
+            if isinstance(msg, (ofproto_v1_3_parser.OFPFlowMod,
+                                ofproto_v1_3_parser.OFPGroupMod)):
+                if self.deferred:
+                    self._queued.append(msg)
+                else:
+                    self._apply(msg)
+            elif isinstance(msg, ofproto_v1_3_parser.OFPBarrierRequest):
+                self.barriers.append(xid)
+                if self._queued:
+                    self._at_barrier[xid] = self._queued
+                    self._queued = []
+            elif isinstance(msg, ofproto_v1_3_parser.OFPMeterMod):
+                self._apply_meter(msg)
+        return True
+
+    @property
+    def version(self):
+        return self.flows.version + self.group_changes
+
+    def complete(self, xid):
+        # Barrier xid is answered: what was sent before it is in effect
+        for msg in self._at_barrier.pop(xid, ()):
+            self._apply(msg)
+
+    def _apply(self, msg):
+        if isinstance(msg, ofproto_v1_3_parser.OFPFlowMod):
+            self._removed(self.flows.apply(msg), ofproto_v1_3.OFPRR_DELETE)
+        else:
+            self._apply_group(msg)
+
+    def _apply_meter(self, mod):
+        # ADD only creates, MODIFY only changes (the switch answers an error
+        # otherwise); DELETE takes the flow entries using the meter along
+        ofp = ofproto_v1_3
+        if mod.command == ofp.OFPMC_DELETE:
+            if self.meters.pop(mod.meter_id, None) is not None:
+                self._removed(self.flows._keep(
+                    lambda e: not any(getattr(inst, 'meter_id', None) == mod.meter_id
+                                      for inst in e[2])),
+                    ofp.OFPRR_DELETE)
+        elif (mod.command == ofp.OFPMC_ADD) != (mod.meter_id in self.meters):
+            band = mod.bands[0]
+            self.meters[mod.meter_id] = [band.rate, band.burst_size or band.rate,
+                                         band.burst_size or band.rate, self.clock()]
+
+    def meter(self, meter_id):
+        # A packet through meter meter_id: True if within its rate
+        bucket = self.meters.get(meter_id)
+        if bucket is None:
+            return True
+        rate, burst, tokens, last = bucket
+        now = self.clock()
+        tokens = min(burst, tokens + (now - last) * rate)
+        bucket[2:] = tokens, now
+        if tokens < 1:
+            return False
+        bucket[2] = tokens - 1
+        return True
+
+    def _apply_group(self, mod):
+        # Deleting a group removes the flow entries that use it
+        ofp = ofproto_v1_3
+        self.group_changes += 1
+        if mod.command == ofp.OFPGC_DELETE:
+            if mod.group_id == ofp.OFPG_ALL:
+                gone = set(self.groups)
+                self.groups.clear()
+            else:
+                gone = {mod.group_id} & set(self.groups)
+                self.groups.pop(mod.group_id, None)
+            if gone:
+                self._removed(self.flows._keep(
+                    lambda e: not any(getattr(a, 'group_id', None) in gone
+                                      for inst in e[2] for a in getattr(inst, 'actions', ()))),
+                    ofp.OFPRR_GROUP_DELETE)
+        else:
+            self.groups[mod.group_id] = (mod.type, mod.buckets)
+
+    def expire(self):
+        # Idle entries time out, as the switch does on its own
+        self._removed(self.flows.expire(), ofproto_v1_3.OFPRR_IDLE_TIMEOUT)
+
+    def _removed(self, mods, reason):
+        removed = [(mod, reason) for mod in mods if mod.flags & ofproto_v1_3.OFPFF_SEND_FLOW_REM]
+        if removed:
+            self.removed += removed
+            if self.touched is not None:
+                self.touched.add(self.id)
+
+
+def stub_datapaths(ft_topo, clock=time.monotonic, deferred=False):
+    # One StubDatapath per switch of ft_topo, with the ports of the addressing plan
+    addr = Addressing(ft_topo)
+    return {
+        addr.dpid(i): StubDatapath(addr.dpid(i), range(1, ft_topo.degree(i) + 1), clock,
+                                   deferred)
+        for i in range(ft_topo.n_switch)
+    }
+
+
+STATS_REQUESTS = (ofproto_v1_3_parser.OFPFlowStatsRequest,
+                  ofproto_v1_3_parser.OFPGroupDescStatsRequest)
+
+
+class StubFabric(object):
+    """
+    Stand-in switches of ft_topo wired as in the addressing plan, with
+    hosts behind the edge switches. Frames follow the flow tables; a miss
+    (or an output to the controller) is a packet-in to router, barrier
+    requests are answered, flow-removed messages delivered and packet-outs
+    carried on by settle(); expire() lets idle entries time out.
+
+    Hosts answer ARP requests for their IP and remember the sender of
+    every ARP message they get, as Linux does. Anything else they receive
+    is counted in delivered and kept in inbox[host index].
+
+    Tables are looked up from table 0 on, along goto-table instructions;
+    a packet-out to OFPP_TABLE goes through them as well. Groups forward
+    as a switch does: SELECT by a hash of the IP addresses
+    over the buckets whose watch port is up, FF the first such bucket.
+    fail_link() takes a link down (frames sent onto it count in dropped),
+    report_link() tells the router with a port status from both ends.
+    With stats set, flow stats and group description requests are
+    answered from the tables, STATS_PART entries per reply part (counters
+    are 0). With deferred set, the switches' tables only change when
+    settle() answers the barriers; inject() puts frames on the fabric
+    without settling, so that many arrive while rules are outstanding.
+    Packets a meter drops count in metered. path() follows a frame
+    through the tables without sending anything, for reachability checks.
+    """
+
+    MAX_HOPS = 16
+    STATS_PART = 100
+
+    def __init__(self, router, ft_topo, clock=time.monotonic, stats=False, deferred=False):
+        self.router = router
+        self.stats = stats
+        self.ft = ft_topo
+        self.addr = Addressing(ft_topo)
+        self.datapaths = stub_datapaths(ft_topo, clock, deferred)
+        self.seen = dict.fromkeys(self.datapaths, 0)
+        self.arp_cache = {}     # host index -> {ip: mac}
+        self.inbox = {}         # host index -> [frame]
+        self.down = set()       # (node, port) of failed links, both ends
+        self.packet_ins = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.metered = 0
+        self._parsed = (None, None)     # last frame fields() parsed, its fields
+        self._dpids = [self.addr.dpid(i) for i in range(ft_topo.n_switch)]
+        self._dpids_in_order = list(self.datapaths)
+        self._rank = {dpid: i for i, dpid in enumerate(self._dpids_in_order)}
+        self._touched = set()           # dpids that sent or removed something since
+        for dp in self.datapaths.values():
+            dp.touched = self._touched
+        self._links = {}                # (node, port) -> (neighbor, its port), for path()
+
+    def fail_link(self, a, b):
+        self.down.add((a, self.addr.port(a, b)))
+        self.down.add((b, self.addr.port(b, a)))
+
+    def report_link(self, a, b):
+        for node, peer in ((a, b), (b, a)):
+            if self.ft.types[node] != topo.HOST:
+                dp = self.datapaths[self.addr.dpid(node)]
+                self.router._port_status_handler(
+                    port_status_event(dp, self.addr.port(node, peer)))
+        self.settle()
+
+    def connect(self):
+        for dp in self.datapaths.values():
+            self.router.switch_features_handler(switch_features_event(dp))
+        self.settle()
+
+    def send(self, host, data):
+        # host puts data on its link, then the fabric settles
+        self.inject(host, data)
+        self.settle()
+
+    def inject(self, host, data):
+        # host puts data on its link; outstanding barriers stay so
+        edge = self.ft.neighbors(host)[0]
+        self._switch(edge, self.addr.port(edge, host), data, 0)
+
+    def packet_in(self, dp, in_port, data):
+        self.packet_ins += 1
+        self.router._packet_in_handler(packet_in_event(dp, in_port, data))
+
+    def expire(self):
+        for dp in self.datapaths.values():
+            dp.expire()
+        self.settle()
+
+    def settle(self):
+        # Answer barriers, report removed flows and carry packet-outs until
+        # nothing moves
+        ofp = ofproto_v1_3
+        on_removed = getattr(self.router, '_flow_removed_handler', None)
+        while self._touched:
+            for dpid in self._in_order():
+                dp = self.datapaths[dpid]
+                while dp.barriers:
+                    xid = dp.barriers.pop(0)
+                    dp.complete(xid)
+                    self.router._barrier_reply_handler(barrier_reply_event(dp, xid))
+                while dp.removed:
+                    mod, reason = dp.removed.pop(0)
+                    if on_removed is not None:
+                        on_removed(flow_removed_event(dp, mod, reason))
+            for dpid in self._in_order():
+                dp = self.datapaths[dpid]
+                self._touched.discard(dpid)
+                while self.seen[dpid] < len(dp.sent):
+                    msg = dp.sent[self.seen[dpid]]
+                    self.seen[dpid] += 1
+                    if self.stats and isinstance(msg, STATS_REQUESTS):
+                        self._answer_stats(dp, msg)
+                        continue
+                    if not isinstance(msg, ofproto_v1_3_parser.OFPPacketOut):
+                        continue
+                    node = self.addr.index_of_dpid(dpid)
+                    for port in self._outputs(node, msg.actions, msg.data):
+                        if port == ofp.OFPP_IN_PORT:
+                            port = msg.in_port
+                        if port < ofp.OFPP_MAX:
+                            self._link(node, port, msg.data, 0)
+                        elif port == ofp.OFPP_TABLE:
+                            self._switch(node, msg.in_port, msg.data, 0)
+                if dp.barriers or dp.removed:
+                    # sent or removed before this pass came to it
+                    self._touched.add(dpid)
+
+    def _in_order(self):
+        # The touched datapaths in the order of self.datapaths, those touched
+        # on the way further on included, as a sweep over all of them
+        # would find them
+        rank = self._rank
+        last = -1
+        while True:
+            later = [rank[dpid] for dpid in self._touched if rank[dpid] > last]
+            if not later:
+                return
+            last = min(later)
+            yield self._dpids_in_order[last]
+
+    def _answer_stats(self, dp, msg):
+        # Reply parts of STATS_PART entries, all but the last with REPLY_MORE
+        if isinstance(msg, ofproto_v1_3_parser.OFPFlowStatsRequest):
+            body = [(e[3], 0, 0) for e in dp.flows.entries
+                    if msg.table_id in (ofproto_v1_3.OFPTT_ALL, e[3].table_id)]
+            make, handler = flow_stats_reply_event, self.router._flow_stats_reply_handler
+        else:
+            body = sorted(dp.groups.items())
+            make, handler = group_desc_reply_event, self.router._group_desc_reply_handler
+        for i in range(0, max(len(body), 1), self.STATS_PART):
+            more = i + self.STATS_PART < len(body)
+            handler(make(dp, body[i:i + self.STATS_PART],
+                         ofproto_v1_3.OFPMPF_REPLY_MORE if more else 0))
+
+    def _outputs(self, node, actions, data):
+        # Ports the actions send data out of on switch node, groups resolved
+        ofp = ofproto_v1_3
+        dp = self.datapaths[self.addr.dpid(node)]
+        ports = []
+        for action in actions:
+            if isinstance(action, ofproto_v1_3_parser.OFPActionOutput):
+                ports.append(action.port)
+            elif isinstance(action, ofproto_v1_3_parser.OFPActionGroup):
+                group_type, buckets = dp.groups.get(action.group_id, (None, []))
+                live = [b for b in buckets if (node, b.watch_port) not in self.down]
+                if not live:
+                    continue
+                if group_type == ofp.OFPGT_SELECT:
+                    live = [live[zlib.crc32(data[26:34]) % len(live)]]
+                elif group_type == ofp.OFPGT_FF:
+                    live = live[:1]
+                for bucket in live:
+                    ports += self._outputs(node, bucket.actions, data)
+        return ports
+
+    def _link(self, node, port, data, hops):
+        # data leaves switch node on port
+        if (node, port) in self.down:
+            self.dropped += 1
+            return
+        nxt = self.addr.neighbor(node, port)
+        if self.ft.types[nxt] == topo.HOST:
+            self._host(nxt, data)
+        else:
+            self._switch(nxt, self.addr.port(nxt, node), data, hops + 1)
+
+    def fields(self, in_port, data):
+        # Match fields of data coming in on in_port, as FlowTable.lookup
+        # takes them; the frame is parsed once for all its hops
+        if data is not self._parsed[0]:
+            self._parsed = (data, self._header_fields(data))
+        fields = self._parsed[1].copy()
+        fields['in_port'] = in_port
+        return fields
+
+    def _header_fields(self, data):
+        ethertype, _, dst_ip = pktparse.parse_headers(data)
+        fields = {'eth_type': ethertype}
+        if dst_ip is not None:
+            fields['arp_tpa' if ethertype == pktparse.ETH_TYPE_ARP else 'ipv4_dst'] = \
+                to_int(dst_ip)
+        key = pktparse.flow_key(data)
+        if key is not None:
+            src_ip, _, proto, sport, dport = key
+            fields['ipv4_src'] = to_int(src_ip)
+            fields['ip_proto'] = proto
+            if proto == pktparse.IP_PROTO_TCP:
+                fields['tcp_src'], fields['tcp_dst'] = sport, dport
+            elif proto == pktparse.IP_PROTO_UDP:
+                fields['udp_src'], fields['udp_dst'] = sport, dport
+        return fields
+
+    def forward(self, node, in_port, data):
+        """
+        Ports switch node sends data out of, coming in on in_port, through
+        its tables from table 0 on (goto-table instructions followed).
+        None on a table miss.
+        """
+        dp = self.datapaths[self.addr.dpid(node)]
+        fields = self.fields(in_port, data)
+        table = 0
+        ports = []
+        while table is not None:
+            entry = dp.flows.lookup(fields, table)
+            if entry is None:
+                return None
+            table = None
+            for inst in entry[2]:
+                if (isinstance(inst, ofproto_v1_3_parser.OFPInstructionMeter)
+                        and not dp.meter(inst.meter_id)):
+                    self.metered += 1
+                    return []
+                ports += self._outputs(node, getattr(inst, 'actions', []), data)
+                if isinstance(inst, ofproto_v1_3_parser.OFPInstructionGotoTable):
+                    table = inst.table_id
+        return ports
+
+    def path(self, src, data, cache=None):
+        """
+        Switches (node indexes) data from host src passes on the flow
+        tables alone and the node it ends at: a host, or the switch where
+        it would be a packet-in or is dropped. Nothing is sent or counted.
+        cache, {(node, in_port): (datapath version, ports)}, keeps the
+        forwarding decisions for the next frame that is forwarded alike
+        (same destination, tables that do not look at the source).
+        """
+        ft = self.ft
+        node = ft.neighbors(src)[0]
+        in_port = self.addr.port(node, src)
+        switches = []
+        while ft.types[node] != topo.HOST:
+            if len(switches) > self.MAX_HOPS:
+                return switches, node
+            switches.append(node)
+            link = self.next_hop(node, in_port, data, cache)
+            if link is None:
+                return switches, node
+            node, in_port = link
+        return switches, node
+
+    def decision_key(self, node, in_port):
+        # What the forwarding decision of switch node depends on besides
+        # the frame: in_port only if one of its entries matches on it
+        dp = self.datapaths[self._dpids[node]]
+        return node, in_port if 'in_port' in dp.flows.fields_used else None
+
+    def next_hop(self, node, in_port, data, cache=None):
+        """
+        (node, in_port) data gets to from switch node, coming in on
+        in_port, on the flow tables alone (the first port it is sent out
+        of); None if it ends at node: a packet-in, a drop or a link down.
+        cache as for path().
+        """
+        ofp = ofproto_v1_3
+        if cache is None:
+            ports = self.forward(node, in_port, data)
+        else:
+            dp = self.datapaths[self._dpids[node]]
+            key = self.decision_key(node, in_port)
+            hit = cache.get(key)
+            if hit is not None and hit[0] == dp.version:
+                ports = hit[1]
+            else:
+                ports = self.forward(node, in_port, data)
+                cache[key] = (dp.version, ports)
+        if not ports or ofp.OFPP_CONTROLLER in ports:
+            return None
+        port = ports[0]
+        if port == ofp.OFPP_IN_PORT:
+            port = in_port
+        if port >= ofp.OFPP_MAX or (node, port) in self.down:
+            return None
+        link = self._links.get((node, port))
+        if link is None:
+            nxt = self.addr.neighbor(node, port)
+            link = self._links[(node, port)] = (nxt, self.addr.port(nxt, node))
+        return link
+
+    def _switch(self, node, in_port, data, hops):
+        dp = self.datapaths[self.addr.dpid(node)]
+        if hops > self.MAX_HOPS:
+            return
+        ports = self.forward(node, in_port, data)
+        if ports is None or ofproto_v1_3.OFPP_CONTROLLER in ports:
+            self.packet_in(dp, in_port, data)
+            return
+        for port in ports:
+            self._link(node, port, data, hops)
+
+    def _host(self, h, data):
+        message = pktparse.arp_message(data)
+        if message is None:
+            self.delivered += 1
+            self.inbox.setdefault(h, []).append(data)
+            return
+        opcode, sha, spa, tpa = message
+        ip = self.addr.ip(h)
+        if tpa != ip:
+            return
+        self.arp_cache.setdefault(h, {})[spa] = sha
+        if opcode == pktparse.ARP_REQUEST:
+            mac = pktparse.mac_bytes(self.addr.mac(h))
+            reply = pktparse.arp_frame(pktparse.ARP_REPLY, mac, ip, sha, spa)
+            edge = self.ft.neighbors(h)[0]
+            self._switch(edge, self.addr.port(edge, h), reply, 0)
+
+
+def switch_features_event(datapath):
+    # What the switch answers to the features request on connect
+    msg = datapath.ofproto_parser.OFPSwitchFeatures(
+        datapath, datapath_id=datapath.id, n_buffers=0, n_tables=254,
+        auxiliary_id=0, capabilities=0)
+    return ofp_event.EventOFPSwitchFeatures(msg)
+
+
+def barrier_reply_event(datapath, xid):
+    msg = datapath.ofproto_parser.OFPBarrierReply(datapath)
+    msg.xid = xid
+    return ofp_event.EventOFPBarrierReply(msg)
+
+
+def flow_removed_event(datapath, mod, reason):
+    # The switch reports that the entry mod installed is gone
+    msg = datapath.ofproto_parser.OFPFlowRemoved(
+        datapath, cookie=mod.cookie, priority=mod.priority, reason=reason,
+        table_id=mod.table_id, duration_sec=0, duration_nsec=0,
+        idle_timeout=mod.idle_timeout, hard_timeout=mod.hard_timeout,
+        packet_count=0, byte_count=0, match=mod.match)
+    return ofp_event.EventOFPFlowRemoved(msg)
+
+
+def port_status_event(datapath, port_no, reason=ofproto_v1_3.OFPPR_MODIFY,
+                      state=ofproto_v1_3.OFPPS_LINK_DOWN):
+    # The switch reports a port change, by default its link going down
+    parser = datapath.ofproto_parser
+    desc = parser.OFPPort(port_no=port_no, hw_addr='00:00:00:00:00:00', name=b'',
+                          config=0, state=state, curr=0, advertised=0, supported=0,
+                          peer=0, curr_speed=0, max_speed=0)
+    msg = parser.OFPPortStatus(datapath, reason=reason, desc=desc)
+    return ofp_event.EventOFPPortStatus(msg)
+
+
+def port_stats_reply_event(datapath, tx_bytes, duration):
+    # Statistics of the ports in tx_bytes {port: bytes sent}, the ports
+    # existing for duration seconds; other counters are 0
+    parser = datapath.ofproto_parser
+    sec = int(duration)
+    nsec = int((duration - sec) * 1e9)
+    body = [parser.OFPPortStats(port_no=port, rx_packets=0, tx_packets=0, rx_bytes=0,
+                                tx_bytes=int(sent), rx_dropped=0, tx_dropped=0,
+                                rx_errors=0, tx_errors=0, rx_frame_err=0, rx_over_err=0,
+                                rx_crc_err=0, collisions=0, duration_sec=sec,
+                                duration_nsec=nsec)
+            for port, sent in sorted(tx_bytes.items())]
+    msg = parser.OFPPortStatsReply(datapath, type_=ofproto_v1_3.OFPMP_PORT_STATS, body=body)
+    return ofp_event.EventOFPPortStatsReply(msg)
+
+
+def flow_stats_reply_event(datapath, entries, flags=0):
+    # Statistics of flow entries: [(entry's flow-mod, byte count, seconds
+    # it exists)]; packet counts are 0. flags: OFPMPF_REPLY_MORE if more
+    # parts follow.
+    parser = datapath.ofproto_parser
+    body = []
+    for mod, byte_count, duration in entries:
+        sec = int(duration)
+        body.append(parser.OFPFlowStats(
+            table_id=mod.table_id, duration_sec=sec, duration_nsec=int((duration - sec) * 1e9),
+            priority=mod.priority, idle_timeout=mod.idle_timeout,
+            hard_timeout=mod.hard_timeout, flags=mod.flags, cookie=mod.cookie,
+            packet_count=0, byte_count=int(byte_count), match=mod.match,
+            instructions=mod.instructions))
+    msg = parser.OFPFlowStatsReply(datapath, type_=ofproto_v1_3.OFPMP_FLOW, body=body,
+                                   flags=flags)
+    return ofp_event.EventOFPFlowStatsReply(msg)
+
+
+def group_desc_reply_event(datapath, groups, flags=0):
+    # Description of the groups [(group id, (type, buckets))], as in
+    # StubDatapath.groups
+    parser = datapath.ofproto_parser
+    body = [parser.OFPGroupDescStats(type_, group_id, buckets)
+            for group_id, (type_, buckets) in groups]
+    msg = parser.OFPGroupDescStatsReply(datapath, type_=ofproto_v1_3.OFPMP_GROUP_DESC,
+                                        body=body, flags=flags)
+    return ofp_event.EventOFPGroupDescStatsReply(msg)
+
+
+def packet_in_event(datapath, in_port, data,
+                    buffer_id=ofproto_v1_3.OFP_NO_BUFFER):
+    # Table-miss packet-in, as the default flow entry sends it
+    parser = datapath.ofproto_parser
+    msg = parser.OFPPacketIn(datapath, buffer_id=buffer_id,
+                             total_len=len(data),
+                             reason=ofproto_v1_3.OFPR_NO_MATCH,
+                             table_id=0, cookie=0,
+                             match=parser.OFPMatch(in_port=in_port),
+                             data=data)
+    return ofp_event.EventOFPPacketIn(msg)
+
+
+def arp_frame(src_mac, src_ip, dst_ip):
+    # Broadcast ARP request
+    pkt = packet.Packet()
+    pkt.add_protocol(ethernet.ethernet(dst='ff:ff:ff:ff:ff:ff', src=src_mac,
+                                       ethertype=ether_types.ETH_TYPE_ARP))
+    pkt.add_protocol(arp.arp(opcode=arp.ARP_REQUEST, src_mac=src_mac,
+                             src_ip=src_ip, dst_mac='00:00:00:00:00:00',
+                             dst_ip=dst_ip))
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def ipv4_frame(src_mac, dst_mac, src_ip, dst_ip, proto=1, payload=b'\x00' * 32,
+               ports=None):
+    # ports (src, dst): a TCP/UDP header for proto 6/17 before the payload
+    pkt = packet.Packet()
+    pkt.add_protocol(ethernet.ethernet(dst=dst_mac, src=src_mac,
+                                       ethertype=ether_types.ETH_TYPE_IP))
+    pkt.add_protocol(ipv4.ipv4(src=src_ip, dst=dst_ip, proto=proto))
+    if ports is not None:
+        if proto == pktparse.IP_PROTO_TCP:
+            pkt.add_protocol(tcp.tcp(src_port=ports[0], dst_port=ports[1]))
+        else:
+            pkt.add_protocol(udp.udp(src_port=ports[0], dst_port=ports[1]))
+    pkt.add_protocol(payload)
+    pkt.serialize()
+    return bytes(pkt.data)
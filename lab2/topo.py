@@ -19,101 +19,230 @@
  CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
  """
 
+from array import array
+
+# Node type codes as stored in Fattree.types
+HOST, EDGE, AGG, CORE = 0, 1, 2, 3
+TYPES = ('host', 'edge', 'agg', 'core')
+
 # Class for an edge in the graph
 class Edge:
-	def __init__(self):
-		self.lnode = None
-		self.rnode = None
-	
-	def remove(self):
-		self.lnode.edges.remove(self)
-		self.rnode.edges.remove(self)
-		self.lnode = None
-		self.rnode = None
-
-# Class for a node in the graph
+	__slots__ = ('lnode', 'rnode')
+
+	def __init__(self, lnode=None, rnode=None):
+		self.lnode = lnode
+		self.rnode = rnode
+
+# Class for a node in the graph: a view on one index of a Fattree
 class Node:
-	def __init__(self, id, type):
-		self.edges = []
-		self.id = id
-		self.type = type
-
-	# Add an edge connected to another node
-	def add_edge(self, node):
-		edge = Edge()
-		edge.lnode = self
-		edge.rnode = node
-		self.edges.append(edge)
-		node.edges.append(edge)
-		return edge
-
-	# Remove an edge from the node
-	def remove_edge(self, edge):
-		self.edges.remove(edge)
+	__slots__ = ('ft', 'index', 'id', 'type', 'pod', 'edge', 'idx')
+
+	def __init__(self, ft, index):
+		self.ft = ft
+		self.index = index
+		self.id = ft.ids[index]
+		t = ft.types[index]
+		self.type = TYPES[t]
+		# addressing info, as far as it exists for the node type
+		if t != CORE:
+			self.pod = ft.pods[index]
+		if t == HOST:
+			self.edge = ft.subs[index]
+		self.idx = ft.idxs[index]
+
+	# Edges to all neighbors, built from the adjacency arrays on access
+	@property
+	def edges(self):
+		ft = self.ft
+		return [Edge(self, ft.node(j)) for j in ft.neighbors(self.index)]
 
 	# Decide if another node is a neighbor
 	def is_neighbor(self, node):
-		for edge in self.edges:
-			if edge.lnode == node or edge.rnode == node:
-				return True
-		return False
+		return self.ft.is_neighbor(self.index, node.index)
 
+	def __repr__(self):
+		return f"Node({self.id})"
 
-class Fattree:
 
-	def __init__(self, num_ports):
-		self.servers = [] # list of Node(type='host')
-		self.switches = []  # list of Node(type in {'core','agg','edge'})
-		self.generate(num_ports) 
+class Fattree:
+	"""
+	k-ary fat-tree stored as flat arrays indexed by an integer node index:
+	switches first (cores, then per pod a0, e0, a1, e1, ...), then hosts
+	ordered by pod, edge and host index. Adjacency is in CSR form
+	(indptr/indices) and lists every node's neighbors in the order Mininet
+	numbers their ports, so neighbor i of a switch sits on port i + 1.
+
+	servers/switches and Node.edges are views built on demand on top.
+	"""
+
+	def __init__(self, num_ports, generate=True):
+		self.num_ports = num_ports
+		self.ids = []              # index -> node id
+		self.types = bytearray()   # index -> HOST/EDGE/AGG/CORE
+		self.pods = array('i')     # index -> pod (-1 for cores)
+		self.subs = array('i')     # index -> edge switch index (hosts only)
+		self.idxs = array('i')     # index -> index within pod/edge/core block
+		self.indptr = array('l')   # CSR row pointers
+		self.indices = array('l')  # CSR neighbor indices
+		self._nodes = None
+		self._switches = None
+		self._servers = None
+		self._id_index = None
+		if generate:
+			self.generate(num_ports)
+
+	@classmethod
+	def from_arrays(cls, num_ports, ids, types, pods, subs, idxs, indptr, indices):
+		# Fattree over node arrays generate() produced before, e.g. the ones
+		# of a snapshot file (the arrays are copied, buffers may be reused)
+		ft = cls(num_ports, generate=False)
+		half = num_ports // 2
+		ft.n_core = half * half
+		ft.n_switch = ft.n_core + num_ports * num_ports
+		ft.ids = list(ids)
+		ft.types.extend(types)
+		ft.pods.extend(pods)
+		ft.subs.extend(subs)
+		ft.idxs.extend(idxs)
+		ft.indptr.extend(indptr)
+		ft.indices.extend(indices)
+		return ft
 
 	def generate(self, num_ports):
 		pods = k = num_ports
 		half = k // 2
-        
-		# 1) create core switches: arranged in half x half matrix
-		core_switches = []
+		n_core = half * half
+		n_switch = n_core + k * k
+		self.n_core = n_core
+		self.n_switch = n_switch
+		agg = self.agg_index
+		edge = self.edge_index
+		host = self.host_index
+
+		# fixed-width fields keep ids unique once pod/index need two digits
+		# (h1100 could be pod 1 edge 10 or pod 11 edge 0); k <= 10 keeps the
+		# single-digit ids c00, a00, e00, h000
+		pw = len(str(k - 1))
+		iw = len(str(max(half - 1, 0)))
+
+		ids = self.ids
+		types = self.types
+		pod_of = self.pods
+		sub_of = self.subs
+		idx_of = self.idxs
+		indptr = self.indptr
+		indices = self.indices
+		indptr.append(0)
+
+		# 1) core switches, arranged in a half x half matrix; core i*half+j
+		#    connects to agg i of every pod
 		for i in range(half):
 			for j in range(half):
-				nid = f"c{i}{j}"        # e.g. c00, c01, c10, c11 for k=4
-				node = Node(nid, 'core')
-				core_switches.append(node)
-				self.switches.append(node)
-
-        # 2) build each pod
+				ids.append(f"c{i:0{iw}}{j:0{iw}}")  # e.g. c00, c01, c10, c11 for k=4
+				types.append(CORE)
+				pod_of.append(-1)
+				sub_of.append(-1)
+				idx_of.append(i * half + j)
+				indices.extend(agg(p, i) for p in range(pods))
+				indptr.append(len(indices))
+
+		# 2) aggregation and edge switches of each pod: agg i connects to
+		#    cores i*half.. (i+1)*half-1 and to every edge of the pod, edge i
+		#    to every agg of the pod and to its half hosts
 		for p in range(pods):
-            # aggregation and edge in this pod
-			agg_switches = []
-			edge_switches = []
 			for i in range(half):
-				a = Node(f"a{p}{i}", 'agg')    # e.g. a00, a01 in pod 0
-				e = Node(f"e{p}{i}", 'edge')   # e00, e01 in pod 0
-				agg_switches.append(a)
-				edge_switches.append(e)
-				self.switches += [a, e]
-
-            # 2a) connect each edge to each agg in same pod
-			for e in edge_switches:
-				for a in agg_switches:
-					e.add_edge(a)
-
-            # 2b) attach hosts to each edge switch
-            # each edge has half hosts
-			for ei, e in enumerate(edge_switches):
+				ids.append(f"a{p:0{pw}}{i:0{iw}}")  # e.g. a00, a01 in pod 0
+				types.append(AGG)
+				pod_of.append(p)
+				sub_of.append(-1)
+				idx_of.append(i)
+				indices.extend(range(i * half, (i + 1) * half))
+				indices.extend(edge(p, e) for e in range(half))
+				indptr.append(len(indices))
+
+				ids.append(f"e{p:0{pw}}{i:0{iw}}")  # e00, e01 in pod 0
+				types.append(EDGE)
+				pod_of.append(p)
+				sub_of.append(-1)
+				idx_of.append(i)
+				indices.extend(agg(p, a) for a in range(half))
+				indices.extend(range(host(p, i, 0), host(p, i, half)))
+				indptr.append(len(indices))
+
+		# 3) hosts, each attached to its edge switch
+		for p in range(pods):
+			for e in range(half):
 				for h in range(half):
-					hid = f"h{p}{ei}{h}"   # e.g. h000, h001, h010, h011 for k=4
-					host = Node(hid, 'host')
-                    # store addressing info for later IP assignment
-					host.pod = p
-					host.edge = ei
-					host.idx = h
-					self.servers.append(host)
-					e.add_edge(host)
-
-            # 2c) connect agg switches to core
-            # each agg i connects to one group of core with index i
-			for ai, a in enumerate(agg_switches):
-                # group offset = ai * half
-				for cj in range(half):
-					core_idx = ai * half + cj
-					a.add_edge(core_switches[core_idx])
+					ids.append(f"h{p:0{pw}}{e:0{iw}}{h:0{iw}}")  # e.g. h000, h001, h010, h011 for k=4
+					types.append(HOST)
+					pod_of.append(p)
+					sub_of.append(e)
+					idx_of.append(h)
+					indices.append(edge(p, e))
+					indptr.append(len(indices))
+
+	def __len__(self):
+		return len(self.ids)
+
+	# Node index of a switch/host from its coordinates
+	def core_index(self, c):
+		return c
+
+	def agg_index(self, p, i):
+		return self.n_core + p * self.num_ports + 2 * i
+
+	def edge_index(self, p, i):
+		return self.n_core + p * self.num_ports + 2 * i + 1
+
+	def host_index(self, p, e, h):
+		half = self.num_ports // 2
+		return self.n_switch + (p * half + e) * half + h
+
+	# Neighbor indices of node i, in port order
+	def neighbors(self, i):
+		return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+	def degree(self, i):
+		return self.indptr[i + 1] - self.indptr[i]
+
+	# Decide in O(1) from the coordinates whether nodes i and j are linked
+	def is_neighbor(self, i, j):
+		ti = self.types[i]
+		tj = self.types[j]
+		if ti > tj:
+			i, j, ti, tj = j, i, tj, ti
+		if ti == HOST and tj == EDGE:
+			return self.pods[i] == self.pods[j] and self.subs[i] == self.idxs[j]
+		if ti == EDGE and tj == AGG:
+			return self.pods[i] == self.pods[j]
+		if ti == AGG and tj == CORE:
+			return self.idxs[j] // (self.num_ports // 2) == self.idxs[i]
+		return False
 
+	# Node view of index i (views are created once and then shared)
+	def node(self, i):
+		if self._nodes is None:
+			self._nodes = [None] * len(self.ids)
+		node = self._nodes[i]
+		if node is None:
+			node = self._nodes[i] = Node(self, i)
+		return node
+
+	def index_of(self, node_id):
+		if self._id_index is None:
+			self._id_index = {nid: i for i, nid in enumerate(self.ids)}
+		return self._id_index[node_id]
+
+	@property
+	def switches(self):
+		# list of Node(type in {'core','agg','edge'})
+		if self._switches is None:
+			self._switches = [self.node(i) for i in range(self.n_switch)]
+		return self._switches
+
+	@property
+	def servers(self):
+		# list of Node(type='host')
+		if self._servers is None:
+			self._servers = [self.node(i) for i in range(self.n_switch, len(self.ids))]
+		return self._servers
@@ -92,4 +92,5 @@ sudo pip install eventlet==0.30.2
 # Install needed Python libraries
 pip install networkx
 pip install matplotlib
+pip install numpy
 